@@ -0,0 +1,241 @@
+# benchmarks/bench_commands.py
+"""Wall time, peak RSS and upload size of the statistics and plotting hot paths.
+
+Run with ``python benchmarks/bench_commands.py``. Each case sends a real
+command through the bot's own parsing and Cog handlers via the mock
+gateway, with small (inline), medium (CSV attachment) and large (raw
+float64 attachment) inputs generated from a fixed seed. Rendering and
+resampling run on threads so everything they allocate shows up in this
+process's peak RSS.
+
+``--save FILE`` records the results and ``--baseline FILE`` compares
+against them, exiting non-zero if any case got slower by more than
+``--tolerance``, used more memory by more than ``--rss-tolerance`` or
+produced more PNG bytes than ``--bytes-tolerance`` allows. The committed
+baseline_commands.json was written with::
+
+    python benchmarks/bench_commands.py --save benchmarks/baseline_commands.json
+
+and is checked with ``--baseline benchmarks/baseline_commands.json``.
+Timings depend on the machine, so regenerate it on the one you compare on
+before relying on the wall-time check.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import numpy as np
+
+# Before the bot's modules read them: keep all work in-process and make
+# sure admission control never throttles the benchmark.
+os.environ.setdefault('MEKAKO_RENDER_BACKEND', 'thread')
+os.environ.setdefault('MEKAKO_RESAMPLING_BACKEND', 'thread')
+for scope in ('USER', 'CHANNEL', 'GUILD'):
+    os.environ[f'MEKAKO_{scope}_RATE'] = '1e9'
+    os.environ[f'MEKAKO_{scope}_BURST'] = '1e9'
+
+from harness import load, peak_rss, reset_peak_rss, time_per_call
+
+SIZES = {'small': 50, 'medium': 10_000, 'large': 1_000_000}
+SEED = 20240611
+
+
+def sample(n, offset=0.0, seed=0):
+    rng = np.random.default_rng(SEED + seed)
+    return rng.normal(50 + offset, 10, n)
+
+
+class Attachments:
+    """Builds the data arguments of a command, inline or as attachments."""
+
+    def __init__(self, size, gateway_module):
+        self.size = size
+        self.n = SIZES[size]
+        self.files = []
+        self._attachment = gateway_module.FakeAttachment
+
+    def values(self, values):
+        if self.size == 'small':
+            return ','.join(f'{v:.4f}' for v in values)
+        index = len(self.files) + 1
+        if self.size == 'medium':
+            data = ('value\n' + '\n'.join(f'{v:.6f}' for v in values)).encode()
+            name = f'data{index}.csv'
+        else:
+            data = np.asarray(values, dtype='<f8').tobytes()
+            name = f'data{index}.f64'
+        self.files.append((name, data))
+        return 'file:value' if index == 1 else f'file{index}:value'
+
+    def attachments(self, run):
+        # Fresh ids every run and size, so download caching doesn't skip the parse.
+        return [self._attachment(name, data, id=(self.size, run, i)) for i, (name, data) in enumerate(self.files)]
+
+
+def histogram(data, run):
+    return f'!histogram {data.values(sample(data.n))}'
+
+
+def anova(data, run):
+    groups = [f'{label}:{data.values(sample(data.n, offset, seed))}'
+              for seed, (label, offset) in enumerate([('a', 0), ('b', 2), ('c', 5)])]
+    return '!anova ' + ' '.join(groups)
+
+
+def regression(data, run):
+    x = sample(data.n)
+    y = 3 * x + sample(data.n, seed=1)
+    return f'!regression {data.values(x)} {data.values(y)}'
+
+
+def ci_bootstrap(data, run):
+    return f'!ci bootstrap mean {data.values(sample(data.n))} 0.95 2000 {SEED}'
+
+
+# Distribution plots are cached by parameters, so every run varies them
+# slightly to measure an actual render.
+DISTRIBUTION_COMMANDS = {
+    'normal': lambda run: f'!normal 0 0 {1 + run / 100}',
+    'exponential': lambda run: f'!exponential 1 {1 + run / 100}',
+    'gamma': lambda run: f'!gamma 1 2 {1 + run / 100}',
+    'beta': lambda run: f'!beta 0.5 2 {3 + run / 100}',
+    'uniform': lambda run: f'!uniform 0.5 0 {1 + run / 100}',
+    't_dist': lambda run: f'!t_dist 0 {5 + run}',
+    'f_dist': lambda run: f'!f_dist 1 5 {10 + run}',
+    'chi2_dist': lambda run: f'!chi2_dist 2 {3 + run}',
+}
+
+# name -> (builder, sizes, whether a PNG is expected)
+CASES = {
+    'histogram': (histogram, tuple(SIZES), True),
+    'anova': (anova, tuple(SIZES), True),
+    'regression': (regression, tuple(SIZES), True),
+    'ci': (ci_bootstrap, ('small', 'medium'), False),
+}
+for _name, _command in DISTRIBUTION_COMMANDS.items():
+    CASES[_name] = ((lambda command: lambda data, run: command(run))(_command), ('small',), True)
+
+INTENT_MESSAGES = {
+    'small': "hey mekako",
+    'medium': "can you explain the difference between the mean and the median, and when to use each?",
+    'large': "i was just walking my dog earlier today and " * 40 + "thought of you, thank you",
+}
+
+
+async def run_case(gateway, gateway_module, builder, size, expects_file, repeat):
+    times, rss, png_bytes = [], [], []
+    for run in range(repeat + 1):
+        data = Attachments(size, gateway_module)
+        content = builder(data, run)
+        attachments = data.attachments(run)
+        reset_peak_rss()
+        start = time.perf_counter()
+        replies = await gateway.send(content, guild_id=1, channel_id=1, user_id=1, attachments=attachments)
+        elapsed = time.perf_counter() - start
+        files = [payload for reply in replies for _, payload in reply.files]
+        if not replies or (expects_file and not files):
+            text = replies[-1].content if replies else 'no reply'
+            raise RuntimeError(f"{content[:60]!r} failed: {text}")
+        if run == 0:
+            continue  # warm-up: lazy imports, first-use caches
+        times.append(elapsed)
+        rss.append(peak_rss())
+        png_bytes.append(sum(len(payload) for payload in files))
+    return {
+        'wall_ms': statistics.median(times) * 1000,
+        'peak_rss_mb': max(rss) / 2 ** 20,
+        'png_bytes': int(statistics.median(png_bytes)),
+    }
+
+
+def intent_case(size):
+    get_intent = load('utils.intents').get_intent
+    message = INTENT_MESSAGES[size]
+    reset_peak_rss()
+    seconds = time_per_call(lambda: get_intent(message))
+    return {'wall_ms': seconds * 1000, 'peak_rss_mb': peak_rss() / 2 ** 20, 'png_bytes': 0}
+
+
+async def measure(selected, sizes, repeat):
+    # The bot the launcher runs, so its timing context, hooks and error
+    # handling are part of what's measured; its setup_hook loads the commands.
+    gateway_module = load('utils.mock_gateway')
+    gateway = gateway_module.MockGateway(load('main').create_bot())
+    await gateway.start()
+
+    results = {}
+    for name, (builder, case_sizes, expects_file) in CASES.items():
+        if selected and name not in selected:
+            continue
+        for size in case_sizes:
+            if size in sizes:
+                results[f'{name}/{size}'] = await run_case(gateway, gateway_module, builder, size,
+                                                           expects_file, repeat)
+                print_row(f'{name}/{size}', results[f'{name}/{size}'])
+    if not selected or 'get_intent' in selected:
+        for size in sizes:
+            results[f'get_intent/{size}'] = intent_case(size)
+            print_row(f'get_intent/{size}', results[f'get_intent/{size}'])
+    return results
+
+
+def print_row(case, result):
+    print(f"{case:<22} {result['wall_ms']:>10.3f} {result['peak_rss_mb']:>10.1f} {result['png_bytes']:>10,}",
+          flush=True)
+
+
+def compare(results, baseline, tolerance, rss_tolerance, bytes_tolerance):
+    """Return a list of human-readable regressions against ``baseline``."""
+    problems = []
+    for case, result in results.items():
+        old = baseline.get(case)
+        if old is None:
+            continue
+        if result['wall_ms'] > old['wall_ms'] * (1 + tolerance):
+            problems.append(f"{case}: {old['wall_ms']:.2f} -> {result['wall_ms']:.2f} ms")
+        if result['peak_rss_mb'] > old['peak_rss_mb'] * (1 + rss_tolerance):
+            problems.append(f"{case}: peak RSS {old['peak_rss_mb']:.1f} -> {result['peak_rss_mb']:.1f} MiB")
+        if result['png_bytes'] > old['png_bytes'] * (1 + bytes_tolerance):
+            problems.append(f"{case}: PNG {old['png_bytes']:,} -> {result['png_bytes']:,} bytes")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('cases', nargs='*', help=f"cases to run (default all): {', '.join(CASES)}, get_intent")
+    parser.add_argument('--sizes', default=','.join(SIZES), help="comma-separated subset of small,medium,large")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per case, after one warm-up run")
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against a JSON file written with --save")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument('--rss-tolerance', type=float, default=0.25, help="allowed peak RSS growth, as a fraction")
+    parser.add_argument('--bytes-tolerance', type=float, default=0.05, help="allowed PNG size growth, as a fraction")
+    args = parser.parse_args()
+
+    sizes = [size for size in args.sizes.split(',') if size]
+    unknown = set(args.cases) - set(CASES) - {'get_intent'} or set(sizes) - set(SIZES)
+    if unknown:
+        parser.error(f"unknown case or size: {', '.join(sorted(unknown))}")
+
+    print(f"{'case':<22} {'wall ms':>10} {'peak MiB':>10} {'PNG bytes':>10}")
+    results = asyncio.run(measure(set(args.cases), sizes, args.repeat))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline, args.tolerance, args.rss_tolerance, args.bytes_tolerance)
+        for problem in problems:
+            print(problem)
+        print("REGRESSION" if problems else "OK")
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
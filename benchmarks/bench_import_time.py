@@ -0,0 +1,100 @@
+# benchmarks/bench_import_time.py
+"""Cold-start import cost of the command modules, measured with ``python -X importtime``.
+
+Run with ``python benchmarks/bench_import_time.py``. Each run imports the
+commands package and every module in its EXTENSIONS in a fresh
+interpreter, which is what loading the cogs at startup costs; the
+fastest of ``--runs`` is reported along with the slowest modules. Heavy
+scientific libraries are supposed to load lazily, so the script exits
+non-zero if any of HEAVY_MODULES is in ``sys.modules`` afterwards.
+
+``--save FILE`` records the result and ``--baseline FILE`` compares
+against one, exiting non-zero if startup got slower by more than
+``--tolerance``.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from harness import REPO_ROOT, PACKAGE
+
+HEAVY_MODULES = ('scipy.stats', 'scipy.special', 'matplotlib', 'matplotlib.pyplot', 'seaborn', 'pandas')
+
+# Run in the child interpreter: import the commands package and each of
+# its extensions, then report the elapsed time and which heavy modules
+# ended up loaded.
+IMPORT_SCRIPT = """
+import importlib, json, sys, time
+start = time.perf_counter()
+package = importlib.import_module({package!r})
+for module in package.EXTENSIONS.values():
+    importlib.import_module(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({{'us': int(elapsed * 1e6), 'heavy': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+def import_times(package):
+    """One fresh import of ``package`` and its extensions.
+
+    Returns ``(total_us, heavy, {module: (self_us, cumulative_us)})``.
+    """
+    script = IMPORT_SCRIPT.format(package=package, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', script],
+                            cwd=os.path.dirname(REPO_ROOT), capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    report = json.loads(result.stdout)
+    return report['us'], report['heavy'], times
+
+def measure(runs):
+    target = f'{PACKAGE}.commands'
+    samples = [import_times(target) for _ in range(runs)]
+    totals = [total for total, _, _ in samples]
+    _, heavy, fastest = samples[totals.index(min(totals))]
+    return {
+        'module': target,
+        'min_us': min(totals),
+        'median_us': int(statistics.median(totals)),
+        'heavy': sorted(set().union(*(heavy for _, heavy, _ in samples))),
+        'slowest': sorted(((name, times[1]) for name, times in fastest.items() if name != target),
+                          key=lambda item: -item[1])[:10],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--save', help="write the result to this JSON file")
+    parser.add_argument('--baseline', help="compare against a JSON file written with --save")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown, as a fraction")
+    args = parser.parse_args()
+
+    result = measure(args.runs)
+    print(f"import {result['module']} and its extensions: {result['min_us'] / 1000:.1f} ms (median {result['median_us'] / 1000:.1f} ms)")
+    print("slowest imports (cumulative):")
+    for name, cumulative in result['slowest']:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+    print(f"heavy modules loaded at import: {', '.join(result['heavy']) or 'none'}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2)
+    failed = bool(result['heavy'])
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        limit = baseline['min_us'] * (1 + args.tolerance)
+        print(f"baseline: {baseline['min_us'] / 1000:.1f} ms, limit {limit / 1000:.1f} ms")
+        failed = failed or result['min_us'] > limit
+    if failed:
+        print("REGRESSION")
+        sys.exit(1)
+    print("OK")
+
+if __name__ == '__main__':
+    main()
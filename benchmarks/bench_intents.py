@@ -0,0 +1,43 @@
+# benchmarks/bench_intents.py
+"""Per-message cost of intent matching as the intent table grows.
+
+Run with ``python benchmarks/bench_intents.py``. Synthetic keyword intents
+are appended after the real ones, so messages that match nothing (the
+common case for a mention) have to get past every one of them.
+"""
+import re
+from harness import load, time_per_call
+
+intents_module = load('utils.intents')
+Intent, IntentMatcher = intents_module.Intent, intents_module.IntentMatcher
+
+MESSAGES = [
+    "hey mekako",
+    "what's the difference between mean and median?",
+    "thank you, that was brilliant",
+    "can you explain the standard deviation",
+    "i was just walking my dog earlier today and thought of you",
+    "please run the numbers for my project",
+]
+
+def synthetic_intents(count):
+    return [Intent(f"synthetic{i}", [rf'\b(alpha{i}|beta{i}|gamma{i}\s+delta{i})\b'], ["..."])
+            for i in range(count)]
+
+def legacy_get_intent(table, message):
+    for intent in table:
+        if any(re.search(pattern, message, re.IGNORECASE) for pattern in intent.patterns):
+            return intent
+    return None
+
+def main():
+    print(f"{'intents':>8} {'legacy us/msg':>14} {'compiled us/msg':>16}")
+    for extra in (0, 50, 200, 500):
+        table = intents_module.intents + synthetic_intents(extra)
+        matcher = IntentMatcher(table)
+        legacy = time_per_call(lambda: [legacy_get_intent(table, m) for m in MESSAGES]) / len(MESSAGES)
+        compiled = time_per_call(lambda: [matcher.match(m) for m in MESSAGES]) / len(MESSAGES)
+        print(f"{len(table):>8} {legacy * 1e6:>14.2f} {compiled * 1e6:>16.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_mlr.py
+"""Fit time of each !mlr solver across rows × predictors.
+
+Run with ``python benchmarks/bench_mlr.py``. Every case is generated
+chunk by chunk from a fixed seed, so the streaming solvers never hold the
+whole table; ``qr`` keeps it and is skipped past MEKAKO_QR_MAX_CELLS.
+``--levels`` adds a categorical predictor with that many levels, which is
+where ``sparse`` pays off. The ``max |Δb|`` column is the largest
+coefficient difference from the first solver that ran, as a sanity check.
+"""
+import argparse
+import time
+import numpy as np
+from harness import load
+
+linear_models = load('utils.linear_models')
+
+CHUNK_ROWS = 65536
+
+
+def chunks(rows, predictors, levels, seed=0):
+    """Yield ``(y, numeric, codes)`` blocks of a synthetic regression problem."""
+    beta = np.linspace(-1, 1, predictors)
+    effects = np.linspace(0, 2, max(levels, 1))
+    for index, start in enumerate(range(0, rows, CHUNK_ROWS)):
+        rng = np.random.default_rng([seed, index])
+        size = min(CHUNK_ROWS, rows - start)
+        numeric = rng.normal(size=(size, predictors))
+        y = 1.0 + numeric @ beta + rng.normal(size=size)
+        codes = None
+        if levels:
+            codes = rng.integers(0, levels, size=(size, 1))
+            y += effects[codes[:, 0]]
+        yield y, numeric, codes
+
+
+def run(rows, predictors, levels, solver):
+    names = linear_models.design_names([f'x{i}' for i in range(predictors)],
+                                       [('group', list(range(levels)))] if levels else [])
+    level_counts = [levels] if levels else []
+    start = time.perf_counter()
+    fit = linear_models.fit_chunks(chunks(rows, predictors, levels), names, level_counts, solver)
+    return fit, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='10000,100000,1000000', help="comma-separated row counts")
+    parser.add_argument('--predictors', default='5,20,50', help="comma-separated numeric predictor counts")
+    parser.add_argument('--levels', type=int, default=0, help="levels of an extra categorical predictor")
+    parser.add_argument('--solvers', default='qr,normal,sparse', help="comma-separated solvers")
+    args = parser.parse_args()
+
+    run(1000, 2, 0, 'qr')  # first LAPACK calls are slow
+    print(f"{'rows':>10} {'predictors':>10} {'terms':>6} {'solver':<8} {'ms':>10} {'ms/Mrow':>9} {'max |Δb|':>10}")
+    for rows in map(int, args.rows.split(',')):
+        for predictors in map(int, args.predictors.split(',')):
+            terms = 1 + predictors + max(args.levels - 1, 0)
+            reference = None
+            for solver in args.solvers.split(','):
+                if solver == 'qr' and rows * terms > linear_models.QR_MAX_CELLS:
+                    print(f"{rows:>10,} {predictors:>10} {terms:>6} {solver:<8} {'too big':>10}")
+                    continue
+                fit, ms = run(rows, predictors, args.levels, solver)
+                if reference is None:
+                    reference = fit.coefficients
+                difference = np.abs(fit.coefficients - reference).max()
+                print(f"{rows:>10,} {predictors:>10} {terms:>6} {solver:<8} {ms:>10.1f} "
+                      f"{ms / rows * 1e6:>9.1f} {difference:>10.2e}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/bench_plot_encoding.py
+"""Upload bytes and encode time of every plot type under each output encoding.
+
+Run with ``python benchmarks/bench_plot_encoding.py``. Each plot is drawn
+once per DPI tier; the rasterising cost is reported separately and the
+encoders then all work from the same pixels. ``legacy`` is the plain
+``savefig`` PNG used before the encoding stage existed (draw included),
+and ``auto`` is what the bot sends by default.
+"""
+import argparse
+import io
+import time
+import numpy as np
+from functools import partial
+from harness import load
+
+plotting = load('utils.plotting')
+calculations = load('utils.calculations')
+
+rng = np.random.default_rng(7)
+_x = rng.normal(50, 10, 10_000)
+_y = 3 * _x + rng.normal(0, 15, _x.size)
+
+PLOTS = {
+    'histogram': (plotting.plot_3b1b_histogram, (_x, "Histogram of Data")),
+    'scatter': (plotting.plot_3b1b_scatter, (_x, _y, "Scatter Plot")),
+    'boxplot': (plotting.plot_3b1b_boxplot, ([_x, _y / 3, _x + 5], ['a', 'b', 'c'], "Box Plot of Groups")),
+    'distribution': (plotting.plot_distribution,
+                     (calculations.normal_probability, (0, 1), (-4, 4), "Normal Distribution (μ=0, σ=1)")),
+    't_test': (plotting.plot_t_test, (2.1, 15)),
+    'z_test': (plotting.plot_z_test, (1.7,)),
+    'chi_square': (plotting.plot_chi_square, ([18, 22, 30, 30], [25, 25, 25, 25])),
+    'regression': (plotting.plot_regression, (_x, _y, 3.0, 0.0)),
+}
+
+ENCODERS = {
+    'png-palette': plotting.encode_png,
+    'png-palette-opt': partial(plotting.encode_png, optimize=True),
+    'png-full': partial(plotting.encode_png, palette=False),
+    'webp-q90': plotting.encode_webp,
+    'webp-q100': partial(plotting.encode_webp, quality=100),
+}
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def legacy_png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def measure(plot_func, args, tier):
+    rows = []
+    fig = plot_func(*args)
+    try:
+        data, ms = timed(legacy_png, fig)
+        rows.append(('legacy', len(data), ms, None))
+        pixels, raster_ms = timed(plotting.rasterize, fig, plotting.DPI_TIERS[tier])
+        rows.append(('rasterize', 0, raster_ms, None))
+        for name, encode in ENCODERS.items():
+            (data, decoded), ms = timed(encode, pixels)
+            rows.append((name, len(data), ms, plotting.psnr(pixels, decoded)))
+        if plot_func in plotting.VECTOR_PLOTS:
+            data, ms = timed(plotting.encode_svg, fig)
+            rows.append(('svg', len(data), ms, None))
+        encoded, ms = timed(plotting.encode_figure, fig, 'auto', tier, None, False)
+        rows.append((f'auto ({encoded.format})', len(encoded.getvalue()), ms, None))
+    finally:
+        plotting.close_figure(fig)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('plots', nargs='*', help=f"plots to run (default all): {', '.join(PLOTS)}")
+    parser.add_argument('--dpi', default='standard', help=f"DPI tier(s), comma-separated: {', '.join(plotting.DPI_TIERS)}")
+    args = parser.parse_args()
+
+    # Draw everything once so lazy imports and font lookups aren't timed.
+    plotting.render_plot(*PLOTS['distribution'][:1], *PLOTS['distribution'][1])
+    for tier in args.dpi.split(','):
+        print(f"\n{tier} ({plotting.DPI_TIERS[tier]} dpi)")
+        print(f"{'plot':<13} {'encoding':<17} {'bytes':>9} {'ms':>8} {'PSNR dB':>8}")
+        for name in args.plots or PLOTS:
+            plot_func, plot_args = PLOTS[name]
+            for encoding, size, ms, quality in measure(plot_func, plot_args, tier):
+                quality = '' if quality is None else f"{quality:.1f}" if np.isfinite(quality) else 'exact'
+                print(f"{name:<13} {encoding:<17} {size:>9,} {ms:>8.1f} {quality:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# benchmarks/harness.py
+import importlib
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(REPO_ROOT)
+
+def load(module):
+    """Import ``module`` from the bot's package, e.g. ``load('utils.intents')``.
+
+    The command and utility modules use package-relative imports, so the
+    repository is imported as a package from its parent directory.
+    """
+    parent = os.path.dirname(REPO_ROOT)
+    if parent not in sys.path:
+        sys.path.insert(0, parent)
+    return importlib.import_module(f"{PACKAGE}.{module}")
+
+def time_per_call(func, min_time=0.2):
+    """Average seconds per call of ``func``, repeating until ``min_time`` has passed."""
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return elapsed / calls
+
+def reset_peak_rss():
+    """Reset the process's peak RSS so the next ``peak_rss()`` covers only what follows.
+
+    Only Linux supports this (via /proc/self/clear_refs); elsewhere the peak
+    keeps growing over the whole run.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss():
+    """Peak resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux but bytes on macOS.
+    return usage if sys.platform == 'darwin' else usage * 1024
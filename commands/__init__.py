@@ -1,13 +1,39 @@
 # commands/__init__.py
-from .basic_stats import basic_stats_setup
-from .distributions import distributions_setup
-from .hypothesis_tests import hypothesis_tests_setup
-from .visualizations import visualizations_setup
-from .probability import probability_setup
-
-def setup_commands(bot):
-    basic_stats_setup(bot)
-    distributions_setup(bot)
-    hypothesis_tests_setup(bot)
-    visualizations_setup(bot)
-    probability_setup(bot)
\ No newline at end of file
+import time
+from ..utils.admission import admission_check
+
+# Each command group is an extension holding one Cog, so it can be
+# reloaded on its own with ``!reload`` without reconnecting.
+EXTENSIONS = {
+    'basic_stats': f'{__name__}.basic_stats',
+    'distributions': f'{__name__}.distributions',
+    'hypothesis_tests': f'{__name__}.hypothesis_tests',
+    'visualizations': f'{__name__}.visualizations',
+    'probability': f'{__name__}.probability',
+    'sessions': f'{__name__}.sessions',
+    'admin': f'{__name__}.admin',
+}
+
+# Seconds the most recent load or reload of each extension took.
+load_times = {}
+
+def extension_name(name):
+    if name not in EXTENSIONS:
+        raise ValueError(f"There's no extension called '{name}'. Try one of: {', '.join(EXTENSIONS)}.")
+    return EXTENSIONS[name]
+
+async def load_extension(bot, name):
+    start = time.perf_counter()
+    await bot.load_extension(extension_name(name))
+    load_times[name] = time.perf_counter() - start
+
+async def reload_extension(bot, name):
+    """Re-import one extension's module and swap its Cog in place."""
+    start = time.perf_counter()
+    await bot.reload_extension(extension_name(name))
+    load_times[name] = time.perf_counter() - start
+
+async def setup_commands(bot):
+    bot.add_check(admission_check, call_once=True)
+    for name in EXTENSIONS:
+        await load_extension(bot, name)
@@ -0,0 +1,88 @@
+# commands/admin.py
+from discord.ext import commands
+from ..utils.admission import get_admission, COMMAND_COSTS, DEFAULT_COST
+from ..utils.metrics import get_metrics, command_percentiles, phase_totals
+from . import EXTENSIONS, load_times, reload_extension
+
+class Admin(commands.Cog, name="Admin"):
+    """Bot housekeeping."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name='limits', help="Show your remaining command budget and how much load has been shed. Usage: !limits")
+    async def limits(self, ctx):
+        try:
+            admission = get_admission()
+            guild_id = ctx.guild.id if ctx.guild else None
+            lines = [f"You: {admission.remaining('user', ctx.author.id):.1f} tokens",
+                     f"This channel: {admission.remaining('channel', ctx.channel.id):.1f} tokens"]
+            if guild_id is not None:
+                lines.append(f"This server: {admission.remaining('guild', guild_id):.1f} tokens")
+            stats = admission.stats
+            by_scope = ', '.join(f"{scope} {count}" for scope, count in stats['rejected_by_scope'].items())
+            lines += [f"Plots cost {COMMAND_COSTS['histogram']}, most other commands {DEFAULT_COST}",
+                      "",
+                      f"Admitted: {stats['admitted']} ({stats['queued']} after queueing)",
+                      f"Queued right now: {admission.queue_length}",
+                      f"Rejected: {stats['rejected']} ({by_scope})",
+                      f"Shed cost: {stats['shed_cost']} tokens"]
+            result = '\n'.join(lines)
+            await ctx.send(f"Here's how much patience I have left:\n```\n{result}\n```")
+        except Exception as e:
+            await ctx.send(f"Error checking limits: {str(e)}. Even my bookkeeping needs a break.")
+
+    @commands.command(name='reload', help="Reload one command group without restarting. Owner only. Usage: !reload [extension]")
+    @commands.is_owner()
+    async def reload(self, ctx, name: str):
+        try:
+            await reload_extension(self.bot, name)
+            await ctx.send(f"Reloaded {name} in {load_times[name] * 1000:.0f} ms. Try not to break it again.")
+        except Exception as e:
+            await ctx.send(f"Error reloading {name}: {str(e)}. The old version is still running, lucky you.")
+
+    @commands.command(name='extensions', help="List the command groups and how long each took to load. Usage: !extensions")
+    async def extensions(self, ctx):
+        lines = []
+        for name, module in EXTENSIONS.items():
+            if module in self.bot.extensions:
+                lines.append(f"{name:<17} {load_times.get(name, 0) * 1000:>8.1f} ms")
+            else:
+                lines.append(f"{name:<17} {'not loaded':>11}")
+        result = '\n'.join(lines)
+        await ctx.send(f"Everything I'm made of, and how long it took:\n```\n{result}\n```")
+
+    @commands.command(name='botstats', help="Show p50/p95/p99 latency per command, or where one command's time goes. Owner only. Usage: !botstats [command]")
+    @commands.is_owner()
+    async def botstats(self, ctx, command: str = None):
+        try:
+            percentiles = command_percentiles()
+            if command is not None:
+                command = command.lstrip('!')
+                if command not in percentiles:
+                    await ctx.send(f"Nobody has run !{command} since I started. Can't time what doesn't happen.")
+                    return
+                count, p50, p95, p99 = percentiles[command]
+                lines = [f"Runs: {count}",
+                         f"p50 / p95 / p99: {p50 * 1000:.1f} / {p95 * 1000:.1f} / {p99 * 1000:.1f} ms",
+                         "",
+                         "Mean time per run:"]
+                lines += [f"  {phase:<10} {seconds * 1000:>9.1f} ms" for phase, seconds in phase_totals(command).items()]
+                result = '\n'.join(lines)
+                await ctx.send(f"Where !{command} spends its time:\n```\n{result}\n```")
+                return
+            if not percentiles:
+                await ctx.send("No commands timed yet. You're my first customer, apparently.")
+                return
+            rows = sorted(percentiles.items(), key=lambda item: item[1][3], reverse=True)[:20]
+            lines = [f"{'command':<17} {'runs':>6} {'p50':>8} {'p95':>8} {'p99':>8}"]
+            lines += [f"{name:<17} {count:>6} {p50 * 1000:>8.1f} {p95 * 1000:>8.1f} {p99 * 1000:>8.1f}"
+                      for name, (count, p50, p95, p99) in rows]
+            in_flight = sum(get_metrics().gauges['mekako_commands_in_flight'].values())
+            result = '\n'.join(lines)
+            await ctx.send(f"Latency in ms, slowest first. {in_flight} running right now:\n```\n{result}\n```")
+        except Exception as e:
+            await ctx.send(f"Error collecting stats: {str(e)}. Even my stopwatch needs a break.")
+
+async def setup(bot):
+    await bot.add_cog(Admin(bot))
@@ -1,42 +1,82 @@
 # commands/basic_stats.py
 import discord
 from discord.ext import commands
-from ..utils.calculations import safe_float_conversion
-from ..utils.plotting import plot_3b1b_histogram, save_plot_as_bytes
-from ..personality.responses import maho_response
-import numpy as np
-
-def basic_stats_setup(bot):
-    @bot.command(name='histogram', help="Create a histogram. Usage: !histogram [data1,data2,...]")
-    async def histogram(ctx, data: str):
+from ..utils.datasets import resolve_values, resolve_moments, resolve_quantiles
+from ..utils.parsing import parse_values
+from ..utils.sketches import parse_quantile_mode
+from ..utils.render_service import render
+
+class BasicStats(commands.Cog, name="Basic Stats"):
+    """Summaries of raw data: mean, median, percentiles, histograms."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name='histogram', help="Create a histogram. Usage: !histogram [data1,data2,...]")
+    async def histogram(self, ctx, data: str):
         try:
-            values = [safe_float_conversion(x) for x in data.split(',')]
-            fig = plot_3b1b_histogram(values, "Histogram of Data")
-            buf = save_plot_as_bytes(fig)
+            values = await resolve_values(ctx, data)
+            buf = await render('histogram', values, "Histogram of Data")
             
             await ctx.send("Here's your histogram. Try not to hurt yourself interpreting it.", 
-                           file=discord.File(buf, 'histogram.png'))
+                           file=discord.File(buf, buf.filename('histogram')))
         except Exception as e:
             await ctx.send(f"Error creating histogram: {str(e)}. Did you forget how numbers work?")
 
-    @bot.command(name='mean', help="Calculate the mean. Usage: !mean [data1,data2,...]")
-    async def calc_mean(ctx, data: str):
+    @commands.command(name='mean', help="Calculate the mean. Usage: !mean [data1,data2,...]")
+    async def calc_mean(self, ctx, data: str):
         try:
-            values = [safe_float_conversion(x) for x in data.split(',')]
-            result = np.mean(values)
+            result = (await resolve_moments(ctx, data)).mean
             response = f"The mean is {result:.4f}. Impressed? You shouldn't be, it's just addition and division."
             await ctx.send(response)
         except Exception as e:
             await ctx.send(f"Error calculating mean: {str(e)}. Did you forget how to input numbers?")
 
-    @bot.command(name='median', help="Calculate the median. Usage: !median [data1,data2,...]")
-    async def calc_median(ctx, data: str):
+    @commands.command(name='median', help="Calculate the median. Usage: !median [data1,data2,...] [auto|exact|approx]")
+    async def calc_median(self, ctx, data: str, mode: str = 'auto'):
         try:
-            values = [safe_float_conversion(x) for x in data.split(',')]
-            result = np.median(values)
+            result, was_exact = await resolve_quantiles(ctx, data, 0.5, parse_quantile_mode(mode))
             response = f"The median is {result:.4f}. It's the middle value, in case you didn't know."
+            if not was_exact:
+                response += "\n(Approximated with a quantile sketch. Close enough for someone like you.)"
             await ctx.send(response)
         except Exception as e:
             await ctx.send(f"Error calculating median: {str(e)}. Is sorting too complex for you?")
 
-    # Add more basic stats commands as needed
\ No newline at end of file
+    @commands.command(name='percentile', help="Calculate percentiles. Usage: !percentile [p1,p2,...] [data1,data2,...] [auto|exact|approx]")
+    async def calc_percentile(self, ctx, percentiles: str, data: str, mode: str = 'auto'):
+        try:
+            ps = parse_values(percentiles)
+            if ((ps < 0) | (ps > 100)).any():
+                raise ValueError("Percentiles go from 0 to 100")
+            result, was_exact = await resolve_quantiles(ctx, data, ps / 100, parse_quantile_mode(mode))
+            lines = "\n".join(f"{p:g}th percentile: {value:.4f}" for p, value in zip(ps, result))
+            response = f"Here are your percentiles:\n```\n{lines}\n```"
+            if not was_exact:
+                response += "(Approximated with a quantile sketch. Close enough for someone like you.)"
+            await ctx.send(response)
+        except Exception as e:
+            await ctx.send(f"Error calculating percentiles: {str(e)}. Percent means out of a hundred, you know.")
+
+    @commands.command(name='describe', help="Summarize data in one pass. Usage: !describe [data1,data2,...]")
+    async def describe(self, ctx, data: str):
+        try:
+            moments = await resolve_moments(ctx, data)
+            if moments.n == 0:
+                raise ValueError("There's nothing to describe")
+            result = (f"Count: {moments.n}\n"
+                      f"Mean: {moments.mean:.4f}\n"
+                      f"Std. deviation: {moments.std:.4f}\n"
+                      f"Variance: {moments.variance:.4f}\n"
+                      f"Skewness: {moments.skewness:.4f}\n"
+                      f"Excess kurtosis: {moments.kurtosis:.4f}\n"
+                      f"Min: {moments.min:.4f}\n"
+                      f"Max: {moments.max:.4f}")
+            await ctx.send(f"Here's the summary you were too lazy to compute yourself:\n```\n{result}\n```")
+        except Exception as e:
+            await ctx.send(f"Error describing data: {str(e)}. Did you give me actual numbers?")
+
+    # Add more basic stats commands as needed
+
+async def setup(bot):
+    await bot.add_cog(BasicStats(bot))
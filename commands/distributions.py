@@ -2,188 +2,181 @@
 import discord
 from discord.ext import commands
 from ..utils.calculations import *
-from ..utils.plotting import plot_distribution, save_plot_as_bytes
+from ..utils.executor import run_blocking
+from ..utils.datasets import resolve_values, to_csv_bytes
+from ..utils.parsing import parse_grid
+from ..utils.plot_cache import cached_distribution_plot
 from ..utils.validators import validate_positive
-from ..personality.responses import maho_response
+from ..utils.stat_tables import t_ppf, norm_ppf
+from ..utils.resampling import bootstrap_ci, DEFAULT_RESAMPLES
+from ..utils.progress import ProgressReporter
 import numpy as np
-import matplotlib.pyplot as plt
 
-def distributions_setup(bot):
-    @bot.command(name='normal', help="Calculate normal distribution probability density. Usage: !normal [x] [mean] [std]")
-    async def calc_normal(ctx, x: float, mean: float, std: float):
+class Distributions(commands.Cog, name="Distributions"):
+    """Densities, CDFs, quantiles and confidence intervals."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name='normal', help="Calculate normal distribution probability density. Usage: !normal [x] [mean] [std]")
+    async def calc_normal(self, ctx, x: float, mean: float, std: float):
         try:
-            result = normal_probability(x, mean, std)
+            result = await run_blocking(normal_probability, x, mean, std)
             response = f"The probability density for x={x} in a normal distribution with mean={mean} and std={std} is {result:.6f}."
             response += "\nLook at you, using the bell curve like a pro. Don't let it go to your head."
             
-            fig = plot_distribution(normal_probability, (mean, std), (mean-4*std, mean+4*std), 
-                                    f"Normal Distribution (μ={mean}, σ={std})")
-            buf = save_plot_as_bytes(fig)
-            await ctx.send(response, file=discord.File(buf, 'normal_distribution.png'))
-            plt.close(fig)
+            buf = await cached_distribution_plot(normal_probability, (mean, std), (mean-4*std, mean+4*std),
+                                                 f"Normal Distribution (μ={mean}, σ={std})")
+            await ctx.send(response, file=discord.File(buf, buf.filename('normal_distribution')))
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
 
-    @bot.command(name='normal_cdf', help="Calculate normal distribution cumulative probability. Usage: !normal_cdf [x] [mean] [std]")
-    async def calc_normal_cdf(ctx, x: float, mean: float, std: float):
+    @commands.command(name='normal_cdf', help="Calculate normal distribution cumulative probability. Usage: !normal_cdf [x] [mean] [std]")
+    async def calc_normal_cdf(self, ctx, x: float, mean: float, std: float):
         try:
-            result = normal_cdf(x, mean, std)
+            result = await run_blocking(normal_cdf, x, mean, std)
             response = f"The cumulative probability for x≤{x} in a normal distribution with mean={mean} and std={std} is {result:.6f}."
             response += "\nCongratulations, you can now calculate the area under a curve. Your parents must be so proud."
             await ctx.send(response)
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='exponential', help="Calculate exponential distribution probability density. Usage: !exponential [x] [scale]")
-    async def calc_exponential(ctx, x: float, scale: float):
+    @commands.command(name='exponential', help="Calculate exponential distribution probability density. Usage: !exponential [x] [scale]")
+    async def calc_exponential(self, ctx, x: float, scale: float):
         try:
-            result = exponential_probability(x, scale)
+            result = await run_blocking(exponential_probability, x, scale)
             response = f"The probability density for x={x} in an exponential distribution with scale={scale} is {result:.6f}."
             response += "\nExponential decay, just like your patience for these distributions, I bet."
             
-            fig = plot_distribution(exponential_probability, (scale,), (0, scale*5), 
-                                    f"Exponential Distribution (scale={scale})")
-            buf = save_plot_as_bytes(fig)
-            await ctx.send(response, file=discord.File(buf, 'exponential_distribution.png'))
-            plt.close(fig)
+            buf = await cached_distribution_plot(exponential_probability, (scale,), (0, scale*5),
+                                                 f"Exponential Distribution (scale={scale})")
+            await ctx.send(response, file=discord.File(buf, buf.filename('exponential_distribution')))
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='gamma', help="Calculate gamma distribution probability density. Usage: !gamma [x] [shape] [scale]")
-    async def calc_gamma(ctx, x: float, shape: float, scale: float):
+    @commands.command(name='gamma', help="Calculate gamma distribution probability density. Usage: !gamma [x] [shape] [scale]")
+    async def calc_gamma(self, ctx, x: float, shape: float, scale: float):
         try:
-            result = gamma_probability(x, shape, scale)
+            result = await run_blocking(gamma_probability, x, shape, scale)
             response = f"The probability density for x={x} in a gamma distribution with shape={shape} and scale={scale} is {result:.6f}."
             response += "\nGamma distribution, because sometimes life is too complex for simple exponentials."
             
-            fig = plot_distribution(gamma_probability, (shape, scale), (0, shape*scale*5), 
-                                    f"Gamma Distribution (shape={shape}, scale={scale})")
-            buf = save_plot_as_bytes(fig)
-            await ctx.send(response, file=discord.File(buf, 'gamma_distribution.png'))
-            plt.close(fig)
+            buf = await cached_distribution_plot(gamma_probability, (shape, scale), (0, shape*scale*5),
+                                                 f"Gamma Distribution (shape={shape}, scale={scale})")
+            await ctx.send(response, file=discord.File(buf, buf.filename('gamma_distribution')))
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='beta', help="Calculate beta distribution probability density. Usage: !beta [x] [a] [b]")
-    async def calc_beta(ctx, x: float, a: float, b: float):
+    @commands.command(name='beta', help="Calculate beta distribution probability density. Usage: !beta [x] [a] [b]")
+    async def calc_beta(self, ctx, x: float, a: float, b: float):
         try:
-            result = beta_probability(x, a, b)
+            result = await run_blocking(beta_probability, x, a, b)
             response = f"The probability density for x={x} in a beta distribution with a={a} and b={b} is {result:.6f}."
             response += "\nBeta distribution: for when you want to confine your ignorance to the interval [0, 1]."
             
-            fig = plot_distribution(beta_probability, (a, b), (0, 1), 
-                                    f"Beta Distribution (a={a}, b={b})")
-            buf = save_plot_as_bytes(fig)
-            await ctx.send(response, file=discord.File(buf, 'beta_distribution.png'))
-            plt.close(fig)
+            buf = await cached_distribution_plot(beta_probability, (a, b), (0, 1),
+                                                 f"Beta Distribution (a={a}, b={b})")
+            await ctx.send(response, file=discord.File(buf, buf.filename('beta_distribution')))
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='uniform', help="Calculate uniform distribution probability density. Usage: !uniform [x] [low] [high]")
-    async def calc_uniform(ctx, x: float, low: float, high: float):
+    @commands.command(name='uniform', help="Calculate uniform distribution probability density. Usage: !uniform [x] [low] [high]")
+    async def calc_uniform(self, ctx, x: float, low: float, high: float):
         try:
-            result = uniform_probability(x, low, high)
+            result = await run_blocking(uniform_probability, x, low, high)
             response = f"The probability density for x={x} in a uniform distribution between {low} and {high} is {result:.6f}."
             response += "\nUniform distribution: when you have no clue and you're proud of it."
             
-            fig = plot_distribution(uniform_probability, (low, high), (low, high), 
-                                    f"Uniform Distribution ({low}, {high})")
-            buf = save_plot_as_bytes(fig)
-            await ctx.send(response, file=discord.File(buf, 'uniform_distribution.png'))
-            plt.close(fig)
+            buf = await cached_distribution_plot(uniform_probability, (low, high), (low, high),
+                                                 f"Uniform Distribution ({low}, {high})")
+            await ctx.send(response, file=discord.File(buf, buf.filename('uniform_distribution')))
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='t_dist', help="Calculate t-distribution probability density. Usage: !t_dist [x] [df]")
-    async def calc_t_dist(ctx, x: float, df: float):
+    @commands.command(name='t_dist', help="Calculate t-distribution probability density. Usage: !t_dist [x] [df]")
+    async def calc_t_dist(self, ctx, x: float, df: float):
         try:
-            result = t_probability(x, df)
+            result = await run_blocking(t_probability, x, df)
             response = f"The probability density for x={x} in a t-distribution with {df} degrees of freedom is {result:.6f}."
             response += "\nT-distribution: for when normal just isn't student enough for you."
             
-            fig = plot_distribution(t_probability, (df,), (-4, 4), 
-                                    f"T-Distribution (df={df})")
-            buf = save_plot_as_bytes(fig)
-            await ctx.send(response, file=discord.File(buf, 't_distribution.png'))
-            plt.close(fig)
+            buf = await cached_distribution_plot(t_probability, (df,), (-4, 4),
+                                                 f"T-Distribution (df={df})")
+            await ctx.send(response, file=discord.File(buf, buf.filename('t_distribution')))
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='f_dist', help="Calculate F-distribution probability density. Usage: !f_dist [x] [dfn] [dfd]")
-    async def calc_f_dist(ctx, x: float, dfn: float, dfd: float):
+    @commands.command(name='f_dist', help="Calculate F-distribution probability density. Usage: !f_dist [x] [dfn] [dfd]")
+    async def calc_f_dist(self, ctx, x: float, dfn: float, dfd: float):
         try:
-            result = f_probability(x, dfn, dfd)
+            result = await run_blocking(f_probability, x, dfn, dfd)
             response = f"The probability density for x={x} in an F-distribution with dfn={dfn} and dfd={dfd} is {result:.6f}."
             response += "\nF-distribution: because sometimes you need to compare variances, and life isn't complicated enough."
             
-            fig = plot_distribution(f_probability, (dfn, dfd), (0, 5), 
-                                    f"F-Distribution (dfn={dfn}, dfd={dfd})")
-            buf = save_plot_as_bytes(fig)
-            await ctx.send(response, file=discord.File(buf, 'f_distribution.png'))
-            plt.close(fig)
+            buf = await cached_distribution_plot(f_probability, (dfn, dfd), (0, 5),
+                                                 f"F-Distribution (dfn={dfn}, dfd={dfd})")
+            await ctx.send(response, file=discord.File(buf, buf.filename('f_distribution')))
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='chi2_dist', help="Calculate chi-squared distribution probability density. Usage: !chi2_dist [x] [df]")
-    async def calc_chi2_dist(ctx, x: float, df: float):
+    @commands.command(name='chi2_dist', help="Calculate chi-squared distribution probability density. Usage: !chi2_dist [x] [df]")
+    async def calc_chi2_dist(self, ctx, x: float, df: float):
         try:
-            result = chi2_probability(x, df)
+            result = await run_blocking(chi2_probability, x, df)
             response = f"The probability density for x={x} in a chi-squared distribution with {df} degrees of freedom is {result:.6f}."
             response += "\nChi-squared distribution: for when you want to test goodness-of-fit, or just fit some squared normal variables."
             
-            fig = plot_distribution(chi2_probability, (df,), (0, max(5, df*2)), 
-                                    f"Chi-squared Distribution (df={df})")
-            buf = save_plot_as_bytes(fig)
-            await ctx.send(response, file=discord.File(buf, 'chi2_distribution.png'))
-            plt.close(fig)
+            buf = await cached_distribution_plot(chi2_probability, (df,), (0, max(5, df*2)),
+                                                 f"Chi-squared Distribution (df={df})")
+            await ctx.send(response, file=discord.File(buf, buf.filename('chi2_distribution')))
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='normal_quantile', help="Calculate normal distribution quantile. Usage: !normal_quantile [p] [mean] [std]")
-    async def calc_normal_quantile(ctx, p: float, mean: float, std: float):
+    @commands.command(name='normal_quantile', help="Calculate normal distribution quantile. Usage: !normal_quantile [p] [mean] [std]")
+    async def calc_normal_quantile(self, ctx, p: float, mean: float, std: float):
         try:
-            result = normal_quantile(p, mean, std)
+            result = await run_blocking(normal_quantile, p, mean, std)
             response = f"The {p*100}th percentile of a normal distribution with mean={mean} and std={std} is {result:.6f}."
             response += "\nCongratulations, you can now find specific points on a bell curve. Your life is complete."
             await ctx.send(response)
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='exponential_quantile', help="Calculate exponential distribution quantile. Usage: !exponential_quantile [p] [scale]")
-    async def calc_exponential_quantile(ctx, p: float, scale: float):
+    @commands.command(name='exponential_quantile', help="Calculate exponential distribution quantile. Usage: !exponential_quantile [p] [scale]")
+    async def calc_exponential_quantile(self, ctx, p: float, scale: float):
         try:
-            result = exponential_quantile(p, scale)
+            result = await run_blocking(exponential_quantile, p, scale)
             response = f"The {p*100}th percentile of an exponential distribution with scale={scale} is {result:.6f}."
             response += "\nExponential decay, just like my patience for these quantile calculations."
             await ctx.send(response)
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='gamma_quantile', help="Calculate gamma distribution quantile. Usage: !gamma_quantile [p] [shape] [scale]")
-    async def calc_gamma_quantile(ctx, p: float, shape: float, scale: float):
+    @commands.command(name='gamma_quantile', help="Calculate gamma distribution quantile. Usage: !gamma_quantile [p] [shape] [scale]")
+    async def calc_gamma_quantile(self, ctx, p: float, shape: float, scale: float):
         try:
-            result = gamma_quantile(p, shape, scale)
+            result = await run_blocking(gamma_quantile, p, shape, scale)
             response = f"The {p*100}th percentile of a gamma distribution with shape={shape} and scale={scale} is {result:.6f}."
             response += "\nGamma quantiles, for when you really want to complicate your life."
             await ctx.send(response)
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='beta_quantile', help="Calculate beta distribution quantile. Usage: !beta_quantile [p] [a] [b]")
-    async def calc_beta_quantile(ctx, p: float, a: float, b: float):
+    @commands.command(name='beta_quantile', help="Calculate beta distribution quantile. Usage: !beta_quantile [p] [a] [b]")
+    async def calc_beta_quantile(self, ctx, p: float, a: float, b: float):
         try:
-            result = beta_quantile(p, a, b)
+            result = await run_blocking(beta_quantile, p, a, b)
             response = f"The {p*100}th percentile of a beta distribution with a={a} and b={b} is {result:.6f}."
             response += "\nBeta quantiles: because sometimes you need to find specific points in your [0, 1] ignorance."
             await ctx.send(response)
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='uniform_quantile', help="Calculate uniform distribution quantile. Usage: !uniform_quantile [p] [low] [high]")
-    async def calc_uniform_quantile(ctx, p: float, low: float, high: float):
+    @commands.command(name='uniform_quantile', help="Calculate uniform distribution quantile. Usage: !uniform_quantile [p] [low] [high]")
+    async def calc_uniform_quantile(self, ctx, p: float, low: float, high: float):
         try:
-            result = uniform_quantile(p, low, high)
+            result = await run_blocking(uniform_quantile, p, low, high)
             response = f"The {p*100}th percentile of a uniform distribution between {low} and {high} is {result:.6f}."
             response += "\nUniform quantiles: when you want to pretend your ignorance is evenly distributed."
             await ctx.send(response)
@@ -191,8 +184,27 @@ def distributions_setup(bot):
             await ctx.send(f"Error: {str(e)}")
 
 
-    @bot.command(name='ci', help="Calculate confidence interval. Usage: !ci [type] [parameters]")
-    async def confidence_interval(ctx, ci_type: str, *args):
+    @commands.command(name='batch', help="Evaluate a distribution over a grid. Usage: !batch [distribution] [pdf|cdf|quantile] [start:stop:step or x1,x2,...] [parameters...]")
+    async def batch(self, ctx, distribution: str, function: str, grid: str, *params: float):
+        try:
+            distribution, function = distribution.lower(), function.lower()
+            points = parse_grid(grid)
+            values = await run_blocking(evaluate_batch, distribution, function, points, params)
+            x_name = 'p' if function == 'quantile' else 'x'
+            summary = f"{distribution} {function} at {points.size} points"
+            if points.size <= 25:
+                rows = "\n".join(f"{x:>12.6g}  {y:.6f}" for x, y in zip(points, values))
+                await ctx.send(f"Here's your {summary}. Copy it down, I'm not doing this twice.\n"
+                               f"```\n{x_name:>12}  {function}\n{rows}\n```")
+            else:
+                buf = await run_blocking(to_csv_bytes, [points, values], [x_name, function])
+                await ctx.send(f"Here's your {summary}. That's too many rows for a message, so enjoy the spreadsheet.",
+                               file=discord.File(buf, f'{distribution}_{function}.csv'))
+        except ValueError as e:
+            await ctx.send(f"Error: {str(e)}")
+
+    @commands.command(name='ci', help="Calculate confidence interval. Usage: !ci [type] [parameters]")
+    async def confidence_interval(self, ctx, ci_type: str, *args):
         try:
             if ci_type == "mean":
                 # !ci mean [sample_mean] [sample_std] [sample_size] [confidence_level]
@@ -201,7 +213,7 @@ def distributions_setup(bot):
                 validate_positive(n, "Sample size")
                 if not 0 < conf_level < 1:
                     raise commands.BadArgument("Confidence level must be between 0 and 1.")
-                margin = stats.t.ppf((1 + conf_level) / 2, n - 1) * (std / np.sqrt(n))
+                margin = t_ppf((1 + conf_level) / 2, n - 1) * (std / np.sqrt(n))
                 lower, upper = mean - margin, mean + margin
             elif ci_type == "proportion":
                 # !ci proportion [successes] [sample_size] [confidence_level]
@@ -211,7 +223,7 @@ def distributions_setup(bot):
                 if not 0 < conf_level < 1:
                     raise commands.BadArgument("Confidence level must be between 0 and 1.")
                 p = successes / n
-                margin = stats.norm.ppf((1 + conf_level) / 2) * np.sqrt(p * (1 - p) / n)
+                margin = norm_ppf((1 + conf_level) / 2) * np.sqrt(p * (1 - p) / n)
                 lower, upper = p - margin, p + margin
             elif ci_type == "difference":
                 # !ci difference [mean1] [std1] [n1] [mean2] [std2] [n2] [confidence_level]
@@ -223,13 +235,25 @@ def distributions_setup(bot):
                 if not 0 < conf_level < 1:
                     raise commands.BadArgument("Confidence level must be between 0 and 1.")
                 se = np.sqrt(std1**2 / n1 + std2**2 / n2)
-                margin = stats.t.ppf((1 + conf_level) / 2, n1 + n2 - 2) * se
+                margin = t_ppf((1 + conf_level) / 2, n1 + n2 - 2) * se
                 diff = mean1 - mean2
                 lower, upper = diff - margin, diff + margin
+            elif ci_type == "bootstrap":
+                # !ci bootstrap [statistic] [x1,x2,...] [confidence_level] [resamples] [seed]   (data may be file:column)
+                statistic, data, conf_level = args[:3]
+                conf_level = safe_float_conversion(conf_level)
+                resamples = int(args[3]) if len(args) > 3 else DEFAULT_RESAMPLES
+                seed = int(args[4]) if len(args) > 4 else None
+                values = await resolve_values(ctx, data)
+                progress = ProgressReporter(ctx, f"Bootstrapping the {statistic}")
+                estimate, lower, upper, seed = await bootstrap_ci(values, statistic, conf_level, resamples, seed, progress)
+                await progress.finish()
             else:
-                raise commands.BadArgument("Invalid CI type. Use 'mean', 'proportion', or 'difference'.")
+                raise commands.BadArgument("Invalid CI type. Use 'mean', 'proportion', 'difference' or 'bootstrap'.")
 
             result = f"{conf_level*100}% Confidence Interval: ({lower:.4f}, {upper:.4f})"
+            if ci_type == "bootstrap":
+                result += f"\nSample {statistic}: {estimate:.4f} ({resamples:,} resamples, seed {seed})"
             response = f"Ugh, fine. Here's your precious confidence interval:\n\n{result}\n\nHappy now? Don't expect me to interpret it for you."
             await ctx.send(response)
         except Exception as e:
@@ -238,4 +262,7 @@ def distributions_setup(bot):
 
 
     # Add other distribution commands (exponential, gamma, beta, uniform) here...
-    # The structure will be similar to the normal distribution command
\ No newline at end of file
+    # The structure will be similar to the normal distribution command
+
+async def setup(bot):
+    await bot.add_cog(Distributions(bot))
@@ -1,91 +1,130 @@
 # commands/probability.py
+import io
 import discord
 from discord.ext import commands
-from ..utils.calculations import factorial, combination, permutation, binomial_probability, poisson_probability
-from ..personality.responses import maho_response
+from ..utils.calculations import binomial_probability, poisson_probability
+from ..utils.combinatorics import exact, estimate_digits, log10_result, scientific, MAX_EXACT_DIGITS, MAX_INLINE_DIGITS
+from ..utils.executor import run_blocking
+from ..utils.simulation import flip_coins, roll_dice, dice_sum_counts, coarsen, text_histogram
 import numpy as np
 
-def probability_setup(bot):
-    @bot.command(name='factorial', help="Calculate factorial. Usage: !factorial [n]")
-    async def calc_factorial(ctx, n: int):
+class Probability(commands.Cog, name="Probability"):
+    """Combinatorics, discrete distributions and simulations."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def send_combinatorics(self, ctx, op, n, k, describe, quip):
         try:
-            result = factorial(n)
-            response = f"The factorial of {n} is {result}. Impressed? You shouldn't be, it's basic math."
-            await ctx.send(response)
+            digits = estimate_digits(op, n, k)
+            approx = scientific(log10_result(op, n, k))
+            if digits > MAX_EXACT_DIGITS:
+                await ctx.send(f"{describe} is about {approx}. That's roughly {digits:,} digits, "
+                               "and I'm not writing all of them out for you.")
+                return
+            result = await run_blocking(exact, op, n, k)
+            if len(result) <= MAX_INLINE_DIGITS:
+                await ctx.send(f"{describe} is {result}. {quip}")
+            else:
+                buf = io.BytesIO(result.encode('ascii'))
+                await ctx.send(f"{describe} is about {approx}, all {len(result):,} digits of it. "
+                               "The full number is attached, since it won't fit in a message.",
+                               file=discord.File(buf, f'{op}.txt'))
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
+        except OverflowError:
+            await ctx.send("Error: that number is too big even to estimate. Pick something smaller than the universe.")
+
+    @commands.command(name='factorial', help="Calculate factorial. Usage: !factorial [n]")
+    async def calc_factorial(self, ctx, n: int):
+        await self.send_combinatorics(ctx, 'factorial', n, None, f"The factorial of {n}",
+                                      "Impressed? You shouldn't be, it's basic math.")
 
-    @bot.command(name='combination', help="Calculate combinations. Usage: !combination [n] [k]")
-    async def calc_combination(ctx, n: int, k: int):
+    @commands.command(name='combination', help="Calculate combinations. Usage: !combination [n] [k]")
+    async def calc_combination(self, ctx, n: int, k: int):
+        await self.send_combinatorics(ctx, 'combination', n, k, f"The number of ways to choose {k} items from {n} items",
+                                      "Don't ask me to list them all.")
+
+    @commands.command(name='permutation', help="Calculate permutations. Usage: !permutation [n] [k]")
+    async def calc_permutation(self, ctx, n: int, k: int):
+        await self.send_combinatorics(ctx, 'permutation', n, k, f"The number of ways to arrange {k} items from {n} items",
+                                      "Good luck listing all of those.")
+
+    @commands.command(name='binomial', help="Calculate binomial probability. Usage: !binomial [n] [k] [p]")
+    async def calc_binomial(self, ctx, n: int, k: int, p: float):
         try:
-            result = combination(n, k)
-            response = f"The number of ways to choose {k} items from {n} items is {result}. Don't ask me to list them all."
+            result = binomial_probability(n, k, p)
+            response = f"The probability of {k} successes in {n} trials with p={p} is {result:.6f}. Don't bet on it though."
             await ctx.send(response)
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='permutation', help="Calculate permutations. Usage: !permutation [n] [k]")
-    async def calc_permutation(ctx, n: int, k: int):
+    @commands.command(name='poisson', help="Calculate Poisson probability. Usage: !poisson [k] [lambda]")
+    async def calc_poisson(self, ctx, k: int, lambda_: float):
         try:
-            result = permutation(n, k)
-            response = f"The number of ways to arrange {k} items from {n} items is {result}. Good luck listing all of those."
+            result = poisson_probability(k, lambda_)
+            response = f"The Poisson probability of {k} events with lambda={lambda_} is {result:.6f}. Feeling random yet?"
             await ctx.send(response)
         except ValueError as e:
             await ctx.send(f"Error: {str(e)}")
 
-    @bot.command(name='binomial', help="Calculate binomial probability. Usage: !binomial [n] [k] [p]")
-    async def calc_binomial(ctx, n: int, k: int, p: float):
+    @commands.command(name='coin_flip', help="Simulate coin flips. Usage: !coin_flip [number of flips] [seed (optional)]")
+    async def coin_flip(self, ctx, n: int, seed: int = None):
         try:
-            result = binomial_probability(n, k, p)
-            response = f"The probability of {k} successes in {n} trials with p={p} is {result:.6f}. Don't bet on it though."
+            heads, seed = await run_blocking(flip_coins, n, 0.5, seed)
+            tails = n - heads
+
+            response = f"Out of {n:,} coin flips:\n"
+            response += f"Heads: {heads:,} ({heads/n:.2%})\n"
+            response += f"Tails: {tails:,} ({tails/n:.2%})\n"
+            response += f"Seed: {seed}\n"
+            response += "What, did you expect it to be exactly 50-50? Welcome to real probability."
+
             await ctx.send(response)
         except ValueError as e:
-            await ctx.send(f"Error: {str(e)}")
+            await ctx.send(f"Error: {str(e)} I don't have all day, you know.")
 
-    @bot.command(name='poisson', help="Calculate Poisson probability. Usage: !poisson [k] [lambda]")
-    async def calc_poisson(ctx, k: int, lambda_: float):
+    @commands.command(name='dice_roll', help="Simulate dice rolls. Usage: !dice_roll [number of dice] [number of sides] [seed (optional)]")
+    async def dice_roll(self, ctx, dice: int, sides: int, seed: int = None):
+        if sides < 2 or sides > 100:
+            await ctx.send("Number of sides must be between 2 and 100. What kind of weird dice are you using?")
+            return
         try:
-            result = poisson_probability(k, lambda_)
-            response = f"The Poisson probability of {k} events with lambda={lambda_} is {result:.6f}. Feeling random yet?"
+            counts, seed = await run_blocking(roll_dice, dice, sides, seed)
+            total = int(np.dot(np.arange(1, sides + 1), counts))
+
+            response = f"Rolling {dice:,} {sides}-sided dice:\n"
+            response += f"```\n{text_histogram(coarsen(1, counts))}\n```\n"
+            response += f"Total: {total:,}\n"
+            response += f"Average roll: {total/dice:.2f}\n"
+            response += f"Seed: {seed}\n"
+            response += "Don't blame me if you didn't get the number you wanted."
+
             await ctx.send(response)
         except ValueError as e:
-            await ctx.send(f"Error: {str(e)}")
+            await ctx.send(f"Error: {str(e)} I'm not a casino, you know.")
 
-    @bot.command(name='coin_flip', help="Simulate coin flips. Usage: !coin_flip [number of flips]")
-    async def coin_flip(ctx, n: int):
-        if n <= 0 or n > 1000000:
-            await ctx.send("Number of flips must be between 1 and 1,000,000. I don't have all day, you know.")
-            return
-        
-        flips = np.random.choice(['H', 'T'], size=n)
-        heads = np.sum(flips == 'H')
-        tails = n - heads
-        
-        response = f"Out of {n} coin flips:\n"
-        response += f"Heads: {heads} ({heads/n:.2%})\n"
-        response += f"Tails: {tails} ({tails/n:.2%})\n"
-        response += "What, did you expect it to be exactly 50-50? Welcome to real probability."
-        
-        await ctx.send(response)
-
-    @bot.command(name='dice_roll', help="Simulate dice rolls. Usage: !dice_roll [number of dice] [number of sides]")
-    async def dice_roll(ctx, dice: int, sides: int):
-        if dice <= 0 or dice > 1000:
-            await ctx.send("Number of dice must be between 1 and 1,000. I'm not a casino, you know.")
-            return
+    @commands.command(name='dice_sums', help="Throw a handful of dice over and over and tally the totals. Usage: !dice_sums [number of dice] [number of sides] [throws] [seed (optional)]")
+    async def dice_sums(self, ctx, dice: int, sides: int, trials: int, seed: int = None):
         if sides < 2 or sides > 100:
             await ctx.send("Number of sides must be between 2 and 100. What kind of weird dice are you using?")
             return
-        
-        rolls = np.random.randint(1, sides + 1, size=dice)
-        total = np.sum(rolls)
-        
-        response = f"Rolling {dice} {sides}-sided dice:\n"
-        response += f"Individual rolls: {', '.join(map(str, rolls))}\n"
-        response += f"Total: {total}\n"
-        response += f"Average roll: {total/dice:.2f}\n"
-        response += "Don't blame me if you didn't get the number you wanted."
-        
-        await ctx.send(response)
-
-    # Add other probability commands here...
\ No newline at end of file
+        try:
+            counts, seed = await run_blocking(dice_sum_counts, dice, sides, trials, seed)
+            totals = np.arange(dice, dice * sides + 1)
+            mean = np.dot(totals, counts) / trials
+
+            response = f"Throwing {dice:,} {sides}-sided dice {trials:,} times:\n"
+            response += f"```\n{text_histogram(coarsen(dice, counts))}\n```\n"
+            response += f"Average total: {mean:.3f} (expected {dice * (sides + 1) / 2:g})\n"
+            response += f"Seed: {seed}\n"
+            response += "See that bell shape? That's the central limit theorem, showing off."
+
+            await ctx.send(response)
+        except Exception as e:
+            await ctx.send(f"Error simulating dice: {str(e)}. Even randomness has limits.")
+
+    # Add other probability commands here...
+
+async def setup(bot):
+    await bot.add_cog(Probability(bot))
@@ -0,0 +1,45 @@
+# commands/sessions.py
+from discord.ext import commands
+from ..utils.datasets import load_dataset
+from ..utils.sessions import get_sessions
+
+class Sessions(commands.Cog, name="Datasets"):
+    """Datasets kept between commands, referred to as @name."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name='load', help="Keep data for later commands as @name. Usage: !load [name] [data1,data2,...|file:column|file]")
+    async def load(self, ctx, name: str, data: str = None):
+        try:
+            dataset = await load_dataset(ctx, name, data)
+            columns = list(dataset.columns)
+            example = f"@{name}" if len(columns) == 1 else f"@{name}:{columns[0]}"
+            hours = get_sessions().ttl / 3600
+            await ctx.send(f"Loaded @{name}: {dataset.rows:,} rows, {len(columns)} column(s) ({', '.join(columns)}), "
+                           f"{dataset.nbytes / 2 ** 20:.1f} MiB. Write {example} instead of the data in any command. "
+                           f"I'll forget it {hours:g} hour(s) after you last use it, so don't get attached.")
+        except Exception as e:
+            await ctx.send(f"Error loading data: {str(e)}. I can't remember what you never gave me.")
+
+    @commands.command(name='datasets', help="List the datasets you have loaded. Usage: !datasets")
+    async def datasets(self, ctx):
+        loaded = get_sessions().owned_by(ctx.author.id)
+        if not loaded:
+            await ctx.send("You haven't loaded anything. Try !load name 1,2,3 first.")
+            return
+        lines = [f"@{dataset.name:<16} {dataset.rows:>10,} rows  {dataset.nbytes / 2 ** 20:>7.1f} MiB  "
+                 f"{', '.join(dataset.columns)}" for dataset in loaded]
+        result = '\n'.join(lines)
+        await ctx.send(f"Everything you've made me remember:\n```\n{result}\n```")
+
+    @commands.command(name='unload', help="Forget a loaded dataset. Usage: !unload [name]")
+    async def unload(self, ctx, name: str):
+        try:
+            get_sessions().remove(ctx.author.id, name.lstrip('@'))
+            await ctx.send(f"Forgot @{name.lstrip('@')}. Already, honestly.")
+        except Exception as e:
+            await ctx.send(f"Error unloading: {str(e)}. Can't forget what I never knew.")
+
+async def setup(bot):
+    await bot.add_cog(Sessions(bot))
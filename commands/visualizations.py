@@ -1,76 +1,76 @@
 # commands/visualizations.py
 import discord
 from discord.ext import commands
-from ..utils.calculations import safe_float_conversion
-from ..utils.plotting import *
-import matplotlib.pyplot as plt
+from ..utils.datasets import resolve_values, resolve_groups, resolve_linear_model
+from ..utils.bivariate import BivariateMoments
+from ..utils.executor import run_blocking
+from ..utils.render_service import render
 from ..personality.responses import maho_response
-from scipy import stats
 
-def visualizations_setup(bot):
-    @bot.command(name='scatter', help="Create a scatter plot. Usage: !scatter [x1,x2,...] [y1,y2,...]")
-    async def scatter_plot(ctx, x_data: str, y_data: str):
+# Coefficient rows shown by !mlr; Discord messages are capped at 2000 characters.
+MLR_MAX_ROWS = 20
+
+class Visualizations(commands.Cog, name="Visualizations"):
+    """Scatter plots, box plots, regression lines and models."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.command(name='scatter', help="Create a scatter plot. Usage: !scatter [x1,x2,...] [y1,y2,...]")
+    async def scatter_plot(self, ctx, x_data: str, y_data: str):
         try:
-            x = [safe_float_conversion(x) for x in x_data.split(',')]
-            y = [safe_float_conversion(y) for y in y_data.split(',')]
+            x = await resolve_values(ctx, x_data)
+            y = await resolve_values(ctx, y_data)
             if len(x) != len(y):
                 raise ValueError("X and Y must have the same number of elements. Can't you count?")
             
-            fig = plot_3b1b_scatter(x, y, "Scatter Plot")
-            buf = save_plot_as_bytes(fig)
+            buf = await render('scatter', x, y, "Scatter Plot")
             await ctx.send("Here's your scatter plot. Try not to get lost in the dots.", 
-                           file=discord.File(buf, 'scatter_plot.png'))
-            plt.close(fig)
+                           file=discord.File(buf, buf.filename('scatter_plot')))
         except Exception as e:
             await ctx.send(f"Error creating scatter plot: {str(e)}. Did you forget how to input data correctly?")
 
-    @bot.command(name='boxplot', help="Create a box plot. Usage: !boxplot [group1: x1,x2,...] [group2: y1,y2,...] ...")
-    async def boxplot(ctx, *args):
+    @commands.command(name='boxplot', help="Create a box plot. Usage: !boxplot [group1: x1,x2,...] [group2: y1,y2,...] ...")
+    async def boxplot(self, ctx, *args):
         try:
-            data = [list(map(safe_float_conversion, group.split(':')[1].split(','))) for group in args]
-            labels = [group.split(':')[0] for group in args]
-            fig = plot_3b1b_boxplot(data, labels, "Box Plot of Groups")
-            buf = save_plot_as_bytes(fig)
+            labels, data = await resolve_groups(ctx, args)
+            buf = await render('boxplot', data, labels, "Box Plot of Groups")
             await ctx.send("Here's your box plot. Try not to get lost in the boxes.", 
-                           file=discord.File(buf, 'boxplot.png'))
-            plt.close(fig)
+                           file=discord.File(buf, buf.filename('boxplot')))
         except Exception as e:
             await ctx.send(f"Error creating box plot: {str(e)}. Maybe stick to simple bar graphs?")
 
-    @bot.command(name='correlation', help="Calculate Pearson correlation coefficient. Usage: !correlation [x1,x2,...] [y1,y2,...]")
-    async def correlation(ctx, x_data: str, y_data: str):
+    @commands.command(name='correlation', help="Calculate Pearson correlation coefficient. Usage: !correlation [x1,x2,...] [y1,y2,...]")
+    async def correlation(self, ctx, x_data: str, y_data: str):
         try:
-            x = [safe_float_conversion(x) for x in x_data.split(',')]
-            y = [safe_float_conversion(y) for y in y_data.split(',')]
+            x = await resolve_values(ctx, x_data)
+            y = await resolve_values(ctx, y_data)
             if len(x) != len(y):
                 raise ValueError("X and Y must have the same number of elements. Can't correlate apples with oranges, you know?")
             
-            r, p = stats.pearsonr(x, y)
+            moments = await run_blocking(BivariateMoments.from_values, x, y)
+            r, p = moments.pearson()
             result = f"Pearson correlation coefficient: {r:.4f}\nP-value: {p:.4f}"
             conclusion = "significant correlation" if p < 0.05 else "no significant correlation"
             
             response = maho_response("Pearson correlation", result, conclusion)
             
-            fig = plot_3b1b_scatter(x, y, "Correlation Scatter Plot")
-            ax = fig.gca()
-            ax.set_xlabel('X')
-            ax.set_ylabel('Y')
-            
-            buf = save_plot_as_bytes(fig)
-            await ctx.send(response, file=discord.File(buf, 'correlation_plot.png'))
-            plt.close(fig)
+            buf = await render('scatter', x, y, "Correlation Scatter Plot",
+                               xlabel='X', ylabel='Y')
+            await ctx.send(response, file=discord.File(buf, buf.filename('correlation_plot')))
         except Exception as e:
             await ctx.send(f"Error calculating correlation: {str(e)}. Did you forget how to input data correctly?")
 
-    @bot.command(name='regression', help="Perform simple linear regression. Usage: !regression [x1,x2,...] [y1,y2,...]")
-    async def regression(ctx, x_data: str, y_data: str):
+    @commands.command(name='regression', help="Perform simple linear regression. Usage: !regression [x1,x2,...] [y1,y2,...]")
+    async def regression(self, ctx, x_data: str, y_data: str):
         try:
-            x = np.array([safe_float_conversion(x) for x in x_data.split(',')])
-            y = np.array([safe_float_conversion(y) for y in y_data.split(',')])
+            x = await resolve_values(ctx, x_data)
+            y = await resolve_values(ctx, y_data)
             if len(x) != len(y):
                 raise ValueError("X and Y must have the same number of elements. Are you trying to confuse me?")
             
-            slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
+            moments = await run_blocking(BivariateMoments.from_values, x, y)
+            slope, intercept, r_value, p_value, std_err = moments.linregress()
             
             result = f"Slope: {slope:.4f}\nIntercept: {intercept:.4f}\n"
             result += f"R-squared: {r_value**2:.4f}\np-value: {p_value:.4f}"
@@ -78,19 +78,33 @@ def visualizations_setup(bot):
             
             response = maho_response("Linear regression", result, conclusion)
             
-            setup_3b1b_style()
-            fig, ax = plt.subplots(figsize=(10, 6))
-            ax.scatter(x, y, color='#FFB26B', alpha=0.7)
-            ax.plot(x, intercept + slope*x, color='#FF7B54', label='Regression line')
-            ax.set_xlabel('X')
-            ax.set_ylabel('Y')
-            ax.set_title('Linear Regression (try to follow the line)', fontsize=16, pad=20)
-            ax.legend()
-            
-            buf = save_plot_as_bytes(fig)
-            await ctx.send(response, file=discord.File(buf, 'regression_plot.png'))
-            plt.close(fig)
+            buf = await render('regression', x, y, slope, intercept)
+            await ctx.send(response, file=discord.File(buf, buf.filename('regression_plot')))
         except Exception as e:
             await ctx.send(f"Error performing regression: {str(e)}. Maybe stick to drawing lines by hand?")
 
-    # Add other visualization commands here...
\ No newline at end of file
+    @commands.command(name='mlr', help="Multiple linear regression on an attached table; wrap categorical columns in C(). Usage: !mlr [response] [x1,x2,C(group),...] [auto|qr|normal|sparse]")
+    async def multiple_regression(self, ctx, response: str, predictors: str, solver: str = 'auto'):
+        try:
+            fit = await resolve_linear_model(ctx, response, predictors, solver.lower())
+            width = min(20, max(len(name) for name in fit.names[:MLR_MAX_ROWS]))
+            lines = [f"{'term':<{width}} {'estimate':>12} {'std. err':>12} {'p-value':>8}"]
+            lines += [f"{name[:width]:<{width}} {coefficient:>12.4g} {stderr:>12.4g} {p:>8.4f}"
+                      for name, coefficient, stderr, p, _ in zip(fit.names, fit.coefficients, fit.stderr,
+                                                                 fit.p_values, range(MLR_MAX_ROWS))]
+            if len(fit.names) > MLR_MAX_ROWS:
+                lines.append(f"... and {len(fit.names) - MLR_MAX_ROWS} more terms I'm not listing")
+            lines += ["",
+                      f"R-squared: {fit.r_squared:.4f} (adjusted {fit.adj_r_squared:.4f})",
+                      f"F-statistic: {fit.f_statistic:.4f}, p-value: {fit.f_p_value:.4f}",
+                      f"Rows: {fit.n:,}, solver: {fit.solver}"]
+            result = "```\n" + '\n'.join(lines) + "\n```"
+            conclusion = "significant relationship" if fit.f_p_value < 0.05 else "no significant relationship"
+            await ctx.send(maho_response("Multiple regression", result, conclusion))
+        except Exception as e:
+            await ctx.send(f"Error fitting the model: {str(e)}. More predictors won't fix a bad question.")
+
+    # Add other visualization commands here...
+
+async def setup(bot):
+    await bot.add_cog(Visualizations(bot))
@@ -0,0 +1,192 @@
+# launcher.py
+"""Run Mekako as several shard processes sharing one render/compute backend.
+
+Run it as part of the package, from the directory containing the checkout:
+
+    python -m mekako.launcher          # connect to Discord
+    python -m mekako.launcher --mock   # run a scripted session per shard, no Discord needed
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import secrets
+import signal
+import sys
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GATEWAY_URL = 'https://discord.com/api/v10/gateway/bot'
+
+# Commands each shard runs in --mock mode.
+MOCK_SCRIPT = (
+    '!mean 1,2,3,4,5',
+    '!describe 1,2,3,4,5,6,7,8,9,10',
+    '!factorial 25',
+    '!coin_flip 1000 42',
+    '!histogram 1,2,2,3,3,3,4,4,5',
+    '!extensions',
+    '!nonsense',
+    '!botstats',
+)
+
+
+def fetch_shard_count(token):
+    """Ask Discord how many shards it recommends for this bot."""
+    import aiohttp
+
+    async def fetch():
+        async with aiohttp.ClientSession() as session:
+            async with session.get(GATEWAY_URL, headers={'Authorization': f'Bot {token}'}) as response:
+                response.raise_for_status()
+                return (await response.json())['shards']
+
+    return asyncio.run(fetch())
+
+
+def split_shards(shard_count, processes):
+    """Split shard ids 0..shard_count-1 into ``processes`` contiguous ranges."""
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for i in range(processes):
+        end = start + size + (i < extra)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+async def run_mock_session(shard_ids, shard_count):
+    from .main import create_bot
+    from .utils.mock_gateway import MockGateway, guild_for_shard
+
+    bot = create_bot(shard_ids=shard_ids, shard_count=shard_count)
+    # The scripted users own the mock bot, so owner-only commands run too.
+    bot.owner_ids = {guild_for_shard(shard_id, shard_count) + 2 for shard_id in shard_ids}
+    gateway = MockGateway(bot)
+    await gateway.start()
+    for shard_id in shard_ids:
+        guild_id = guild_for_shard(shard_id, shard_count)
+        for content in MOCK_SCRIPT:
+            for reply in await gateway.send(content, guild_id=guild_id, channel_id=guild_id + 1,
+                                            user_id=guild_id + 2):
+                files = ', '.join(f'{name} ({len(data):,} bytes)' for name, data in reply.files)
+                print(f'[shard {shard_id}] {content} -> {reply.content or ""}{" [" + files + "]" if files else ""}',
+                      flush=True)
+
+
+def run_shard_process(shard_ids, shard_count, mock=False):
+    """Entry point of one worker process."""
+    if mock:
+        asyncio.run(run_mock_session(shard_ids, shard_count))
+        return
+    from .main import create_bot
+    create_bot(shard_ids=shard_ids, shard_count=shard_count).run(os.getenv('DISCORD_TOKEN'))
+
+
+class Launcher:
+    """Starts the shared backend and one process per shard range, restarting crashed ones.
+
+    A worker that exits on its own is restarted with exponential backoff
+    (reset once it has stayed up for a minute). In mock mode workers are
+    expected to exit, and the launcher stops once they all have.
+    """
+
+    def __init__(self, shard_ranges, shard_count, stagger=5.0, mock=False):
+        self.shard_ranges = shard_ranges
+        self.shard_count = shard_count
+        self.stagger = stagger
+        self.mock = mock
+        self.metrics_port = int(os.getenv('MEKAKO_METRICS_PORT') or 0)
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = {}
+        self._backoff = {}
+        self._stopping = False
+
+    def _spawn(self, index):
+        if self.metrics_port:
+            # Each process exports its own metrics, on consecutive ports.
+            os.environ['MEKAKO_METRICS_PORT'] = str(self.metrics_port + index)
+        process = self._context.Process(
+            target=run_shard_process,
+            args=(self.shard_ranges[index], self.shard_count, self.mock),
+            name=f'mekako-shards-{index}',
+        )
+        process.start()
+        self._workers[index] = (process, time.monotonic())
+        print(f'Started shards {self.shard_ranges[index]} in process {process.pid}', flush=True)
+
+    def stop(self, *_):
+        self._stopping = True
+
+    def run(self):
+        authkey = secrets.token_bytes(32)
+        from .utils.backend import start_backend, backend_env
+        manager = start_backend(authkey)
+        # Spawned workers inherit this environment, so their executors go remote.
+        os.environ.update(backend_env(manager, authkey))
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        try:
+            for index in range(len(self.shard_ranges)):
+                if index and not self.mock:
+                    # Discord only lets a bot identify so often.
+                    time.sleep(self.stagger)
+                self._spawn(index)
+            self._supervise()
+        finally:
+            for process, _ in self._workers.values():
+                if process.is_alive():
+                    process.terminate()
+            for process, _ in self._workers.values():
+                process.join(10)
+            manager.backend().shutdown()
+            manager.shutdown()
+
+    def _supervise(self):
+        restart_at = {}
+        while not self._stopping and self._workers:
+            time.sleep(0.5)
+            now = time.monotonic()
+            for index, (process, started) in list(self._workers.items()):
+                if process.is_alive():
+                    continue
+                if self.mock:
+                    del self._workers[index]
+                    if process.exitcode:
+                        print(f'Mock shards {self.shard_ranges[index]} failed with exit code {process.exitcode}',
+                              file=sys.stderr, flush=True)
+                    continue
+                if index not in restart_at:
+                    backoff = 1.0 if now - started > 60 else min(2 * self._backoff.get(index, 0.5), 60.0)
+                    self._backoff[index] = backoff
+                    restart_at[index] = now + backoff
+                    print(f'Shards {self.shard_ranges[index]} exited with code {process.exitcode}; '
+                          f'restarting in {backoff:.0f}s', file=sys.stderr, flush=True)
+                elif now >= restart_at[index]:
+                    del restart_at[index]
+                    self._spawn(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mock', action='store_true', help='run a scripted session against a mock gateway')
+    args = parser.parse_args()
+
+    shard_count = os.getenv('MEKAKO_SHARD_COUNT')
+    if shard_count:
+        shard_count = int(shard_count)
+    elif args.mock:
+        shard_count = 2
+    else:
+        shard_count = fetch_shard_count(os.getenv('DISCORD_TOKEN'))
+    processes = int(os.getenv('MEKAKO_SHARD_PROCESSES') or min(os.cpu_count() or 1, shard_count))
+    stagger = float(os.getenv('MEKAKO_SHARD_STAGGER', '5'))
+
+    Launcher(split_shards(shard_count, processes), shard_count, stagger, args.mock).run()
+
+
+if __name__ == '__main__':
+    main()
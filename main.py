@@ -1,54 +1,105 @@
 # main.py
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 import discord
 from discord.ext import commands
-from commands import setup_commands
-from utils.intents import get_intent
-from personality.responses import GREETINGS, CONFUSED
+from .commands import setup_commands
+from .utils.intents import match_intent
+from .utils.admission import AdmissionRejected
+from .utils.lazy import prewarm
+from .utils.metrics import TimedContext, mark_prepared, record_error, start_exporter, timed_invoke
+from .utils.render_service import get_render_service
+from .personality.responses import GREETINGS, CONFUSED
 import random
 
 # Load environment variables
 load_dotenv()
 
-intents = discord.Intents.default()
-intents.message_content = True
+# Heavy libraries are imported on first use; once connected, load them in
+# the background so the first command after a restart is quick anyway.
+PREWARM_MODULES = ('scipy.stats', 'scipy.special')
+_prewarm_task = None
 
-bot = commands.Bot(command_prefix='!', intents=intents)
+log = logging.getLogger(__name__)
 
-@bot.event
-async def on_ready():
-    print(f'{bot.user} has connected to Discord!')
-    await bot.change_presence(activity=discord.Game(name="!help for commands"))
+async def prewarm_services():
+    # Nobody awaits this task, so say why it failed; commands still load
+    # what they need on first use.
+    try:
+        await prewarm(PREWARM_MODULES)
+        await get_render_service().prewarm()
+    except Exception:
+        log.exception("Prewarming failed")
 
-@bot.event
-async def on_message(message):
-    if message.author == bot.user:
-        return
+class Mekako(commands.AutoShardedBot):
+    metrics_server = None
 
-    if bot.user.mentioned_in(message):
-        content = message.content.lower()
-        intent = get_intent(content)
-        
-        if intent:
-            response = intent.get_response(content)
-            await message.channel.send(response)
-        else:
-            await message.channel.send(random.choice(CONFUSED))
+    async def setup_hook(self):
+        await setup_commands(self)
+        self.before_invoke(mark_prepared)
+        self.metrics_server = await start_exporter()
+
+    async def get_context(self, origin, *, cls=TimedContext):
+        return await super().get_context(origin, cls=cls)
+
+    async def invoke(self, ctx):
+        await timed_invoke(ctx, super().invoke)
+
+def create_bot(shard_ids=None, shard_count=None):
+    """Build the bot for the given shards, or for every shard when none are given.
+
+    launcher.py calls this once per worker process with that process's
+    shard range.
+    """
+    intents = discord.Intents.default()
+    intents.message_content = True
+
+    bot = Mekako(command_prefix='!', intents=intents, shard_ids=shard_ids, shard_count=shard_count)
 
-    await bot.process_commands(message)
+    @bot.event
+    async def on_ready():
+        print(f'{bot.user} has connected to Discord! Shards: {sorted(bot.shards)}')
+        await bot.change_presence(activity=discord.Game(name="!help for commands"))
+        global _prewarm_task
+        if _prewarm_task is None and os.getenv("MEKAKO_PREWARM", "1") != "0":
+            _prewarm_task = asyncio.create_task(prewarm_services())
+
+    @bot.event
+    async def on_message(message):
+        if message.author == bot.user:
+            return
+
+        if bot.user.mentioned_in(message):
+            content = message.content.lower()
+            intent, term = match_intent(content)
+            
+            if intent:
+                response = intent.get_response(content, term)
+                await message.channel.send(response)
+            else:
+                await message.channel.send(random.choice(CONFUSED))
+
+        await bot.process_commands(message)
+
+    @bot.event
+    async def on_command_error(ctx, error):
+        record_error(ctx, error)
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send("Missing argument? Really? Check the command usage with !help [command]. I don't have all day to explain this.")
+        elif isinstance(error, commands.BadArgument):
+            await ctx.send(f"Invalid argument: {str(error)}. Is it really that hard to enter the correct type? Check !help [command] if you're confused.")
+        elif isinstance(error, AdmissionRejected):
+            await ctx.send(f"Slow down. {str(error)} I'm a genius, not a factory.")
+        elif isinstance(error, commands.NotOwner):
+            await ctx.send("Nice try. Only my owner gets to mess with my insides.")
+        elif isinstance(error, commands.CommandNotFound):
+            await ctx.send("Unknown command. Use !help to see available commands. Don't make me repeat myself.")
+        else:
+            await ctx.send(f"Ugh, an error occurred: {str(error)}. Happy now?")
 
-@bot.event
-async def on_command_error(ctx, error):
-    if isinstance(error, commands.MissingRequiredArgument):
-        await ctx.send("Missing argument? Really? Check the command usage with !help [command]. I don't have all day to explain this.")
-    elif isinstance(error, commands.BadArgument):
-        await ctx.send(f"Invalid argument: {str(error)}. Is it really that hard to enter the correct type? Check !help [command] if you're confused.")
-    elif isinstance(error, commands.CommandNotFound):
-        await ctx.send("Unknown command. Use !help to see available commands. Don't make me repeat myself.")
-    else:
-        await ctx.send(f"Ugh, an error occurred: {str(error)}. Happy now?")
+    return bot
 
 if __name__ == '__main__':
-    setup_commands(bot)
-    bot.run(os.getenv('DISCORD_TOKEN'))
\ No newline at end of file
+    create_bot().run(os.getenv('DISCORD_TOKEN'))
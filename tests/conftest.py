@@ -0,0 +1,42 @@
+# tests/conftest.py
+import asyncio
+import importlib
+import os
+import sys
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(REPO_ROOT)
+
+# Tests send commands back to back, faster than the default rate limits allow.
+for scope in ('USER', 'CHANNEL', 'GUILD'):
+    os.environ.setdefault(f'MEKAKO_{scope}_RATE', '1e9')
+    os.environ.setdefault(f'MEKAKO_{scope}_BURST', '1e9')
+
+def _load(module):
+    # The bot's modules use package-relative imports, so the repository is
+    # imported as a package from its parent directory, as in benchmarks/harness.py.
+    parent = os.path.dirname(REPO_ROOT)
+    if parent not in sys.path:
+        sys.path.insert(0, parent)
+    return importlib.import_module(f"{PACKAGE}.{module}")
+
+@pytest.fixture
+def load():
+    return _load
+
+@pytest.fixture
+def send_commands():
+    """Run ``contents`` through a fresh bot on the mock gateway; returns each message's Replies."""
+    def send(*contents, user_id=1, owner_id=None, attachments=()):
+        bot = _load('main').create_bot()
+        bot.owner_id = owner_id
+        gateway = _load('utils.mock_gateway').MockGateway(bot)
+
+        async def session():
+            await gateway.start()
+            return [await gateway.send(content, user_id=user_id, attachments=attachments)
+                    for content in contents]
+
+        return asyncio.run(session())
+    return send
@@ -0,0 +1,9 @@
+# tests/test_admin.py
+
+def test_botstats_refuses_non_owners(send_commands):
+    (reply,), = send_commands('!botstats', user_id=2, owner_id=1)
+    assert reply.content.startswith('Nice try')
+
+def test_botstats_answers_the_owner(send_commands):
+    _, (reply,) = send_commands('!factorial 5', '!botstats', user_id=1, owner_id=1)
+    assert reply.content.startswith('Latency in ms')
@@ -0,0 +1,15 @@
+# tests/test_backend.py
+import os
+import secrets
+import pytest
+
+def test_backend_shutdown_stops_pool_workers(load):
+    backend = load('utils.backend')
+    manager = backend.start_backend(secrets.token_bytes(32))
+    try:
+        worker = manager.backend().run(os.getpid, (), {})
+        manager.backend().shutdown()
+    finally:
+        manager.shutdown()
+    with pytest.raises(ProcessLookupError):
+        os.kill(worker, 0)
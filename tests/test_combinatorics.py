@@ -0,0 +1,16 @@
+# tests/test_combinatorics.py
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+def test_primes_upto_from_several_threads(load):
+    combinatorics = load('utils.combinatorics')
+    limits = [10 ** 3, 10 ** 5, 10 ** 4, 10 ** 6, 10 ** 2, 10 ** 5] * 4
+    with ThreadPoolExecutor(8) as pool:
+        counts = list(pool.map(lambda n: combinatorics._primes_upto(n).size, limits))
+    expected = {10 ** 2: 25, 10 ** 3: 168, 10 ** 4: 1229, 10 ** 5: 9592, 10 ** 6: 78498}
+    assert counts == [expected[n] for n in limits]
+    assert np.all(np.diff(combinatorics._primes_upto(10 ** 6)) > 0)
+
+def test_factorial_too_large_to_estimate(send_commands):
+    (reply,), = send_commands('!factorial ' + '9' * 400)
+    assert reply.content.startswith('Error:')
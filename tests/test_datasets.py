@@ -0,0 +1,23 @@
+# tests/test_datasets.py
+import pytest
+
+@pytest.fixture
+def header_only(load):
+    return [load('utils.mock_gateway').FakeAttachment('data.csv', b'a\n')]
+
+def test_moments_of_an_empty_column_are_refused(load):
+    datasets = load('utils.datasets')
+    with pytest.raises(ValueError, match="empty"):
+        datasets.summarize_column(b'a\n', 'csv', 'a')
+
+@pytest.mark.parametrize('command', ['!mean file:a', '!describe file:a'])
+def test_commands_report_an_empty_attachment(send_commands, header_only, command):
+    (reply,), = send_commands(command, attachments=header_only)
+    assert 'empty' in reply.content
+
+def test_session_quantiles_honour_the_mode(send_commands):
+    data = ','.join(str(i) for i in range(1, 102))
+    _, (approx,), (exact,) = send_commands(f'!load d {data}', '!median @d approx', '!median @d exact')
+    assert 'Approximated' in approx.content
+    assert 'The median is 51.0000' in exact.content
+    assert 'Approximated' not in exact.content
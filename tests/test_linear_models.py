@@ -0,0 +1,30 @@
+# tests/test_linear_models.py
+import numpy as np
+import pytest
+
+@pytest.fixture
+def linear_models(load):
+    return load('utils.linear_models')
+
+def test_solvers_agree_on_predictors_of_very_different_scales(linear_models):
+    rng = np.random.default_rng(0)
+    n = 10_000
+    income = rng.normal(50_000, 20_000, n)
+    rate = rng.normal(0.05, 0.02, n)
+    y = 3.0 + 0.0004 * income - 150.0 * rate + rng.normal(0, 1, n)
+    numeric = np.column_stack([income, rate])
+
+    fits = {solver: linear_models.fit_arrays(y, numeric, ['income', 'rate'], solver=solver)
+            for solver in ('qr', 'normal', 'sparse')}
+    for solver in ('normal', 'sparse'):
+        assert fits[solver].solver == solver
+        np.testing.assert_allclose(fits[solver].coefficients, fits['qr'].coefficients, rtol=1e-6)
+        np.testing.assert_allclose(fits[solver].stderr, fits['qr'].stderr, rtol=1e-6)
+
+def test_normal_equations_still_reject_collinear_predictors(linear_models):
+    rng = np.random.default_rng(1)
+    x = rng.normal(0, 1e4, 1000)
+    numeric = np.column_stack([x, 2 * x])
+    for solver in ('qr', 'normal', 'sparse'):
+        with pytest.raises(ValueError, match="exact combinations"):
+            linear_models.fit_arrays(x + rng.normal(size=x.size), numeric, ['a', 'b'], solver=solver)
@@ -0,0 +1,10 @@
+# tests/test_mock_gateway.py
+
+def test_launcher_imports_through_the_package(load):
+    launcher = load('launcher')
+    assert launcher.split_shards(5, 2) == [[0, 1, 2], [3, 4]]
+
+def test_mock_session_runs_commands(send_commands):
+    factorial, unknown = send_commands('!factorial 5', '!nonsense')
+    assert '120' in factorial[0].content
+    assert unknown[0].content.startswith('Unknown command')
@@ -0,0 +1,10 @@
+# tests/test_render_service.py
+import asyncio
+
+def test_prewarm_with_more_workers_than_queue_slots(load):
+    render_service = load('utils.render_service')
+    service = render_service.RenderService(workers=20, max_pending=4, backend='thread')
+    try:
+        asyncio.run(service.prewarm())
+    finally:
+        service.shutdown()
@@ -0,0 +1,31 @@
+# tests/test_resampling.py
+import asyncio
+import numpy as np
+import pytest
+
+@pytest.fixture
+def resampling(load):
+    return load('utils.resampling')
+
+@pytest.mark.parametrize('test, x, y', [
+    ('pearson', [3, 3, 3, 3], [1, 2, 3, 4]),
+    ('pearson', [1, 2, 3, 4], [5, 5, 5, 5]),
+    ('ttest2', [2, 2, 2], [7, 7, 7]),
+])
+def test_permutation_test_rejects_zero_spread(resampling, test, x, y):
+    with pytest.raises(ValueError, match="constant"):
+        asyncio.run(resampling.permutation_test(test, x, y, resamples=99, seed=1))
+
+def test_ttest2_allows_one_constant_group(resampling):
+    statistic, p_value, _ = asyncio.run(
+        resampling.permutation_test('ttest2', [2, 2, 2, 2], [1, 3, 5, 7], resamples=99, seed=1))
+    assert np.isfinite(statistic)
+    assert p_value > 1 / 100
+
+def test_process_pool_is_spawned(load):
+    executor = load('utils.executor').ComputeExecutor(backend='process', max_workers=1)
+    pool = executor._get_pool()
+    try:
+        assert pool._mp_context.get_start_method() == 'spawn'
+    finally:
+        executor.shutdown()
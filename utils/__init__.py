@@ -1,5 +1,15 @@
 # utils/__init__.py
-from .calculations import *
-from .plotting import *
-from .validators import *
-from .intents import *
\ No newline at end of file
+import importlib
+
+# The helpers used to be star-imported here, which pulled scipy and
+# matplotlib into every import of any utils module. Names are now looked
+# up in these modules on first access instead.
+_REEXPORTED = ('calculations', 'plotting', 'validators', 'intents')
+
+def __getattr__(name):
+    if not name.startswith('_'):
+        for module_name in _REEXPORTED:
+            module = importlib.import_module(f'.{module_name}', __name__)
+            if hasattr(module, name):
+                return getattr(module, name)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
@@ -0,0 +1,229 @@
+# utils/admission.py
+import asyncio
+import os
+import time
+from discord.ext import commands
+from .metrics import get_metrics, span
+
+# Relative cost of each command in tokens. Anything not listed costs
+# DEFAULT_COST; plots and simulations are the expensive ones.
+DEFAULT_COST = 1
+COMMAND_COSTS = {
+    'help': 0,
+    'factorial': 1,
+    'combination': 1,
+    'permutation': 1,
+    'mean': 1,
+    'median': 2,
+    'percentile': 2,
+    'describe': 2,
+    'batch': 3,
+    'coin_flip': 3,
+    'dice_roll': 3,
+    'dice_sums': 5,
+    'histogram': 5,
+    'scatter': 5,
+    'boxplot': 5,
+    'correlation': 5,
+    'regression': 5,
+    'mlr': 5,
+    'load': 3,
+    'normal': 5,
+    'exponential': 5,
+    'gamma': 5,
+    'beta': 5,
+    'uniform': 5,
+    't_dist': 5,
+    'f_dist': 5,
+    'chi2_dist': 5,
+    'ttest': 5,
+    'ztest': 5,
+    'chisquare': 5,
+    'ci': 3,
+    'permtest': 5,
+}
+
+SCOPES = ('user', 'channel', 'guild')
+
+
+class AdmissionRejected(commands.CommandError):
+    """Raised when a command is shed; ``retry_after`` is in seconds."""
+
+    def __init__(self, scope, retry_after):
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(f"Too many commands from this {scope}. Try again in {retry_after:.1f}s.")
+
+
+class TokenBucket:
+    """Refills at ``rate`` tokens per second up to ``capacity``.
+
+    Tokens may be reserved ahead of time, leaving the bucket in debt; later
+    callers then see a longer wait, so queued commands are admitted in the
+    order they reserved.
+    """
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost, now):
+        """Seconds until ``cost`` tokens are available; 0 if they are now."""
+        self._refill(now)
+        cost = min(cost, self.capacity)
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def take(self, cost, now):
+        self._refill(now)
+        self.tokens -= min(cost, self.capacity)
+
+    def is_full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class AdmissionController:
+    """Token buckets per user, channel and guild in front of every command.
+
+    A command is admitted immediately when all of its buckets have enough
+    tokens. Otherwise it is queued for up to ``max_wait`` seconds, with each
+    user allowed only one queued command at a time so nobody can fill the
+    queue on their own. Anything that would wait longer, or that arrives
+    while the queue is full, is rejected with the time after which it would
+    have been admitted.
+    """
+
+    def __init__(self, limits, max_wait=5.0, max_queue=50, max_buckets=10000, clock=time.monotonic):
+        self.limits = limits
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.max_buckets = max_buckets
+        self._clock = clock
+        self._buckets = {scope: {} for scope in SCOPES}
+        self._waiting_users = set()
+        self.stats = {
+            'admitted': 0,
+            'queued': 0,
+            'rejected': 0,
+            'shed_cost': 0,
+            'queue_seconds': 0.0,
+            'rejected_by_scope': {scope: 0 for scope in SCOPES},
+        }
+
+    def _bucket(self, scope, key, now):
+        buckets = self._buckets[scope]
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= self.max_buckets:
+                self._prune(buckets, now)
+            rate, capacity = self.limits[scope]
+            bucket = buckets[key] = TokenBucket(rate, capacity, now)
+        return bucket
+
+    @staticmethod
+    def _prune(buckets, now):
+        # A full bucket carries no state worth keeping.
+        for key in [key for key, bucket in buckets.items() if bucket.is_full(now)]:
+            del buckets[key]
+
+    def _reject(self, scope, cost, retry_after):
+        self.stats['rejected'] += 1
+        self.stats['shed_cost'] += cost
+        self.stats['rejected_by_scope'][scope] += 1
+        raise AdmissionRejected(scope, retry_after)
+
+    async def admit(self, user_id, channel_id, guild_id, cost):
+        """Wait until the command may run, or raise AdmissionRejected."""
+        if cost <= 0:
+            return
+        now = self._clock()
+        keys = {'user': user_id, 'channel': channel_id, 'guild': guild_id}
+        buckets = {scope: self._bucket(scope, key, now)
+                   for scope, key in keys.items() if key is not None and scope in self.limits}
+        waits = {scope: bucket.wait_time(cost, now) for scope, bucket in buckets.items()}
+        scope, wait = max(waits.items(), key=lambda item: item[1], default=('user', 0.0))
+
+        if wait > 0:
+            if wait > self.max_wait:
+                self._reject(scope, cost, wait)
+            if user_id in self._waiting_users or len(self._waiting_users) >= self.max_queue:
+                self._reject(scope, cost, wait)
+
+        for bucket in buckets.values():
+            bucket.take(cost, now)
+        if wait == 0:
+            self.stats['admitted'] += 1
+            return
+
+        self.stats['queued'] += 1
+        self._waiting_users.add(user_id)
+        try:
+            await asyncio.sleep(wait)
+        finally:
+            self._waiting_users.discard(user_id)
+        self.stats['admitted'] += 1
+        self.stats['queue_seconds'] += wait
+
+    def remaining(self, scope, key):
+        """Tokens currently available in one bucket."""
+        rate, capacity = self.limits[scope]
+        bucket = self._buckets[scope].get(key)
+        if bucket is None:
+            return capacity
+        bucket.wait_time(0, self._clock())
+        return max(0.0, bucket.tokens)
+
+    @property
+    def queue_length(self):
+        return len(self._waiting_users)
+
+
+def _limit_from_env(scope, rate, burst):
+    name = scope.upper()
+    return (float(os.getenv(f"MEKAKO_{name}_RATE", rate)),
+            float(os.getenv(f"MEKAKO_{name}_BURST", burst)))
+
+
+def admission_from_env():
+    """Build an AdmissionController from MEKAKO_*_RATE/BURST and MEKAKO_ADMISSION_* variables."""
+    limits = {
+        'user': _limit_from_env('user', '0.5', '10'),
+        'channel': _limit_from_env('channel', '1', '20'),
+        'guild': _limit_from_env('guild', '2', '40'),
+    }
+    return AdmissionController(
+        limits,
+        max_wait=float(os.getenv("MEKAKO_ADMISSION_MAX_WAIT", "5")),
+        max_queue=int(os.getenv("MEKAKO_ADMISSION_QUEUE", "50")),
+    )
+
+
+_controller = None
+
+
+def get_admission():
+    global _controller
+    if _controller is None:
+        _controller = admission_from_env()
+        get_metrics().gauge_function('mekako_admission_queue', (), lambda: _controller.queue_length)
+    return _controller
+
+
+def command_cost(command):
+    return COMMAND_COSTS.get(command.qualified_name, DEFAULT_COST)
+
+
+async def admission_check(ctx):
+    """Global ``call_once`` check: charges the command's cost before it runs."""
+    guild_id = ctx.guild.id if ctx.guild else None
+    with span('admission'):
+        await get_admission().admit(ctx.author.id, ctx.channel.id, guild_id, command_cost(ctx.command))
+    return True
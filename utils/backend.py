@@ -0,0 +1,104 @@
+# utils/backend.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.managers import BaseManager
+from .render_service import warm_worker
+
+
+class SharedBackend:
+    """One process pool that renders and computes for every shard process.
+
+    Shard processes reach it through BackendManager, so N shards share one
+    set of warm workers instead of each starting its own.
+    """
+
+    def __init__(self, workers=None):
+        # Spawned rather than forked: the manager serves requests from threads.
+        # The workers outlive the manager process, so call shutdown() first.
+        self._pool = ProcessPoolExecutor(max_workers=workers, initializer=warm_worker,
+                                         mp_context=multiprocessing.get_context('spawn'))
+
+    def run(self, func, args, kwargs):
+        return self._pool.submit(func, *args, **kwargs).result()
+
+    def shutdown(self):
+        """Stop the pool's workers; they would otherwise outlive the manager."""
+        self._pool.shutdown()
+
+
+_backend = None
+
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        workers = os.getenv("MEKAKO_BACKEND_WORKERS")
+        _backend = SharedBackend(int(workers) if workers else None)
+    return _backend
+
+
+class BackendManager(BaseManager):
+    pass
+
+
+BackendManager.register('backend', callable=_get_backend)
+
+
+def start_backend(authkey, host='127.0.0.1', port=0):
+    """Start the backend server process and return its manager (``manager.address`` is set)."""
+    manager = BackendManager(address=(host, port), authkey=authkey)
+    manager.start()
+    return manager
+
+
+def backend_env(manager, authkey):
+    """Environment variables that point a shard process's executors at ``manager``."""
+    host, port = manager.address
+    return {
+        'MEKAKO_BACKEND_ADDRESS': f'{host}:{port}',
+        'MEKAKO_BACKEND_AUTHKEY': authkey.hex(),
+        'MEKAKO_EXECUTOR_BACKEND': 'remote',
+        'MEKAKO_RENDER_BACKEND': 'remote',
+        'MEKAKO_RESAMPLING_BACKEND': 'remote',
+    }
+
+
+def backend_address_from_env():
+    address = os.getenv("MEKAKO_BACKEND_ADDRESS")
+    authkey = os.getenv("MEKAKO_BACKEND_AUTHKEY")
+    if not address or not authkey:
+        raise RuntimeError("The remote backend needs MEKAKO_BACKEND_ADDRESS and MEKAKO_BACKEND_AUTHKEY.")
+    host, port = address.rsplit(':', 1)
+    return (host, int(port)), bytes.fromhex(authkey)
+
+
+class RemotePool(Executor):
+    """A concurrent.futures Executor that runs every job on the shared backend.
+
+    Each local thread keeps its own connection, since manager proxies are
+    not thread-safe; ``max_workers`` bounds the calls in flight at once.
+    """
+
+    def __init__(self, max_workers=None):
+        self._address, self._authkey = backend_address_from_env()
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mekako-remote")
+        self._local = threading.local()
+
+    def _backend(self):
+        backend = getattr(self._local, 'backend', None)
+        if backend is None:
+            manager = BackendManager(address=self._address, authkey=self._authkey)
+            manager.connect()
+            backend = self._local.backend = manager.backend()
+        return backend
+
+    def _call(self, func, args, kwargs):
+        return self._backend().run(func, args, kwargs)
+
+    def submit(self, func, /, *args, **kwargs):
+        return self._threads.submit(self._call, func, args, kwargs)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self._threads.shutdown(wait=wait, cancel_futures=cancel_futures)
@@ -0,0 +1,191 @@
+# utils/bivariate.py
+import math
+import numpy as np
+from .lazy import lazy_import
+from .sketches import QuantileSketch, EXACT_QUANTILE_LIMIT
+from .stat_tables import t_cdf
+
+stats = lazy_import('scipy.stats')
+
+# Compactor size of the sketches behind approximate Spearman. Rank error
+# is about 1.7 / k; the sketches are the only state that grows with n.
+RANK_SKETCH_K = 1000
+
+def correlation_p_value(r, n):
+    """Two-sided p-value of a correlation ``r`` from ``n`` pairs, via t with n - 2 df."""
+    if n < 3 or math.isnan(r):
+        return math.nan
+    if abs(r) >= 1.0:
+        return 0.0
+    t = r * math.sqrt((n - 2) / ((1.0 - r) * (1.0 + r)))
+    return 2 * t_cdf(-abs(t), n - 2)
+
+class BivariateMoments:
+    """Count, means and co-moments of paired data, for OLS and Pearson's r.
+
+    Each chunk is reduced to its means and centred sums of squares and
+    cross-products, then folded into the running totals with Chan's
+    pairwise update. This carries the same information as n, Σx, Σy, Σxx,
+    Σyy and Σxy without their cancellation problems, and merges the same
+    way: instances built on separate chunks, workers or successive appends
+    combine without revisiting the data.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.sxx = 0.0
+        self.syy = 0.0
+        self.sxy = 0.0
+
+    @classmethod
+    def from_values(cls, x, y):
+        moments = cls()
+        moments.update(x, y)
+        return moments
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """Accumulate ``(rows, 2)`` chunks of x, y pairs."""
+        moments = cls()
+        for chunk in chunks:
+            moments.update(chunk[:, 0], chunk[:, 1])
+        return moments
+
+    def update(self, x, y):
+        x = np.asarray(x, dtype=np.float64).ravel()
+        y = np.asarray(y, dtype=np.float64).ravel()
+        if x.size != y.size:
+            raise ValueError("X and Y must have the same number of elements")
+        if x.size == 0:
+            return self
+        chunk = BivariateMoments()
+        chunk.n = x.size
+        chunk.mean_x = float(x.mean())
+        chunk.mean_y = float(y.mean())
+        dx = x - chunk.mean_x
+        dy = y - chunk.mean_y
+        chunk.sxx = float(dx @ dx)
+        chunk.syy = float(dy @ dy)
+        chunk.sxy = float(dx @ dy)
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """Fold ``other`` into this accumulator and return self."""
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+
+        na, nb = self.n, other.n
+        n = na + nb
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        weight = na * nb / n
+
+        self.sxx += other.sxx + dx * dx * weight
+        self.syy += other.syy + dy * dy * weight
+        self.sxy += other.sxy + dx * dy * weight
+        self.mean_x += dx * nb / n
+        self.mean_y += dy * nb / n
+        self.n = n
+        return self
+
+    @property
+    def r(self):
+        """Pearson's correlation coefficient; NaN when either variable is constant."""
+        if self.n < 2 or self.sxx <= 0 or self.syy <= 0:
+            return math.nan
+        return max(-1.0, min(1.0, self.sxy / math.sqrt(self.sxx * self.syy)))
+
+    def pearson(self):
+        """``(r, p)``, like ``scipy.stats.pearsonr``."""
+        r = self.r
+        return r, correlation_p_value(r, self.n)
+
+    @property
+    def slope(self):
+        if self.n < 2 or self.sxx <= 0:
+            raise ValueError("All the x values are the same, so there's no line to fit")
+        return self.sxy / self.sxx
+
+    @property
+    def intercept(self):
+        return self.mean_y - self.slope * self.mean_x
+
+    @property
+    def slope_stderr(self):
+        if self.n < 3:
+            return math.nan
+        residual = max(0.0, self.syy - self.sxy * self.slope)
+        return math.sqrt(residual / (self.n - 2) / self.sxx)
+
+    @property
+    def intercept_stderr(self):
+        return self.slope_stderr * math.sqrt(self.sxx / self.n + self.mean_x ** 2)
+
+    def linregress(self):
+        """``(slope, intercept, r, p, stderr)``, like ``scipy.stats.linregress``."""
+        slope = self.slope
+        r, p = self.pearson()
+        return slope, self.mean_y - slope * self.mean_x, r, p, self.slope_stderr
+
+class RankCorrelation:
+    """Approximate Spearman's rho over data seen in chunks.
+
+    Works in two passes. ``observe`` feeds every chunk to a quantile
+    sketch per variable; ``update`` then maps each value to its
+    approximate mid-rank through the finished sketches and accumulates
+    Pearson's r of those ranks. Memory is the two sketches whatever n is.
+    First-pass instances merge like their sketches; second-pass instances
+    merge once they share the same (merged) sketches.
+    """
+
+    def __init__(self, k=RANK_SKETCH_K, seed=None):
+        self.x = QuantileSketch(k=k, seed=seed)
+        self.y = QuantileSketch(k=k, seed=seed)
+        self.ranks = BivariateMoments()
+
+    def observe(self, x, y):
+        self.x.update(x)
+        self.y.update(y)
+        return self
+
+    def update(self, x, y):
+        self.ranks.update(self.x.mid_rank(x), self.y.mid_rank(y))
+        return self
+
+    def merge(self, other):
+        """Fold ``other`` into this one and return self."""
+        if self.ranks.n or other.ranks.n:
+            self.ranks.merge(other.ranks)
+        else:
+            self.x.merge(other.x)
+            self.y.merge(other.y)
+        return self
+
+    def spearman(self):
+        """``(rho, p)``, with the same t approximation ``scipy.stats.spearmanr`` uses."""
+        return self.ranks.pearson()
+
+def spearman(x, y, exact=None):
+    """Spearman's rho of two arrays, exactly or through RankCorrelation.
+
+    ``exact=None`` ranks exactly up to EXACT_QUANTILE_LIMIT pairs.
+    Returns ``(rho, p, was_exact)``.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if x.size != y.size:
+        raise ValueError("X and Y must have the same number of elements")
+    if exact is None:
+        exact = x.size <= EXACT_QUANTILE_LIMIT
+    if exact:
+        rho, p = stats.spearmanr(x, y)
+        return float(rho), float(p), True
+    correlation = RankCorrelation()
+    correlation.observe(x, y)
+    correlation.update(x, y)
+    return (*correlation.spearman(), False)
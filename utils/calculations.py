@@ -1,6 +1,13 @@
 import math
-from scipy import stats
 import numpy as np
+from .lazy import lazy_import
+from .combinatorics import check_size
+
+stats = lazy_import('scipy.stats')
+
+def _all_probabilities(p):
+    p = np.asarray(p)
+    return bool(np.all((p >= 0) & (p <= 1)))
 
 def safe_float_conversion(value: str) -> float:
     try:
@@ -9,22 +16,19 @@ def safe_float_conversion(value: str) -> float:
         raise ValueError(f"'{value}' is not a valid number.")
 
 def factorial(n):
-    if n < 0:
-        raise ValueError("Factorial is not defined for negative numbers. Did you fail elementary math?")
+    check_size('factorial', n)
     return math.factorial(n)
 
 def combination(n, k):
-    if n < k:
-        raise ValueError("n must be greater than or equal to k. Basic combinatorics, come on!")
+    check_size('combination', n, k)
     return math.comb(n, k)
 
 def permutation(n, k):
-    if n < k:
-        raise ValueError("n must be greater than or equal to k. Arrangement 101, get it right!")
+    check_size('permutation', n, k)
     return math.perm(n, k)
 
 def binomial_probability(n, k, p):
-    if not 0 <= p <= 1:
+    if not _all_probabilities(p):
         raise ValueError("Probability must be between 0 and 1. Probability basics, seriously?")
     return stats.binom.pmf(k, n, p)
 
@@ -83,7 +87,7 @@ def chi2_probability(x, df):
 
 def normal_quantile(p, mean, std):
     """Calculate the quantile (inverse CDF) for a normal distribution."""
-    if not 0 <= p <= 1:
+    if not _all_probabilities(p):
         raise ValueError("Probability must be between 0 and 1. Basic probability, remember?")
     if std <= 0:
         raise ValueError("Standard deviation must be positive. Did you fail Stats 101?")
@@ -91,7 +95,7 @@ def normal_quantile(p, mean, std):
 
 def exponential_quantile(p, scale):
     """Calculate the quantile (inverse CDF) for an exponential distribution."""
-    if not 0 <= p <= 1:
+    if not _all_probabilities(p):
         raise ValueError("Probability must be between 0 and 1. It's not rocket science!")
     if scale <= 0:
         raise ValueError("Scale parameter must be positive. Exponential decay, not growth!")
@@ -99,7 +103,7 @@ def exponential_quantile(p, scale):
 
 def gamma_quantile(p, shape, scale):
     """Calculate the quantile (inverse CDF) for a gamma distribution."""
-    if not 0 <= p <= 1:
+    if not _all_probabilities(p):
         raise ValueError("Probability must be between 0 and 1. Do I need to explain probability to you?")
     if shape <= 0 or scale <= 0:
         raise ValueError("Shape and scale parameters must be positive. It's called 'positive' for a reason!")
@@ -107,7 +111,7 @@ def gamma_quantile(p, shape, scale):
 
 def beta_quantile(p, a, b):
     """Calculate the quantile (inverse CDF) for a beta distribution."""
-    if not 0 <= p <= 1:
+    if not _all_probabilities(p):
         raise ValueError("Probability must be between 0 and 1. Probability 101, come on!")
     if a <= 0 or b <= 0:
         raise ValueError("Both shape parameters must be positive. Beta is picky like that.")
@@ -115,8 +119,88 @@ def beta_quantile(p, a, b):
 
 def uniform_quantile(p, low, high):
     """Calculate the quantile (inverse CDF) for a uniform distribution."""
-    if not 0 <= p <= 1:
+    if not _all_probabilities(p):
         raise ValueError("Probability must be between 0 and 1. It's a simple concept, really.")
     if low >= high:
         raise ValueError("Upper bound must be greater than lower bound. Did you mix them up?")
-    return stats.uniform.ppf(p, loc=low, scale=high-low)
\ No newline at end of file
+    return stats.uniform.ppf(p, loc=low, scale=high-low)
+
+def exponential_cdf(x, scale):
+    if scale <= 0:
+        raise ValueError("Scale parameter must be positive. Exponential decay, not growth!")
+    return stats.expon.cdf(x, scale=scale)
+
+def gamma_cdf(x, shape, scale):
+    if shape <= 0 or scale <= 0:
+        raise ValueError("Shape and scale parameters must be positive. It's called 'positive' for a reason!")
+    return stats.gamma.cdf(x, a=shape, scale=scale)
+
+def beta_cdf(x, a, b):
+    if a <= 0 or b <= 0:
+        raise ValueError("Both shape parameters must be positive. Beta is picky like that.")
+    return stats.beta.cdf(x, a, b)
+
+def uniform_cdf(x, low, high):
+    if low >= high:
+        raise ValueError("Upper bound must be greater than lower bound. Did you mix them up?")
+    return stats.uniform.cdf(x, loc=low, scale=high-low)
+
+def t_cdf(x, df):
+    if df <= 0:
+        raise ValueError("Degrees of freedom must be positive. T-distribution 101, pay attention!")
+    return stats.t.cdf(x, df)
+
+def f_cdf(x, dfn, dfd):
+    if dfn <= 0 or dfd <= 0:
+        raise ValueError("Degrees of freedom must be positive. F-distribution basics, come on!")
+    return stats.f.cdf(x, dfn, dfd)
+
+def chi2_cdf(x, df):
+    if df <= 0:
+        raise ValueError("Degrees of freedom must be positive. Chi-squared 101, get it right!")
+    return stats.chi2.cdf(x, df)
+
+def t_quantile(p, df):
+    if not _all_probabilities(p):
+        raise ValueError("Probability must be between 0 and 1. Basic probability, remember?")
+    if df <= 0:
+        raise ValueError("Degrees of freedom must be positive. T-distribution 101, pay attention!")
+    return stats.t.ppf(p, df)
+
+def f_quantile(p, dfn, dfd):
+    if not _all_probabilities(p):
+        raise ValueError("Probability must be between 0 and 1. Basic probability, remember?")
+    if dfn <= 0 or dfd <= 0:
+        raise ValueError("Degrees of freedom must be positive. F-distribution basics, come on!")
+    return stats.f.ppf(p, dfn, dfd)
+
+def chi2_quantile(p, df):
+    if not _all_probabilities(p):
+        raise ValueError("Probability must be between 0 and 1. Basic probability, remember?")
+    if df <= 0:
+        raise ValueError("Degrees of freedom must be positive. Chi-squared 101, get it right!")
+    return stats.chi2.ppf(p, df)
+
+# Vectorised entry points for batch evaluation, by distribution and function.
+DISTRIBUTIONS = {
+    'normal': {'pdf': normal_probability, 'cdf': normal_cdf, 'quantile': normal_quantile},
+    'exponential': {'pdf': exponential_probability, 'cdf': exponential_cdf, 'quantile': exponential_quantile},
+    'gamma': {'pdf': gamma_probability, 'cdf': gamma_cdf, 'quantile': gamma_quantile},
+    'beta': {'pdf': beta_probability, 'cdf': beta_cdf, 'quantile': beta_quantile},
+    'uniform': {'pdf': uniform_probability, 'cdf': uniform_cdf, 'quantile': uniform_quantile},
+    't': {'pdf': t_probability, 'cdf': t_cdf, 'quantile': t_quantile},
+    'f': {'pdf': f_probability, 'cdf': f_cdf, 'quantile': f_quantile},
+    'chi2': {'pdf': chi2_probability, 'cdf': chi2_cdf, 'quantile': chi2_quantile},
+}
+
+def evaluate_batch(distribution, function, grid, params):
+    """Evaluate a distribution's pdf, cdf or quantile over a whole grid in one call."""
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution '{distribution}'. Try one of: {', '.join(DISTRIBUTIONS)}.")
+    functions = DISTRIBUTIONS[distribution]
+    if function not in functions:
+        raise ValueError(f"Unknown function '{function}'. Use pdf, cdf or quantile.")
+    expected = functions[function].__code__.co_argcount - 1
+    if len(params) != expected:
+        raise ValueError(f"The {distribution} distribution takes {expected} parameter(s), not {len(params)}.")
+    return np.asarray(functions[function](grid, *params), dtype=np.float64)
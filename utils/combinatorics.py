@@ -0,0 +1,245 @@
+# utils/combinatorics.py
+import decimal
+import math
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Results with up to MAX_INLINE_DIGITS digits are written into the reply;
+# up to MAX_EXACT_DIGITS they are computed and attached as a text file.
+# Anything larger is only ever given in scientific notation.
+MAX_INLINE_DIGITS = 1500
+MAX_EXACT_DIGITS = int(os.getenv("MEKAKO_MAX_EXACT_DIGITS", "1000000"))
+CACHE_DIGITS = int(os.getenv("MEKAKO_COMBINATORICS_CACHE_DIGITS", "10000000"))
+
+# Below this many digits the C implementations in ``math`` and a plain
+# ``str`` are fastest (and ``str`` refuses more than 4300 digits anyway).
+_SMALL_DIGITS = 4000
+# Largest n for which prime tables are built.
+SIEVE_LIMIT = 1 << 24
+
+_EXACT = decimal.Context(prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+_LN10 = math.log(10)
+
+OPERATIONS = ('factorial', 'combination', 'permutation')
+
+_primes = np.array([], dtype=np.int64)
+_sieved_to = 1
+_sieve_lock = threading.Lock()
+_cache = OrderedDict()
+_cached_digits = 0
+_cache_lock = threading.Lock()
+
+
+def validate(op, n, k=None):
+    if op == 'factorial':
+        if n < 0:
+            raise ValueError("Factorial is not defined for negative numbers. Did you fail elementary math?")
+    elif op in ('combination', 'permutation'):
+        if k < 0:
+            raise ValueError("k can't be negative. You can't choose fewer than zero things.")
+        if n < k:
+            if op == 'combination':
+                raise ValueError("n must be greater than or equal to k. Basic combinatorics, come on!")
+            raise ValueError("n must be greater than or equal to k. Arrangement 101, get it right!")
+    else:
+        raise ValueError(f"Unknown operation '{op}'. Use one of: {', '.join(OPERATIONS)}.")
+
+
+def log10_result(op, n, k=None):
+    """log10 of the result via ``math.lgamma``, without computing it."""
+    validate(op, n, k)
+    if op == 'factorial':
+        log = math.lgamma(n + 1)
+    elif op == 'combination':
+        log = math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+    else:
+        log = math.lgamma(n + 1) - math.lgamma(n - k + 1)
+    return max(log, 0.0) / _LN10
+
+
+def estimate_digits(op, n, k=None):
+    """Number of decimal digits in the result, give or take one."""
+    return math.floor(log10_result(op, n, k)) + 1
+
+
+def check_size(op, n, k=None):
+    """Estimate the result's digits and refuse it up front if over MAX_EXACT_DIGITS."""
+    digits = estimate_digits(op, n, k)
+    if digits > MAX_EXACT_DIGITS:
+        raise ValueError(f"That result has about {digits:,} digits. I only write out up to {MAX_EXACT_DIGITS:,}.")
+    return digits
+
+
+def scientific(log10_value, digits=6):
+    """Format ``10 ** log10_value`` as ``m.mmmmm × 10^e``.
+
+    Only as many mantissa digits as double precision supports are shown;
+    when none are left, just the order of magnitude is given.
+    """
+    exponent = math.floor(log10_value)
+    reliable = 15 - len(str(exponent))
+    if reliable < 1:
+        return f"10^{log10_value:.6e}"
+    mantissa = 10 ** (log10_value - exponent)
+    return f"{mantissa:.{min(digits, reliable) - 1}f} × 10^{exponent}"
+
+
+def _primes_upto(n):
+    """Primes up to ``n``, from a sieve that grows (and is kept) as needed.
+
+    Worker threads share the table, so it is grown and swapped under a lock.
+    """
+    global _primes, _sieved_to
+    with _sieve_lock:
+        primes = _primes
+        if n > _sieved_to:
+            limit = min(max(n, 2 * _sieved_to), SIEVE_LIMIT)
+            sieve = np.ones(limit + 1, dtype=bool)
+            sieve[:2] = False
+            for i in range(2, math.isqrt(limit) + 1):
+                if sieve[i]:
+                    sieve[i * i::i] = False
+            primes = np.flatnonzero(sieve).astype(np.int64)
+            _primes, _sieved_to = primes, limit
+    return primes[:np.searchsorted(primes, n, side='right')]
+
+
+def _legendre(primes, n):
+    """Exponent of each prime in ``n!``, as an int64 array."""
+    exponents = np.zeros(primes.size, dtype=np.int64)
+    power = primes.copy()
+    active = power <= n
+    while active.any():
+        exponents[active] += n // power[active]
+        # Stop before p**i could overflow: p**i > n means p**(i+1) is never needed.
+        active &= power <= n // primes
+        power[active] *= primes[active]
+    return exponents
+
+
+def _product(numbers):
+    """Exact product of Python ints as a Decimal, multiplied as a balanced tree.
+
+    Small factors are packed into machine-word-sized ints first so the
+    tree only multiplies numbers of similar size.
+    """
+    packed, word = [], 1
+    for number in numbers:
+        word *= number
+        if word.bit_length() > 60:
+            packed.append(decimal.Decimal(word))
+            word = 1
+    packed.append(decimal.Decimal(word))
+    while len(packed) > 1:
+        merged = [_EXACT.multiply(packed[i], packed[i + 1]) for i in range(0, len(packed) - 1, 2)]
+        if len(packed) % 2:
+            merged.append(packed[-1])
+        packed = merged
+    return packed[0]
+
+
+def _prime_power_product(primes, exponents):
+    keep = exponents > 0
+    return _product(int(p) ** int(e) for p, e in zip(primes[keep], exponents[keep]))
+
+
+def _swing(n):
+    """The swinging factorial n! / ((n // 2)!)**2, from its prime factorisation."""
+    primes = _primes_upto(n)
+    exponents = np.zeros(primes.size, dtype=np.int64)
+    quotient = np.full(primes.size, n, dtype=np.int64)
+    while True:
+        quotient //= primes
+        if not quotient.any():
+            break
+        exponents += quotient & 1
+    return _prime_power_product(primes, exponents)
+
+
+def _remember(key, value):
+    global _cached_digits
+    digits = value.adjusted() + 1
+    if digits > CACHE_DIGITS:
+        return value
+    with _cache_lock:
+        if key not in _cache:
+            _cache[key] = value
+            _cached_digits += digits
+        while _cached_digits > CACHE_DIGITS:
+            _, old = _cache.popitem(last=False)
+            _cached_digits -= old.adjusted() + 1
+    return value
+
+
+def _recall(key):
+    with _cache_lock:
+        value = _cache.get(key)
+        if value is not None:
+            _cache.move_to_end(key)
+    return value
+
+
+def _factorial(n):
+    """n! as a Decimal via the prime-swing recursion n! = ((n // 2)!)**2 * swing(n).
+
+    Every factorial along the way is memoised, so later requests for nearby
+    or smaller n (and the combinations built on them) reuse the work.
+    """
+    if n < 2:
+        return decimal.Decimal(1)
+    value = _recall(('factorial', n))
+    if value is None:
+        half = _factorial(n // 2)
+        value = _remember(('factorial', n), _EXACT.multiply(_EXACT.multiply(half, half), _swing(n)))
+    return value
+
+
+def _int_to_decimal(n):
+    """Convert a huge int to Decimal by splitting it, avoiding quadratic ``str``."""
+    powers = {}
+
+    def convert(n, bits):
+        if bits <= 2048:
+            return decimal.Decimal(n)
+        low_bits = bits // 2
+        high = n >> low_bits
+        if low_bits not in powers:
+            powers[low_bits] = _EXACT.power(decimal.Decimal(2), low_bits)
+        return _EXACT.add(_EXACT.multiply(convert(high, bits - low_bits), powers[low_bits]),
+                          convert(n - (high << low_bits), low_bits))
+
+    return convert(n, n.bit_length())
+
+
+def _exact_decimal(op, n, k):
+    if op == 'factorial':
+        return _factorial(n)
+    value = _recall((op, n, k))
+    if value is not None:
+        return value
+    if n <= SIEVE_LIMIT:
+        # Legendre's formula gives the exponent of every prime directly.
+        primes = _primes_upto(n)
+        exponents = _legendre(primes, n) - _legendre(primes, n - k)
+        if op == 'combination':
+            exponents -= _legendre(primes, k)
+        value = _prime_power_product(primes, exponents)
+    else:
+        value = _int_to_decimal(math.comb(n, k) if op == 'combination' else math.perm(n, k))
+    return _remember((op, n, k), value)
+
+
+def exact(op, n, k=None):
+    """Exact decimal digits of ``op(n[, k])``.
+
+    Refuses anything whose estimated size exceeds MAX_EXACT_DIGITS before
+    doing any work. Small results use ``math``; large ones are built in
+    base 10 with ``decimal`` so no int-to-string conversion is needed.
+    """
+    if check_size(op, n, k) <= _SMALL_DIGITS:
+        if op == 'factorial':
+            return str(math.factorial(n))
+        return str(math.comb(n, k) if op == 'combination' else math.perm(n, k))
+    return str(_exact_decimal(op, n, k))
@@ -0,0 +1,555 @@
+# utils/datasets.py
+import csv
+import io
+import json
+import os
+import re
+from collections import OrderedDict
+import numpy as np
+from .executor import run_blocking
+from .moments import RunningMoments
+from .bivariate import BivariateMoments, RankCorrelation, spearman
+from .linear_models import MAX_TERMS, design_names, fit_arrays, fit_chunks
+from .sketches import QuantileSketch, EXACT_QUANTILE_LIMIT, quantiles, sorted_quantiles
+from .sessions import get_sessions, parse_session_ref
+from .parsing import parse_values
+
+MAX_ATTACHMENT_BYTES = int(os.getenv("MEKAKO_MAX_ATTACHMENT_BYTES", str(64 * 1024 * 1024)))
+MAX_ROWS = int(os.getenv("MEKAKO_MAX_ROWS", "10000000"))
+CHUNK_ROWS = 65536
+
+# Columns ``!load`` takes from a single file.
+MAX_TABLE_COLUMNS = 64
+
+FORMATS = {
+    '.csv': 'csv',
+    '.tsv': 'tsv',
+    '.txt': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.f64': 'f64',
+    '.bin': 'f64',
+}
+
+# ``file:column`` refers to the first attachment, ``file2:column`` to the second.
+FILE_REF = re.compile(r'^file(\d*):(.+)$')
+
+# ``C(column)`` marks a categorical predictor, as in R and statsmodels formulas.
+CATEGORICAL = re.compile(r'^C\((.+)\)$')
+
+_downloads = OrderedDict()
+
+def detect_format(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"I don't read '{ext or filename}' files. Use CSV, TSV, NDJSON or raw float64 (.f64).")
+    return FORMATS[ext]
+
+def _text_rows(data, delimiter):
+    text = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig', newline='')
+    return csv.reader(text, delimiter=delimiter)
+
+def _is_number(token):
+    try:
+        float(token)
+        return True
+    except ValueError:
+        return False
+
+def _column_index(header, column):
+    if header and column in header:
+        return header.index(column)
+    if column.isdigit():
+        return int(column)
+    available = ', '.join(header) if header else 'none, so use a column number'
+    raise ValueError(f"There's no column '{column}'. Available columns: {available}.")
+
+def _to_array(rows, first_row):
+    try:
+        return np.array(rows, dtype=np.float64).reshape(len(rows), -1)
+    except ValueError:
+        for offset, row in enumerate(rows):
+            for token in row:
+                if not _is_number(token):
+                    raise ValueError(f"'{token}' on row {first_row + offset} is not a valid number.") from None
+        raise
+
+def _to_labels(rows, first_row):
+    return np.char.strip(np.array(rows, dtype=str).reshape(len(rows), -1))
+
+def _iter_delimited(data, delimiter, columns, chunk_rows, max_rows, convert=_to_array):
+    rows = _text_rows(data, delimiter)
+    first = next(rows, None)
+    if first is None:
+        return
+    header = None if all(_is_number(token) for token in first) else [name.strip() for name in first]
+    indices = [_column_index(header, column) for column in columns]
+
+    def pick(row, row_number):
+        try:
+            return [row[i] for i in indices]
+        except IndexError:
+            raise ValueError(f"Row {row_number} doesn't have enough columns.") from None
+
+    chunk = [] if header else [pick(first, 1)]
+    chunk_start = 1 if header is None else 2
+    row_number = 1
+    total = 0
+    for row in rows:
+        row_number += 1
+        if not row:
+            continue
+        chunk.append(pick(row, row_number))
+        if len(chunk) >= chunk_rows:
+            total += len(chunk)
+            if total > max_rows:
+                raise ValueError(f"That file has more than {max_rows} rows. Too much, even for me.")
+            yield convert(chunk, chunk_start)
+            chunk_start += len(chunk)
+            chunk = []
+    if chunk:
+        if total + len(chunk) > max_rows:
+            raise ValueError(f"That file has more than {max_rows} rows. Too much, even for me.")
+        yield convert(chunk, chunk_start)
+
+def _iter_ndjson(data, columns, chunk_rows, max_rows, value=float, dtype=np.float64):
+    chunk = []
+    total = 0
+    for line_number, line in enumerate(io.BytesIO(data), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            chunk.append([value(record[column]) for column in columns])
+        except KeyError as e:
+            raise ValueError(f"Line {line_number} has no field {e}.") from None
+        except (TypeError, ValueError):
+            raise ValueError(f"Line {line_number} isn't a JSON object with numeric fields.") from None
+        if len(chunk) >= chunk_rows:
+            total += len(chunk)
+            if total > max_rows:
+                raise ValueError(f"That file has more than {max_rows} rows. Too much, even for me.")
+            yield np.array(chunk, dtype=dtype)
+            chunk = []
+    if chunk:
+        if total + len(chunk) > max_rows:
+            raise ValueError(f"That file has more than {max_rows} rows. Too much, even for me.")
+        yield np.array(chunk, dtype=dtype)
+
+def _iter_f64(data, columns, chunk_rows, max_rows):
+    if columns != ['0'] and columns != ['value']:
+        raise ValueError("Raw float64 files only have one column, called 'value'.")
+    if len(data) % 8:
+        raise ValueError("Raw float64 files must be a whole number of 8-byte values.")
+    values = np.frombuffer(data, dtype='<f8')
+    if values.size > max_rows:
+        raise ValueError(f"That file has more than {max_rows} rows. Too much, even for me.")
+    for start in range(0, values.size, chunk_rows):
+        yield values[start:start + chunk_rows].astype(np.float64).reshape(-1, 1)
+
+def iter_chunks(data, fmt, columns, chunk_rows=CHUNK_ROWS, max_rows=MAX_ROWS):
+    """Yield ``(rows, len(columns))`` float64 arrays from an uploaded dataset.
+
+    Columns are picked by header name, or by zero-based position when the
+    file has no header. Only the selected columns are ever converted.
+    """
+    columns = [str(column) for column in columns]
+    if fmt == 'csv':
+        return _iter_delimited(data, ',', columns, chunk_rows, max_rows)
+    if fmt == 'tsv':
+        return _iter_delimited(data, '\t', columns, chunk_rows, max_rows)
+    if fmt == 'ndjson':
+        return _iter_ndjson(data, columns, chunk_rows, max_rows)
+    if fmt == 'f64':
+        return _iter_f64(data, columns, chunk_rows, max_rows)
+    raise ValueError(f"Unknown dataset format '{fmt}'.")
+
+def iter_label_chunks(data, fmt, columns, chunk_rows=CHUNK_ROWS, max_rows=MAX_ROWS):
+    """Like ``iter_chunks``, but yields the selected columns as strings."""
+    columns = [str(column) for column in columns]
+    if fmt == 'csv':
+        return _iter_delimited(data, ',', columns, chunk_rows, max_rows, convert=_to_labels)
+    if fmt == 'tsv':
+        return _iter_delimited(data, '\t', columns, chunk_rows, max_rows, convert=_to_labels)
+    if fmt == 'ndjson':
+        return _iter_ndjson(data, columns, chunk_rows, max_rows, value=str, dtype=str)
+    raise ValueError("Only CSV, TSV and NDJSON files can hold categories.")
+
+def read_categories(data, fmt, column, max_levels=MAX_TERMS, max_rows=MAX_ROWS):
+    """Integer codes and sorted level names of a categorical column."""
+    levels = {}
+    chunks = []
+    for chunk in iter_label_chunks(data, fmt, [column], max_rows=max_rows):
+        uniques, inverse = np.unique(chunk[:, 0], return_inverse=True)
+        lookup = np.array([levels.setdefault(level, len(levels)) for level in uniques.tolist()])
+        if len(levels) > max_levels:
+            raise ValueError(f"'{column}' has more than {max_levels} different values. That's not a category, that's a mess.")
+        chunks.append(lookup[inverse.ravel()])
+    if not chunks:
+        raise ValueError("That file doesn't contain any rows.")
+    names = sorted(levels)
+    order = np.empty(len(names), dtype=np.int64)
+    for code, name in enumerate(names):
+        order[levels[name]] = code
+    return order[np.concatenate(chunks)], names
+
+def read_columns(data, fmt, columns, max_rows=MAX_ROWS):
+    chunks = list(iter_chunks(data, fmt, columns, max_rows=max_rows))
+    if not chunks:
+        raise ValueError("That file doesn't contain any rows.")
+    return np.concatenate(chunks)
+
+def read_column(data, fmt, column, max_rows=MAX_ROWS):
+    return np.ascontiguousarray(read_columns(data, fmt, [column], max_rows=max_rows)[:, 0])
+
+def summarize_column(data, fmt, column, max_rows=MAX_ROWS):
+    """Compute RunningMoments for one column without materialising it."""
+    moments = RunningMoments.from_chunks(chunk[:, 0] for chunk in iter_chunks(data, fmt, [column], max_rows=max_rows))
+    if moments.n == 0:
+        raise ValueError("That column is empty.")
+    return moments
+
+def quantile_column(data, fmt, column, qs, exact=None, max_rows=MAX_ROWS):
+    """Quantiles of one column, exact while it fits under EXACT_QUANTILE_LIMIT.
+
+    Chunks always feed a QuantileSketch; they are also kept for an exact
+    answer until the limit is crossed (or never, with ``exact=False``), so
+    memory stays bounded. Returns ``(result, was_exact)``.
+    """
+    sketch = QuantileSketch()
+    kept = [] if exact is not False else None
+    for chunk in iter_chunks(data, fmt, [column], max_rows=max_rows):
+        values = chunk[:, 0]
+        sketch.update(values)
+        if kept is not None:
+            kept.append(values)
+            if exact is None and sketch.n > EXACT_QUANTILE_LIMIT:
+                kept = None
+    if sketch.n == 0:
+        raise ValueError("That column is empty.")
+    if kept is not None:
+        return np.quantile(np.concatenate(kept), qs), True
+    return sketch.quantile(qs), False
+
+def summarize_pair(data, fmt, x_column, y_column, max_rows=MAX_ROWS):
+    """Compute BivariateMoments for two columns of one file, chunk by chunk."""
+    moments = BivariateMoments.from_chunks(iter_chunks(data, fmt, [x_column, y_column], max_rows=max_rows))
+    if moments.n == 0:
+        raise ValueError("That file doesn't contain any rows.")
+    return moments
+
+def spearman_pair(data, fmt, x_column, y_column, exact=None, max_rows=MAX_ROWS):
+    """Spearman's rho of two columns of one file, exact while it fits under EXACT_QUANTILE_LIMIT.
+
+    The first pass feeds a RankCorrelation and keeps the chunks for an
+    exact answer, like ``quantile_column``; past the limit the chunks are
+    dropped and a second pass ranks them through the sketches instead.
+    Returns ``(rho, p, was_exact)``.
+    """
+    correlation = RankCorrelation()
+    kept = [] if exact is not False else None
+    for chunk in iter_chunks(data, fmt, [x_column, y_column], max_rows=max_rows):
+        correlation.observe(chunk[:, 0], chunk[:, 1])
+        if kept is not None:
+            kept.append(chunk)
+            if exact is None and correlation.x.n > EXACT_QUANTILE_LIMIT:
+                kept = None
+    if correlation.x.n == 0:
+        raise ValueError("That file doesn't contain any rows.")
+    if kept is not None:
+        pairs = np.concatenate(kept)
+        return spearman(pairs[:, 0], pairs[:, 1], exact=True)
+    for chunk in iter_chunks(data, fmt, [x_column, y_column], max_rows=max_rows):
+        correlation.update(chunk[:, 0], chunk[:, 1])
+    return (*correlation.spearman(), False)
+
+def fit_table(data, fmt, response, numeric, categorical=(), solver='auto', max_rows=MAX_ROWS):
+    """Regress ``response`` on numeric and categorical columns of one file.
+
+    Categorical columns are read first, as integer codes; the numeric ones
+    are then streamed chunk by chunk into ``fit_chunks``.
+    """
+    categories = [(column, *read_categories(data, fmt, column, max_rows=max_rows)) for column in categorical]
+    codes = np.column_stack([c for _, c, _ in categories]) if categories else None
+    names = design_names(numeric, [(column, levels) for column, _, levels in categories])
+
+    def chunks():
+        start = 0
+        for chunk in iter_chunks(data, fmt, [response, *numeric], max_rows=max_rows):
+            stop = start + len(chunk)
+            yield chunk[:, 0], chunk[:, 1:], None if codes is None else codes[start:stop]
+            start = stop
+
+    return fit_chunks(chunks(), names, [len(levels) for _, _, levels in categories], solver)
+
+def table_columns(data, fmt):
+    """Names of every column in a file: header names, or positions when there is no header."""
+    if fmt == 'f64':
+        return ['value']
+    if fmt == 'ndjson':
+        for line in io.BytesIO(data):
+            if line.strip():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict):
+                    raise ValueError("The first line isn't a JSON object.")
+                return list(record)
+        return []
+    first = next(_text_rows(data, ',' if fmt == 'csv' else '\t'), None)
+    if first is None:
+        return []
+    if all(_is_number(token) for token in first):
+        return [str(i) for i in range(len(first))]
+    return [name.strip() for name in first]
+
+def read_table(data, fmt, max_columns=MAX_TABLE_COLUMNS, max_rows=MAX_ROWS):
+    """Every numeric column of a file as a dict of float64 arrays.
+
+    Columns that don't parse as numbers are left out; if none do, the
+    error from the last one is raised.
+    """
+    names = table_columns(data, fmt)
+    if not names:
+        raise ValueError("That file doesn't contain any rows.")
+    if len(names) > max_columns:
+        raise ValueError(f"That file has {len(names)} columns. I only keep up to {max_columns}.")
+    try:
+        table = read_columns(data, fmt, names, max_rows=max_rows)
+        return {name: np.ascontiguousarray(table[:, i]) for i, name in enumerate(names)}
+    except ValueError as e:
+        error = e
+    columns = {}
+    for name in names:
+        try:
+            columns[name] = read_column(data, fmt, name, max_rows=max_rows)
+        except ValueError as e:
+            error = e
+    if not columns:
+        raise error
+    return columns
+
+def to_csv_bytes(columns, names):
+    """Encode equal-length columns as CSV with a header row."""
+    buf = io.StringIO()
+    np.savetxt(buf, np.column_stack(columns), delimiter=',', header=','.join(names), comments='', fmt='%.10g')
+    return io.BytesIO(buf.getvalue().encode('utf-8'))
+
+def get_attachment(ctx, index):
+    attachments = ctx.message.attachments if ctx.message else []
+    if not attachments:
+        raise ValueError("You referenced a file but didn't attach one.")
+    if not 1 <= index <= len(attachments):
+        raise ValueError(f"You asked for attachment #{index}, but only attached {len(attachments)}.")
+    return attachments[index - 1]
+
+async def download(attachment):
+    """Fetch an attachment's bytes, reusing the last couple of downloads."""
+    if attachment.size > MAX_ATTACHMENT_BYTES:
+        raise ValueError(f"'{attachment.filename}' is larger than {MAX_ATTACHMENT_BYTES // (1024 * 1024)} MiB.")
+    data = _downloads.get(attachment.id)
+    if data is None:
+        data = await attachment.read()
+        _downloads[attachment.id] = data
+        while len(_downloads) > 2:
+            _downloads.popitem(last=False)
+    return data
+
+def parse_file_ref(text):
+    """Split ``fileN:column`` into ``(N, column)``, or return None for inline data."""
+    match = FILE_REF.match(text.strip())
+    if not match:
+        return None
+    return int(match.group(1) or 1), match.group(2)
+
+def session_column(ctx, ref):
+    """``(dataset, column)`` for a parsed ``@name[:column]`` reference of the author's."""
+    name, column = ref
+    dataset = get_sessions().get(ctx.author.id, name)
+    return dataset, dataset.column(column)
+
+async def _derived(dataset, key, func, *args):
+    """``func(*args)``, computed once per loaded dataset and then reused by every command."""
+    value = dataset.derived.get(key)
+    if value is None:
+        value = await run_blocking(func, *args)
+        get_sessions().remember(dataset, key, value)
+    return value
+
+async def resolve_values(ctx, text, sep=','):
+    """Turn an inline list, a ``file:column`` or an ``@name`` reference into a float64 array.
+
+    Loaded datasets come back as the stored, read-only array.
+    """
+    session = parse_session_ref(text)
+    if session is not None:
+        dataset, column = session_column(ctx, session)
+        return dataset.columns[column]
+    ref = parse_file_ref(text)
+    if ref is None:
+        return parse_values(text, sep=sep)
+    index, column = ref
+    attachment = get_attachment(ctx, index)
+    data = await download(attachment)
+    return await run_blocking(read_column, data, detect_format(attachment.filename), column)
+
+async def resolve_groups(ctx, args, sep=','):
+    """Like ``parse_groups`` but each group may also be ``label:file:column``."""
+    labels, groups = [], []
+    for arg in args:
+        label, colon, data = arg.partition(':')
+        if not colon:
+            raise ValueError(f"'{arg}' needs a label, like 'group1:1,2,3'.")
+        labels.append(label)
+        groups.append(await resolve_values(ctx, data, sep=sep))
+    return labels, groups
+
+async def resolve_moments(ctx, text):
+    """Summarise inline data, a ``file:column`` or an ``@name`` reference as RunningMoments."""
+    session = parse_session_ref(text)
+    if session is not None:
+        dataset, column = session_column(ctx, session)
+        return await _derived(dataset, ('moments', column), RunningMoments.from_values, dataset.columns[column])
+    ref = parse_file_ref(text)
+    if ref is None:
+        return await run_blocking(RunningMoments.from_values, parse_values(text))
+    index, column = ref
+    attachment = get_attachment(ctx, index)
+    data = await download(attachment)
+    return await run_blocking(summarize_column, data, detect_format(attachment.filename), column)
+
+async def resolve_quantiles(ctx, text, qs, exact=None):
+    """Quantiles of inline data, a ``file:column`` or an ``@name`` reference; see ``quantile_column``.
+
+    Loaded datasets keep a sorted copy of each column, so their quantiles
+    are exact unless ``exact=False`` asks for the cached sketch instead;
+    either way only the first query pays for building it.
+    """
+    session = parse_session_ref(text)
+    if session is not None:
+        dataset, column = session_column(ctx, session)
+        if exact is False:
+            sketch = await _derived(dataset, ('sketch', column), QuantileSketch.from_values, dataset.columns[column])
+            return sketch.quantile(qs), False
+        ordered = await _derived(dataset, ('sorted', column), np.sort, dataset.columns[column])
+        return sorted_quantiles(ordered, qs), True
+    ref = parse_file_ref(text)
+    if ref is None:
+        return await run_blocking(quantiles, parse_values(text), qs, exact)
+    index, column = ref
+    attachment = get_attachment(ctx, index)
+    data = await download(attachment)
+    return await run_blocking(quantile_column, data, detect_format(attachment.filename), column, qs, exact)
+
+def _same_session_pair(ctx, x_text, y_text):
+    """``(dataset, x_column, y_column)`` when both refer to one loaded dataset, else None."""
+    x_ref, y_ref = parse_session_ref(x_text), parse_session_ref(y_text)
+    if x_ref is None or y_ref is None or x_ref[0] != y_ref[0]:
+        return None
+    dataset, x_column = session_column(ctx, x_ref)
+    return dataset, x_column, dataset.column(y_ref[1])
+
+def _same_file_pair(x_text, y_text):
+    """``(N, x_column, y_column)`` when both refer to columns of attachment N, else None."""
+    x_ref, y_ref = parse_file_ref(x_text), parse_file_ref(y_text)
+    if x_ref is None or y_ref is None or x_ref[0] != y_ref[0]:
+        return None
+    return x_ref[0], x_ref[1], y_ref[1]
+
+async def _resolve_paired_values(ctx, x_text, y_text):
+    x = await resolve_values(ctx, x_text)
+    y = await resolve_values(ctx, y_text)
+    if len(x) != len(y):
+        raise ValueError("X and Y must have the same number of elements. Can't pair up what doesn't match")
+    return x, y
+
+async def resolve_bivariate(ctx, x_text, y_text):
+    """Summarise paired data as BivariateMoments.
+
+    Two columns of the same attachment are streamed, so memory stays
+    bounded however long the file is; anything else is resolved to arrays.
+    """
+    session = _same_session_pair(ctx, x_text, y_text)
+    if session is not None:
+        dataset, x_column, y_column = session
+        return await _derived(dataset, ('bivariate', x_column, y_column), BivariateMoments.from_values,
+                              dataset.columns[x_column], dataset.columns[y_column])
+    pair = _same_file_pair(x_text, y_text)
+    if pair is None:
+        x, y = await _resolve_paired_values(ctx, x_text, y_text)
+        return await run_blocking(BivariateMoments.from_values, x, y)
+    index, x_column, y_column = pair
+    attachment = get_attachment(ctx, index)
+    data = await download(attachment)
+    return await run_blocking(summarize_pair, data, detect_format(attachment.filename), x_column, y_column)
+
+async def resolve_spearman(ctx, x_text, y_text, exact=None):
+    """Spearman's rho of paired data; see ``spearman`` and ``spearman_pair``."""
+    session = _same_session_pair(ctx, x_text, y_text)
+    if session is not None:
+        dataset, x_column, y_column = session
+        return await _derived(dataset, ('spearman', x_column, y_column, exact), spearman,
+                              dataset.columns[x_column], dataset.columns[y_column], exact)
+    pair = _same_file_pair(x_text, y_text)
+    if pair is None:
+        x, y = await _resolve_paired_values(ctx, x_text, y_text)
+        return await run_blocking(spearman, x, y, exact)
+    index, x_column, y_column = pair
+    attachment = get_attachment(ctx, index)
+    data = await download(attachment)
+    return await run_blocking(spearman_pair, data, detect_format(attachment.filename), x_column, y_column, exact)
+
+async def resolve_linear_model(ctx, response, predictors, solver='auto'):
+    """Fit ``fit_table`` on an attachment, or ``fit_arrays`` on a loaded dataset.
+
+    ``response`` is a column name, optionally as ``fileN:column`` to pick
+    the attachment or ``@name:column`` to use a dataset from ``!load``;
+    ``predictors`` is a comma-separated list of columns of the same file
+    or dataset, with ``C(column)`` for categorical ones.
+    """
+    session = parse_session_ref(response)
+    ref = parse_file_ref(response)
+    index, response = ref if ref is not None else (1, response)
+    numeric, categorical = [], []
+    for term in predictors.split(','):
+        term = term.strip()
+        if not term:
+            continue
+        match = CATEGORICAL.match(term)
+        if match:
+            categorical.append(match.group(1))
+        else:
+            numeric.append(term)
+    if not numeric and not categorical:
+        raise ValueError("You need at least one predictor")
+    if session is not None:
+        if categorical:
+            raise ValueError("Loaded datasets only keep numeric columns, so C() needs the file attached")
+        dataset, response = session_column(ctx, session)
+        columns = [dataset.columns[dataset.column(name)] for name in numeric]
+        return await run_blocking(fit_arrays, dataset.columns[response], np.column_stack(columns), numeric,
+                                  (), solver)
+    attachment = get_attachment(ctx, index)
+    data = await download(attachment)
+    return await run_blocking(fit_table, data, detect_format(attachment.filename), response,
+                              numeric, categorical, solver)
+
+async def load_dataset(ctx, name, text=None):
+    """Store data under ``name`` for the author, for ``@name`` references.
+
+    ``text`` is inline data or ``fileN:column`` for one column, or
+    ``fileN`` (the default: ``file``) for every numeric column of an
+    attachment.
+    """
+    text = (text or 'file').strip()
+    whole_file = re.match(r'^file(\d*)$', text)
+    if whole_file:
+        attachment = get_attachment(ctx, int(whole_file.group(1) or 1))
+        data = await download(attachment)
+        columns = await run_blocking(read_table, data, detect_format(attachment.filename))
+    else:
+        ref = parse_file_ref(text)
+        column = ref[1] if ref is not None else 'value'
+        columns = {column: np.array(await resolve_values(ctx, text))}
+    return get_sessions().put(ctx.author.id, name, columns)
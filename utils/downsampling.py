@@ -0,0 +1,93 @@
+# utils/downsampling.py
+import os
+import numpy as np
+
+# Above this many points a scatter is drawn as a hexbin density instead of
+# one marker per point; past a few tens of thousands the markers only
+# overdraw each other anyway.
+MAX_SCATTER_POINTS = int(os.getenv("MEKAKO_MAX_SCATTER_POINTS", "20000"))
+
+# Lines are reduced to this many points, about twice the width of a plot
+# in pixels.
+MAX_LINE_POINTS = 2000
+
+# Histograms never get more bins than this, whatever the binning rule says.
+MAX_HISTOGRAM_BINS = 500
+
+KDE_GRID_SIZE = 1024
+
+
+def lttb(x, y, n_out=MAX_LINE_POINTS):
+    """Largest-Triangle-Three-Buckets downsampling of a line to ``n_out`` points.
+
+    ``x`` must be sorted. The first and last points are kept; from every
+    bucket in between the point forming the largest triangle with the
+    previously kept point and the mean of the next bucket is kept, which
+    preserves peaks and troughs far better than taking every k-th point.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if x.size <= n_out or n_out < 3:
+        return x, y
+    edges = np.linspace(1, x.size - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, x.size - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < edges.size else x.size
+        # Mean of the next bucket (just the last point for the final bucket).
+        next_x = x[stop:next_stop].mean()
+        next_y = y[stop:next_stop].mean()
+        bx, by = x[start:stop], y[start:stop]
+        area = np.abs((x[previous] - next_x) * (by - y[previous]) - (x[previous] - bx) * (next_y - y[previous]))
+        previous = keep[i + 1] = start + int(np.argmax(area))
+    return x[keep], y[keep]
+
+
+def histogram(values, bins='auto', max_bins=MAX_HISTOGRAM_BINS):
+    """Bin edges and counts, with the number of bins capped at ``max_bins``."""
+    values = np.asarray(values, dtype=np.float64)
+    edges = np.histogram_bin_edges(values, bins=bins)
+    if edges.size - 1 > max_bins:
+        edges = np.linspace(edges[0], edges[-1], max_bins + 1)
+    counts, edges = np.histogram(values, bins=edges)
+    return edges, counts
+
+
+def scott_bandwidth(values):
+    """Scott's rule, as used by ``scipy.stats.gaussian_kde`` and seaborn."""
+    return np.std(values, ddof=1) * values.size ** (-1 / 5)
+
+
+def binned_kde(values, grid_size=KDE_GRID_SIZE, bandwidth=None, cut=3):
+    """Gaussian KDE evaluated on a regular grid in O(n + grid log grid).
+
+    The data is linearly binned onto ``grid_size`` points spanning ``cut``
+    bandwidths beyond the data (as seaborn does), and the binned counts are
+    convolved with the kernel by FFT. Returns ``(grid, density)``, or None
+    when the data has no spread to estimate from.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size < 2:
+        return None
+    bandwidth = bandwidth or scott_bandwidth(values)
+    if not bandwidth > 0:
+        return None
+    low, high = values.min() - cut * bandwidth, values.max() + cut * bandwidth
+    grid, delta = np.linspace(low, high, grid_size, retstep=True)
+
+    position = (values - low) / delta
+    index = np.minimum(position.astype(np.int64), grid_size - 2)
+    weight = position - index
+    counts = (np.bincount(index, 1 - weight, minlength=grid_size)
+              + np.bincount(index + 1, weight, minlength=grid_size))
+
+    sigma = bandwidth / delta
+    reach = min(grid_size - 1, int(np.ceil(5 * sigma)))
+    offsets = np.arange(-reach, reach + 1)
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2) / (sigma * np.sqrt(2 * np.pi))
+    size = 1 << int(np.ceil(np.log2(grid_size + kernel.size - 1)))
+    smoothed = np.fft.irfft(np.fft.rfft(counts, size) * np.fft.rfft(kernel, size), size)
+    density = smoothed[reach:reach + grid_size] / (values.size * delta)
+    return grid, np.maximum(density, 0.0)
@@ -0,0 +1,130 @@
+# utils/executor.py
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from .metrics import span, watch_executor
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when too many jobs are already waiting for a worker."""
+
+
+class ComputeTimeoutError(RuntimeError):
+    """Raised when a job takes longer than its allotted time."""
+
+
+class ComputeExecutor:
+    """Runs blocking stats and plotting work off the event loop.
+
+    The gateway loop only ever awaits the returned futures. ``backend`` is
+    ``"thread"``, ``"process"`` or ``"remote"`` (the shared backend started
+    by launcher.py, see utils/backend.py). With the process and remote
+    backends every submitted callable and its arguments must be picklable,
+    so submit module-level functions rather than closures.
+    """
+
+    def __init__(self, backend="thread", max_workers=None, max_pending=32, timeout=30.0,
+                 initializer=None, initargs=()):
+        if backend not in ("thread", "process", "remote"):
+            raise ValueError(f"Unknown executor backend '{backend}'. Use 'thread', 'process' or 'remote'.")
+        self.backend = backend
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._initializer = initializer
+        self._initargs = initargs
+        self._pool = None
+        self._pending = 0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.backend == "remote":
+                # Imported here: the backend module depends on the render service.
+                from .backend import RemotePool
+                self._pool = RemotePool(max_workers=self.max_workers)
+            elif self.backend == "process":
+                # Spawned like the shared backend's workers: forking a process
+                # that runs an event loop and threads isn't safe.
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=self._initializer,
+                                                 initargs=self._initargs)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="mekako-compute",
+                                                initializer=self._initializer,
+                                                initargs=self._initargs)
+        return self._pool
+
+    async def submit(self, func, *args, timeout=None, **kwargs):
+        """Run ``func(*args, **kwargs)`` in the pool and await its result.
+
+        Raises ExecutorBusyError if ``max_pending`` jobs are already queued or
+        running, and ComputeTimeoutError if the job does not finish within
+        ``timeout`` seconds (the executor default when not given). A job that
+        times out or whose awaiting task is cancelled is cancelled in the pool
+        if it has not started yet.
+        """
+        if self._pending >= self.max_pending:
+            raise ExecutorBusyError("I'm already crunching too many numbers. Try again in a moment.")
+
+        timeout = self.timeout if timeout is None else timeout
+        future = self._get_pool().submit(func, *args, **kwargs)
+        self._pending += 1
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise ComputeTimeoutError(f"That took longer than {timeout:g} seconds, so I gave up on it.")
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        finally:
+            self._pending -= 1
+
+    def shutdown(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+_executor = None
+
+
+def executor_from_env():
+    """Build a ComputeExecutor configured from MEKAKO_EXECUTOR_* environment variables."""
+    workers = os.getenv("MEKAKO_EXECUTOR_WORKERS")
+    return ComputeExecutor(
+        backend=os.getenv("MEKAKO_EXECUTOR_BACKEND", "thread"),
+        max_workers=int(workers) if workers else None,
+        max_pending=int(os.getenv("MEKAKO_EXECUTOR_QUEUE", "32")),
+        timeout=float(os.getenv("MEKAKO_EXECUTOR_TIMEOUT", "30")),
+    )
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = executor_from_env()
+        watch_executor('compute', _executor)
+    return _executor
+
+
+def set_executor(executor):
+    """Replace the shared executor, shutting down the previous one."""
+    global _executor
+    if _executor is not None and _executor is not executor:
+        _executor.shutdown(wait=False)
+    _executor = executor
+    watch_executor('compute', executor)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run ``func`` on the shared executor. Accepts an optional ``timeout`` keyword."""
+    with span('compute'):
+        return await get_executor().submit(func, *args, **kwargs)
@@ -9,9 +9,10 @@ class Intent:
         self.patterns = patterns
         self.responses = responses
 
-    def get_response(self, message):
+    def get_response(self, message, term=None):
         if self.name == "stats_term":
-            term = re.search(self.patterns[0], message, re.IGNORECASE).group()
+            if term is None:
+                term = re.search(self.patterns[0], message, re.IGNORECASE).group()
             return random.choice(self.responses).format(term=term)
         return random.choice(self.responses)
 
@@ -58,8 +59,123 @@ intents = [
     # Add more intents as needed
 ]
 
+try:
+    import re._parser as sre_parse
+    from re._constants import AT, BRANCH, LITERAL, SUBPATTERN
+except ImportError:  # Python < 3.11
+    import sre_parse
+    from sre_constants import AT, BRANCH, LITERAL, SUBPATTERN
+
+def _literal_prefixes(items):
+    """Literal strings one of which must start any match of ``items``, or None.
+
+    Handles the shapes intent patterns actually use: boundaries, literals,
+    groups and alternations. Anything else ends the prefix; a pattern that
+    has no literal prefix at all can't be indexed.
+    """
+    prefix = ''
+    for op, arg in items:
+        if op is AT and not prefix:
+            continue
+        if op is LITERAL:
+            prefix += chr(arg).lower()
+            continue
+        if op is SUBPATTERN:
+            tails = _literal_prefixes(arg[-1])
+        elif op is BRANCH:
+            alternatives = [_literal_prefixes(branch) for branch in arg[1]]
+            tails = None if None in alternatives else set().union(*alternatives)
+        else:
+            tails = None
+        if tails is None:
+            return {prefix} if prefix else None
+        return {prefix + tail for tail in tails}
+    return {prefix} if prefix else None
+
+class _KeywordAutomaton:
+    """Aho-Corasick automaton reporting which keywords occur in a string."""
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._outputs = [set()]
+        for keyword, value in keywords:
+            state = 0
+            for char in keyword:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._outputs.append(set())
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._outputs[state].add(value)
+
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                if state:
+                    self._fail[child] = self._goto[fallback].get(char, 0)
+                self._outputs[child] |= self._outputs[self._fail[child]]
+
+    def find(self, text):
+        found = set()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+class IntentMatcher:
+    """Finds the highest-priority intent for a message in one scan.
+
+    Every pattern is compiled once. Patterns whose literal prefixes can be
+    worked out are indexed in an Aho-Corasick automaton, so a message is
+    scanned once whatever the number of intents, and only intents whose
+    keywords actually occur are confirmed with their regex. Patterns with no
+    literal prefix are always checked.
+    """
+
+    def __init__(self, intents):
+        self.intents = list(intents)
+        self._compiled = [[re.compile(pattern, re.IGNORECASE) for pattern in intent.patterns]
+                          for intent in self.intents]
+        keywords = []
+        self._always = set()
+        for priority, intent in enumerate(self.intents):
+            for pattern in intent.patterns:
+                prefixes = _literal_prefixes(sre_parse.parse(pattern, re.IGNORECASE))
+                if prefixes is None:
+                    self._always.add(priority)
+                else:
+                    keywords.extend((prefix, priority) for prefix in prefixes)
+        self._automaton = _KeywordAutomaton(keywords)
+
+    def match(self, message):
+        """Return ``(intent, matched_text)``, or ``(None, None)`` if nothing matches."""
+        candidates = self._automaton.find(message.lower()) | self._always
+        for priority in sorted(candidates):
+            for regex in self._compiled[priority]:
+                found = regex.search(message)
+                if found:
+                    return self.intents[priority], found.group()
+        return None, None
+
+_matcher = IntentMatcher(intents)
+
+def compile_intents():
+    """Rebuild the matcher after ``intents`` has been changed."""
+    global _matcher
+    _matcher = IntentMatcher(intents)
+
+def match_intent(message):
+    return _matcher.match(message)
+
 def get_intent(message):
-    for intent in intents:
-        if any(re.search(pattern, message, re.IGNORECASE) for pattern in intent.patterns):
-            return intent
-    return None
\ No newline at end of file
+    return match_intent(message)[0]
@@ -0,0 +1,62 @@
+# utils/lazy.py
+import asyncio
+import importlib
+import threading
+
+_modules = {}
+
+
+class LazyModule:
+    """Stands in for a module and imports it on first attribute access.
+
+    Importing is guarded by a lock so that the background prewarm and a
+    command touching the module at the same moment can't race.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    """Return a LazyModule for ``name``; repeated calls share one proxy."""
+    module = _modules.get(name)
+    if module is None:
+        module = _modules[name] = LazyModule(name)
+    return module
+
+
+def pending_modules():
+    return [name for name, module in _modules.items() if not module.loaded]
+
+
+async def prewarm(names=None):
+    """Import lazily-imported modules (all pending ones by default) in a background thread.
+
+    Meant to run once the bot is connected, so the first test after a
+    restart doesn't pay for importing scipy.
+    """
+    for name in pending_modules() if names is None else names:
+        await asyncio.to_thread(lazy_import(name)._load)
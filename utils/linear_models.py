@@ -0,0 +1,251 @@
+# utils/linear_models.py
+import math
+import os
+from collections import namedtuple
+import numpy as np
+from .lazy import lazy_import
+from .stat_tables import t_cdf
+
+sparse = lazy_import('scipy.sparse')
+special = lazy_import('scipy.special')
+
+SOLVERS = ('auto', 'qr', 'normal', 'sparse')
+
+# The QR solver needs the whole design matrix in memory. Past this many
+# cells ``auto`` streams normal equations instead, and ``qr`` refuses.
+QR_MAX_CELLS = int(os.getenv("MEKAKO_QR_MAX_CELLS", str(1 << 24)))
+
+# ``auto`` builds one-hot columns as sparse matrices once the categorical
+# predictors have this many levels between them.
+SPARSE_MIN_LEVELS = 32
+
+# Columns of the design matrix, intercept and one-hot levels included.
+MAX_TERMS = 1000
+
+ModelFit = namedtuple('ModelFit', 'names coefficients stderr p_values r_squared adj_r_squared '
+                                  'f_statistic f_p_value n solver')
+
+def design_names(numeric, categorical=()):
+    """Names of the design columns: intercept, numeric columns, then ``name[level]``.
+
+    ``categorical`` is a list of ``(name, levels)``; the first level is the
+    reference and gets no column.
+    """
+    names = ['intercept', *numeric]
+    for name, levels in categorical:
+        names += [f'{name}[{level}]' for level in levels[1:]]
+    return names
+
+def design_block(numeric, codes, level_counts, as_sparse=False):
+    """Design rows for a block as ``(dense, onehot)``.
+
+    ``dense`` holds the intercept and numeric columns; ``onehot`` the
+    indicator columns of the categorical predictors, as a scipy.sparse CSR
+    matrix with ``as_sparse`` and a dense array otherwise, or None without
+    any. ``codes`` is a ``(rows, len(level_counts))`` integer array of
+    level indices; code 0 is each predictor's reference level.
+    """
+    rows = numeric.shape[0]
+    dense = np.column_stack([np.ones(rows), numeric])
+    if not level_counts:
+        return dense, None
+    offsets = np.cumsum([0] + [count - 1 for count in level_counts])
+    row_index, column_index = [], []
+    for j in range(len(level_counts)):
+        hit = np.nonzero(codes[:, j])[0]
+        row_index.append(hit)
+        column_index.append(offsets[j] + codes[hit, j] - 1)
+    row_index = np.concatenate(row_index)
+    column_index = np.concatenate(column_index)
+    if as_sparse:
+        onehot = sparse.csr_matrix((np.ones(row_index.size), (row_index, column_index)),
+                                   shape=(rows, offsets[-1]))
+    else:
+        onehot = np.zeros((rows, offsets[-1]))
+        onehot[row_index, column_index] = 1.0
+    return dense, onehot
+
+def _collinear():
+    return ValueError("Some predictors are exact combinations of others, so their effects can't be told apart")
+
+class NormalEquations:
+    """Running X'X, X'y and y'y of a least-squares problem, block by block.
+
+    Only the p × p cross-products are kept, so memory does not grow with
+    the number of rows, and instances built on separate blocks or workers
+    can be merged.
+    """
+
+    def __init__(self, terms):
+        self.n = 0
+        self.xtx = np.zeros((terms, terms))
+        self.xty = np.zeros(terms)
+        self.yty = 0.0
+        self.sum_y = 0.0
+
+    def update(self, dense, onehot, y):
+        """Add a block given as from ``design_block``.
+
+        A sparse ``onehot`` is never densified: its products with itself
+        and with the dense columns are formed sparse, which is where
+        one-hot encoding of many levels saves most of the work.
+        """
+        y = np.asarray(y, dtype=np.float64)
+        d = dense.shape[1]
+        self.xtx[:d, :d] += dense.T @ dense
+        self.xty[:d] += dense.T @ y
+        if onehot is not None:
+            cross = np.asarray(onehot.T @ dense)
+            self.xtx[d:, :d] += cross
+            self.xtx[:d, d:] += cross.T
+            inner = onehot.T @ onehot
+            self.xtx[d:, d:] += inner.toarray() if hasattr(inner, 'toarray') else inner
+            self.xty[d:] += onehot.T @ y
+        self.yty += float(y @ y)
+        self.sum_y += float(y.sum())
+        self.n += y.size
+        return self
+
+    def merge(self, other):
+        """Fold ``other`` into this accumulator and return self."""
+        self.xtx += other.xtx
+        self.xty += other.xty
+        self.yty += other.yty
+        self.sum_y += other.sum_y
+        self.n += other.n
+        return self
+
+    def solve(self):
+        """``(coefficients, (X'X)^-1, residual sum of squares, total sum of squares)`` via Cholesky.
+
+        X'X is scaled to a unit diagonal before factoring, so the
+        collinearity check does not depend on the predictors' units.
+        """
+        scale = np.sqrt(np.diag(self.xtx))
+        if scale.min() <= 0:
+            raise _collinear()
+        outer = np.outer(scale, scale)
+        try:
+            lower = np.linalg.cholesky(self.xtx / outer)
+        except np.linalg.LinAlgError:
+            raise _collinear() from None
+        if (np.diag(lower) ** 2).min() <= 1e-10:
+            raise _collinear()
+        lower_inv = np.linalg.inv(lower)
+        unscaled = (lower_inv.T @ lower_inv) / outer
+        coefficients = unscaled @ self.xty
+        rss = max(0.0, self.yty - float(coefficients @ self.xty))
+        tss = self.yty - self.sum_y ** 2 / self.n
+        return coefficients, unscaled, rss, tss
+
+def solve_qr(X, y):
+    """``(coefficients, (X'X)^-1, residual sum of squares, total sum of squares)`` via QR.
+
+    ``numpy.linalg.lstsq`` gives the coefficients and rank; the R factor
+    alone (no Q) gives the standard errors.
+    """
+    coefficients, _, rank, _ = np.linalg.lstsq(X, y, rcond=None)
+    if rank < X.shape[1]:
+        raise _collinear()
+    r_inv = np.linalg.inv(np.linalg.qr(X, mode='r'))
+    residuals = y - X @ coefficients
+    centred = y - y.mean()
+    return coefficients, r_inv @ r_inv.T, float(residuals @ residuals), float(centred @ centred)
+
+def fit_chunks(chunks, names, level_counts=(), solver='auto'):
+    """Least-squares fit of y on the design described by ``names``.
+
+    ``chunks`` yields ``(y, numeric, codes)`` blocks as taken by
+    ``design_block``. ``qr`` keeps every row and factors the whole design
+    matrix; ``normal`` streams the blocks into NormalEquations; ``sparse``
+    does the same with one-hot columns as scipy.sparse matrices. ``auto``
+    keeps rows for QR up to QR_MAX_CELLS and switches to streaming past
+    it, or goes sparse straight away when the categorical predictors have
+    many levels. All of them are linear in rows.
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"'{solver}' isn't a solver I know. Use auto, qr, normal or sparse")
+    terms = len(names)
+    if terms > MAX_TERMS:
+        raise ValueError(f"That model has {terms} terms. I only fit up to {MAX_TERMS}.")
+    as_sparse = solver == 'sparse' or (solver == 'auto' and sum(level_counts) >= SPARSE_MIN_LEVELS)
+    kept = [] if solver == 'qr' or (solver == 'auto' and not as_sparse) else None
+    normal = None if kept is not None else NormalEquations(terms)
+
+    # Numeric columns and y are shifted by the first block's means, which
+    # keeps X'X well conditioned when values are large next to their
+    # spread. The intercept is shifted back at the end.
+    shift = y_shift = None
+    cells = 0
+    for y, numeric, codes in chunks:
+        if shift is None:
+            shift, y_shift = numeric.mean(axis=0), y.mean()
+        dense, onehot = design_block(numeric - shift, codes, level_counts, as_sparse)
+        y = y - y_shift
+        if kept is not None:
+            cells += y.size * terms
+            if cells > QR_MAX_CELLS:
+                if solver == 'qr':
+                    raise ValueError(f"That's more than {QR_MAX_CELLS:,} cells for the QR solver. Use normal instead.")
+                normal = NormalEquations(terms)
+                for block in kept:
+                    normal.update(*block)
+                kept = None
+            else:
+                kept.append((dense, onehot, y))
+                continue
+        normal.update(dense, onehot, y)
+    if shift is None:
+        raise ValueError("That file doesn't contain any rows.")
+
+    if kept is not None:
+        X = np.concatenate([np.hstack([dense, onehot]) if onehot is not None else dense
+                            for dense, onehot, _ in kept])
+        y = np.concatenate([y for _, _, y in kept])
+        n = y.size
+        coefficients, unscaled, rss, tss = solve_qr(X, y)
+        used = 'qr'
+    else:
+        n = normal.n
+        coefficients, unscaled, rss, tss = normal.solve()
+        used = 'sparse' if as_sparse else 'normal'
+    df = n - terms
+    if df < 1:
+        raise ValueError(f"{terms} terms need more than {terms} rows, and you gave me {n}.")
+
+    # Undo the shift: only the intercept moves, by -Σ b_j·shift_j + y_shift.
+    transform = np.eye(terms)
+    transform[0, 1:1 + shift.size] = -shift
+    coefficients = transform @ coefficients
+    coefficients[0] += y_shift
+    sigma2 = rss / df
+    stderr = np.sqrt(np.maximum(np.diag(transform @ unscaled @ transform.T), 0.0) * sigma2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = coefficients / stderr
+    p_values = np.array([2 * t_cdf(-abs(value), df) if np.isfinite(value) else 0.0 for value in t])
+
+    r_squared = 1.0 - rss / tss if tss > 0 else math.nan
+    adj_r_squared = 1.0 - (1.0 - r_squared) * (n - 1) / df
+    model_df = terms - 1
+    if model_df > 0 and r_squared < 1:
+        f_statistic = (r_squared / model_df) / ((1.0 - r_squared) / df)
+        f_p_value = float(special.fdtrc(model_df, df, f_statistic))
+    else:
+        f_statistic, f_p_value = math.nan, math.nan
+    return ModelFit(names, coefficients, stderr, p_values, r_squared, adj_r_squared,
+                    f_statistic, f_p_value, n, used)
+
+def fit_arrays(y, numeric, numeric_names, categorical=(), solver='auto', chunk_rows=65536):
+    """``fit_chunks`` over in-memory arrays.
+
+    ``numeric`` is ``(rows, k)``; ``categorical`` is a list of
+    ``(name, codes, levels)`` with codes indexing into levels.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    numeric = np.asarray(numeric, dtype=np.float64).reshape(y.size, -1)
+    codes = np.column_stack([c for _, c, _ in categorical]) if categorical else None
+    names = design_names(numeric_names, [(name, levels) for name, _, levels in categorical])
+    chunks = ((y[start:start + chunk_rows], numeric[start:start + chunk_rows],
+               None if codes is None else codes[start:start + chunk_rows])
+              for start in range(0, y.size, chunk_rows))
+    return fit_chunks(chunks, names, [len(levels) for _, _, levels in categorical], solver)
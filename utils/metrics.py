@@ -0,0 +1,324 @@
+# utils/metrics.py
+import asyncio
+import contextvars
+import math
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from discord.ext import commands
+from .sketches import QuantileSketch
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Upper bounds (seconds) of the latency histogram buckets, as exported to Prometheus.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Where a command's time goes. Anything not covered by a phase is handler
+# time: Python code running on the event loop itself.
+PHASES = ('admission', 'parse', 'compute', 'render', 'upload')
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Cumulative bucket counts for Prometheus plus a sketch for percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.sketch = QuantileSketch(k=100)
+
+    @property
+    def count(self):
+        return self.sketch.n
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.sketch.update([value])
+
+    def percentiles(self, qs=PERCENTILES):
+        return self.sketch.quantile(list(qs))
+
+
+class Metrics:
+    """Counters, histograms and gauges, each keyed by a tuple of label values.
+
+    Everything is updated from the event loop thread, so no locking is
+    needed. ``gauge_functions`` are sampled when the exposition is rendered.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters = defaultdict(lambda: defaultdict(int))
+        self.histograms = defaultdict(dict)
+        self.gauges = defaultdict(lambda: defaultdict(int))
+        self.gauge_functions = {}
+        self.help = {}
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, labels=(), amount=1):
+        self.counters[name][labels] += amount
+
+    def gauge(self, name, labels=(), delta=1):
+        self.gauges[name][labels] += delta
+
+    def observe(self, name, labels, value):
+        series = self.histograms[name]
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram()
+        histogram.observe(value)
+
+    def gauge_function(self, name, labels, func):
+        """Report ``func()`` as gauge ``name`` whenever metrics are exported."""
+        self.gauge_functions.setdefault(name, {})[labels] = func
+
+
+_metrics = Metrics()
+
+# Label names of every series, in the order their label tuples are stored.
+LABELS = {
+    'mekako_commands_total': ('command', 'outcome'),
+    'mekako_command_errors_total': ('command', 'error'),
+    'mekako_command_seconds': ('command',),
+    'mekako_command_phase_seconds': ('command', 'phase'),
+    'mekako_commands_in_flight': ('command',),
+    'mekako_executor_pending': ('executor',),
+}
+
+
+def _describe_metrics(metrics):
+    metrics.describe('mekako_commands_total', 'counter', 'Commands invoked, by outcome (ok or failed).')
+    metrics.describe('mekako_command_errors_total', 'counter', 'Command errors, by exception type.')
+    metrics.describe('mekako_command_seconds', 'histogram', 'Wall time from invocation to the end of the command.')
+    metrics.describe('mekako_command_phase_seconds', 'histogram',
+                     'Time spent in each phase: admission, parse, compute, render, upload.')
+    metrics.describe('mekako_commands_in_flight', 'gauge', 'Commands currently running.')
+    metrics.describe('mekako_executor_pending', 'gauge', 'Jobs queued or running on each executor.')
+    metrics.describe('mekako_admission_queue', 'gauge', 'Commands held back waiting for admission.')
+
+
+_describe_metrics(_metrics)
+
+
+def get_metrics():
+    return _metrics
+
+
+def watch_executor(name, executor):
+    """Export the number of jobs pending on a ComputeExecutor."""
+    get_metrics().gauge_function('mekako_executor_pending', (name,), lambda: executor.pending)
+
+
+class CommandTimer:
+    """Per-invocation timing state, shared by the spans opened while it runs."""
+
+    def __init__(self, command):
+        self.command = command
+        self.start = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.prepared = None
+
+
+_current = contextvars.ContextVar('mekako_command_timer', default=None)
+
+
+def command_name(ctx):
+    return ctx.command.qualified_name if ctx.command is not None else 'unknown'
+
+
+@contextmanager
+def span(phase):
+    """Time a block as ``phase`` of the command currently being invoked.
+
+    Outside a command (e.g. during prewarm) this does nothing.
+    """
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.phases[phase] += time.perf_counter() - start
+
+
+async def timed_invoke(ctx, invoke):
+    """Run ``invoke(ctx)`` under a CommandTimer and record the result.
+
+    Used by the bot's ``invoke`` so every registered command is covered,
+    including ones loaded or reloaded later.
+    """
+    if ctx.command is None:
+        await invoke(ctx)
+        return
+    metrics = get_metrics()
+    name = command_name(ctx)
+    timer = CommandTimer(name)
+    token = _current.set(timer)
+    metrics.gauge('mekako_commands_in_flight', (name,), 1)
+    try:
+        await invoke(ctx)
+    finally:
+        _current.reset(token)
+        metrics.gauge('mekako_commands_in_flight', (name,), -1)
+        elapsed = time.perf_counter() - timer.start
+        outcome = 'failed' if ctx.command_failed else 'ok'
+        metrics.inc('mekako_commands_total', (name, outcome))
+        metrics.observe('mekako_command_seconds', (name,), elapsed)
+        if timer.prepared is not None:
+            # Checks and argument conversion, less any wait for admission.
+            timer.phases['parse'] = max(0.0, timer.prepared - timer.start - timer.phases['admission'])
+        for phase, seconds in timer.phases.items():
+            metrics.observe('mekako_command_phase_seconds', (name, phase), seconds)
+
+
+async def mark_prepared(ctx):
+    """Global ``before_invoke`` hook: arguments are parsed, the callback is about to run."""
+    timer = _current.get()
+    if timer is not None:
+        timer.prepared = time.perf_counter()
+
+
+def record_error(ctx, error):
+    error = getattr(error, 'original', error)
+    get_metrics().inc('mekako_command_errors_total', (command_name(ctx), type(error).__name__))
+
+
+class TimedContext(commands.Context):
+    """A Context whose sends are timed as the ``upload`` phase."""
+
+    async def send(self, *args, **kwargs):
+        with span('upload'):
+            return await super().send(*args, **kwargs)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _process_samples():
+    samples = [('process_cpu_seconds_total', 'counter', 'User and system CPU time.', time.process_time()),
+               ('process_start_time_seconds', 'gauge', 'When the bot started, as a Unix timestamp.',
+                get_metrics().started)]
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux.
+        samples.append(('process_max_resident_memory_bytes', 'gauge', 'Peak resident memory.',
+                        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024))
+    return samples
+
+
+def exposition(metrics=None):
+    """Render every metric in the Prometheus text format (version 0.0.4)."""
+    metrics = metrics or get_metrics()
+    lines = []
+
+    def header(name, kind, text):
+        lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    sampled = {name: {labels: func() for labels, func in funcs.items()}
+               for name, funcs in metrics.gauge_functions.items()}
+    for name, series in [*metrics.counters.items(), *metrics.gauges.items(), *sampled.items()]:
+        kind, text = metrics.help.get(name, ('untyped', name))
+        header(name, kind, text)
+        for labels, value in sorted(series.items()):
+            lines.append(f'{name}{_labels(LABELS.get(name, ()), labels)} {_number(value)}')
+    for name, series in metrics.histograms.items():
+        kind, text = metrics.help.get(name, ('histogram', name))
+        header(name, kind, text)
+        names = LABELS.get(name, ())
+        for labels, histogram in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (math.inf,), histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(names, labels, [("le", _number(bound))])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(names, labels)} {_number(histogram.sum)}')
+            lines.append(f'{name}_count{_labels(names, labels)} {histogram.count}')
+    for name, kind, text, value in _process_samples():
+        header(name, kind, text)
+        lines.append(f'{name} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def command_percentiles(metrics=None):
+    """``{command: (count, p50, p95, p99)}`` for every command that has run."""
+    metrics = metrics or get_metrics()
+    result = {}
+    for (name,), histogram in metrics.histograms.get('mekako_command_seconds', {}).items():
+        result[name] = (histogram.count, *histogram.percentiles())
+    return result
+
+
+def phase_totals(command, metrics=None):
+    """Mean seconds per invocation of ``command`` spent in each phase.
+
+    ``handler`` is whatever is left: time on the event loop outside any phase.
+    """
+    metrics = metrics or get_metrics()
+    series = metrics.histograms.get('mekako_command_phase_seconds', {})
+    total = metrics.histograms.get('mekako_command_seconds', {}).get((command,))
+    if total is None:
+        return {}
+    result = {phase: series[(command, phase)].sum / total.count
+              for phase in PHASES if (command, phase) in series}
+    result['handler'] = max(0.0, total.sum / total.count - sum(result.values()))
+    return result
+
+
+async def _serve(reader, writer):
+    try:
+        request = await asyncio.wait_for(reader.readline(), 5)
+        # Drain the headers; nothing in them matters here.
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request.split()
+        if len(parts) >= 2 and parts[0] == b'GET' and parts[1].split(b'?')[0] in (b'/', b'/metrics'):
+            status, body = '200 OK', exposition().encode()
+        else:
+            status, body = '404 Not Found', b'Not found\n'
+        writer.write(f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                     f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_exporter(port=None, host=None):
+    """Serve ``/metrics`` over HTTP, on MEKAKO_METRICS_PORT unless ``port`` is given.
+
+    Returns the asyncio server, or None when no port is configured.
+    """
+    port = port if port is not None else os.getenv("MEKAKO_METRICS_PORT")
+    if not port:
+        return None
+    host = host or os.getenv("MEKAKO_METRICS_HOST", "127.0.0.1")
+    return await asyncio.start_server(_serve, host, int(port))
@@ -0,0 +1,100 @@
+# utils/mock_gateway.py
+import asyncio
+from collections import namedtuple
+from discord.ext import commands
+from discord.ext.commands.view import StringView
+
+# One thing the bot sent back: its text and any attached (filename, bytes).
+Reply = namedtuple('Reply', ['content', 'files'])
+
+
+class FakeObject:
+    """Anything that only needs an ``id``: users, channels, guilds."""
+
+    def __init__(self, id):
+        self.id = id
+
+
+class FakeAttachment:
+    def __init__(self, filename, data, id=None):
+        self.filename = filename
+        self.size = len(data)
+        self.id = id if id is not None else hash((filename, data))
+        self._data = data
+
+    async def read(self):
+        return self._data
+
+
+class FakeMessage:
+    _state = None
+
+    def __init__(self, content, author, channel, guild, attachments=()):
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = guild
+        self.attachments = list(attachments)
+        self.edits = []
+
+    async def edit(self, content=None, **kwargs):
+        self.edits.append(content)
+        self.content = content
+
+
+class MockContext(commands.Context):
+    """A Context whose replies are recorded instead of sent to Discord."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.replies = []
+
+    async def send(self, content=None, *, file=None, files=None, **kwargs):
+        attached = [file] if file is not None else list(files or [])
+        data = []
+        for f in attached:
+            fp = f.fp
+            fp.seek(0)
+            data.append((f.filename, fp.read()))
+        self.replies.append(Reply(content, data))
+        return FakeMessage(content, self.bot.user, self.channel, self.guild)
+
+
+def guild_for_shard(shard_id, shard_count, n=0):
+    """A guild id that Discord would route to ``shard_id``: (id >> 22) % shard_count."""
+    return (shard_id + n * shard_count) << 22
+
+
+class MockGateway:
+    """Feeds command messages straight to a bot, with no Discord connection.
+
+    Commands go through the bot's real parsing, checks (including admission
+    control) and error handlers; only the transport is faked. Call
+    ``start()`` first so the extensions are loaded as they would be on login.
+    """
+
+    def __init__(self, bot, prefix='!'):
+        self.bot = bot
+        self.prefix = prefix
+
+    async def start(self):
+        # Entering the client binds it to the running loop, as login() would
+        # before connecting; setup_hook then loads the commands.
+        await self.bot.__aenter__()
+        await self.bot.setup_hook()
+
+    async def send(self, content, guild_id=None, channel_id=1, user_id=1, attachments=()):
+        """Deliver one message and return the list of Replies it produced."""
+        guild = FakeObject(guild_id) if guild_id is not None else None
+        message = FakeMessage(content, FakeObject(user_id), FakeObject(channel_id), guild, attachments)
+        view = StringView(content)
+        if not view.skip_string(self.prefix):
+            return []
+        invoker = view.get_word()
+        ctx = MockContext(message=message, bot=self.bot, view=view, prefix=self.prefix,
+                          invoked_with=invoker, command=self.bot.all_commands.get(invoker))
+        await self.bot.invoke(ctx)
+        # Error handlers run as separate tasks; give them a chance to reply.
+        for _ in range(3):
+            await asyncio.sleep(0)
+        return ctx.replies
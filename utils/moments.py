@@ -0,0 +1,101 @@
+# utils/moments.py
+import math
+import numpy as np
+
+class RunningMoments:
+    """Count, mean, variance, skewness, kurtosis, min and max in one pass.
+
+    Each chunk is reduced with vectorised central sums and folded into the
+    running totals with Pébay's pairwise update, so instances built on
+    separate chunks or workers can be merged without revisiting the data.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @classmethod
+    def from_values(cls, values):
+        moments = cls()
+        moments.update(values)
+        return moments
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        moments = cls()
+        for chunk in chunks:
+            moments.update(chunk)
+        return moments
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size == 0:
+            return self
+        chunk = RunningMoments()
+        chunk.n = values.size
+        chunk.mean = float(values.mean())
+        deviations = values - chunk.mean
+        squared = deviations * deviations
+        chunk.m2 = float(squared.sum())
+        chunk.m3 = float((squared * deviations).sum())
+        chunk.m4 = float((squared * squared).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        return self.merge(chunk)
+
+    def merge(self, other):
+        """Fold ``other`` into this accumulator and return self."""
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+
+        na, nb = self.n, other.n
+        n = na + nb
+        delta = other.mean - self.mean
+        delta_n = delta / n
+
+        m4 = (self.m4 + other.m4
+              + delta * delta_n ** 3 * na * nb * (na * na - na * nb + nb * nb)
+              + 6 * delta_n ** 2 * (na * na * other.m2 + nb * nb * self.m2)
+              + 4 * delta_n * (na * other.m3 - nb * self.m3))
+        m3 = (self.m3 + other.m3
+              + delta * delta_n ** 2 * na * nb * (na - nb)
+              + 3 * delta_n * (na * other.m2 - nb * self.m2))
+        m2 = self.m2 + other.m2 + delta * delta_n * na * nb
+
+        self.mean += delta_n * nb
+        self.m2, self.m3, self.m4 = m2, m3, m4
+        self.n = n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance (n - 1 in the denominator)."""
+        return self.m2 / (self.n - 1) if self.n > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def skewness(self):
+        """Sample skewness, matching ``scipy.stats.skew`` with its defaults."""
+        if self.n < 2 or self.m2 == 0:
+            return math.nan
+        return math.sqrt(self.n) * self.m3 / self.m2 ** 1.5
+
+    @property
+    def kurtosis(self):
+        """Excess kurtosis, matching ``scipy.stats.kurtosis`` with its defaults."""
+        if self.n < 2 or self.m2 == 0:
+            return math.nan
+        return self.n * self.m4 / (self.m2 * self.m2) - 3.0
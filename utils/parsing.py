@@ -0,0 +1,84 @@
+# utils/parsing.py
+import os
+import warnings
+import numpy as np
+
+MAX_VALUES = int(os.getenv("MEKAKO_MAX_VALUES", "1000000"))
+
+def _count_tokens(text, sep):
+    return text.count(sep) + 1 if sep else len(text.split())
+
+def _find_bad_token(text, sep):
+    tokens = text.split(sep) if sep else text.split()
+    for position, token in enumerate(tokens, start=1):
+        if not token.strip():
+            raise ValueError(f"Value #{position} is empty. Stray separator, maybe?")
+        try:
+            float(token)
+        except ValueError:
+            raise ValueError(f"'{token.strip()}' (value #{position}) is not a valid number.") from None
+    raise ValueError("That data could not be read as numbers.")
+
+def parse_values(text, sep=',', max_values=MAX_VALUES):
+    """Parse a separated list of numbers into a contiguous float64 array.
+
+    ``sep=None`` splits on any whitespace. The whole string is converted in
+    a single ``np.fromstring`` pass; only when that fails is it re-scanned to
+    report which value was bad.
+    """
+    count = _count_tokens(text, sep)
+    if count > max_values:
+        raise ValueError(f"That's {count} values. I only accept up to {max_values}.")
+    if not text.strip():
+        raise ValueError("You didn't give me any numbers.")
+
+    with warnings.catch_warnings():
+        # NumPy 1.x only warns (and truncates) on unparseable input.
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            values = np.fromstring(text, dtype=np.float64, sep=sep or ' ')
+        except (ValueError, DeprecationWarning):
+            _find_bad_token(text, sep)
+    if values.size != count:
+        _find_bad_token(text, sep)
+    return values
+
+def parse_groups(args, sep=',', max_values=MAX_VALUES):
+    """Parse ``label:x1,x2,...`` arguments into a list of labels and a list of arrays."""
+    labels, groups = [], []
+    total = 0
+    for arg in args:
+        label, colon, data = arg.partition(':')
+        if not colon:
+            raise ValueError(f"'{arg}' needs a label, like 'group1:1,2,3'.")
+        values = parse_values(data, sep=sep, max_values=max_values - total)
+        total += values.size
+        labels.append(label)
+        groups.append(values)
+    return labels, groups
+
+MAX_GRID_POINTS = int(os.getenv("MEKAKO_MAX_GRID_POINTS", "100000"))
+
+def parse_grid(spec, max_points=MAX_GRID_POINTS):
+    """Parse a grid spec into a float64 array.
+
+    Accepts ``start:stop:step`` (stop included when it lands on the grid),
+    ``start:stop`` with a step of 1, or a plain comma list. A leading
+    ``x=`` or ``p=`` label is ignored.
+    """
+    _, equals, rest = spec.partition('=')
+    if equals:
+        spec = rest
+    if ':' not in spec:
+        return parse_values(spec, max_values=max_points)
+
+    parts = spec.split(':')
+    if len(parts) not in (2, 3):
+        raise ValueError(f"'{spec}' isn't a range. Use start:stop:step.")
+    start, stop, step = parse_values(','.join(parts + ['1'] * (3 - len(parts))))
+    if step <= 0 or stop < start:
+        raise ValueError("A range needs start <= stop and a positive step.")
+    count = int(np.floor((stop - start) / step + 1e-9)) + 1
+    if count > max_points:
+        raise ValueError(f"That range has {count} points. I only evaluate up to {max_points}.")
+    return start + step * np.arange(count)
@@ -0,0 +1,102 @@
+# utils/plot_cache.py
+import hashlib
+import os
+from collections import OrderedDict
+from .executor import run_blocking
+from .plotting import STYLE_VERSION, PLOT_FORMAT, PLOT_DPI, PLOT_MAX_BYTES, EncodedPlot
+from .render_service import render
+
+class PlotCache:
+    """Content-addressed store of encoded plots.
+
+    Entries live in an in-memory LRU bounded by ``max_bytes`` and, when
+    ``directory`` is set, in a second on-disk tier that survives restarts.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(kind, params, x_range, title):
+        params = tuple(float(p) for p in params)
+        x_range = tuple(float(x) for x in x_range)
+        raw = repr((kind, params, x_range, title, STYLE_VERSION, PLOT_FORMAT, PLOT_DPI, PLOT_MAX_BYTES))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @property
+    def size(self):
+        return self._size
+
+    def get(self, key):
+        data = self._entries.get(key)
+        if data is not None:
+            self._entries.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._size -= len(self._entries.pop(key))
+        self._entries[key] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.plot")
+
+    def read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write_disk(self, key, data):
+        if not self.directory:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+_cache = None
+
+def get_plot_cache():
+    global _cache
+    if _cache is None:
+        _cache = PlotCache(max_bytes=int(os.getenv("MEKAKO_PLOT_CACHE_BYTES", str(32 * 1024 * 1024))),
+                           directory=os.getenv("MEKAKO_PLOT_CACHE_DIR") or None)
+    return _cache
+
+async def cached_distribution_plot(dist_func, params, x_range, title):
+    """Return an EncodedPlot for ``plot_distribution``, rendering only on a cache miss."""
+    cache = get_plot_cache()
+    key = cache.make_key(dist_func.__name__, params, x_range, title)
+    data = cache.get(key)
+    if data is None and cache.directory:
+        data = await run_blocking(cache.read_disk, key)
+        if data is not None:
+            cache.put(key, data)
+    if data is not None:
+        cache.hits += 1
+        return EncodedPlot(data)
+
+    cache.misses += 1
+    buf = await render('distribution', dist_func, params, x_range, title)
+    data = buf.getvalue()
+    cache.put(key, data)
+    if cache.directory:
+        await run_blocking(cache.write_disk, key, data)
+    return EncodedPlot(data)
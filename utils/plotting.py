@@ -1,69 +1,391 @@
 # utils/plotting.py
-import matplotlib.pyplot as plt
-import seaborn as sns
 import io
+import os
 import numpy as np
-from matplotlib.colors import LinearSegmentedColormap
-
-def setup_3b1b_style():
-    plt.style.use('dark_background')
-    plt.rcParams['figure.facecolor'] = '#0E1117'
-    plt.rcParams['axes.facecolor'] = '#0E1117'
-    plt.rcParams['text.color'] = 'white'
-    plt.rcParams['axes.labelcolor'] = 'white'
-    plt.rcParams['xtick.color'] = 'white'
-    plt.rcParams['ytick.color'] = 'white'
-    plt.rcParams['font.family'] = 'sans-serif'
-    plt.rcParams['font.sans-serif'] = ['Arial', 'Helvetica', 'DejaVu Sans']
+from functools import partial
+from .lazy import lazy_import
+from .sketches import quantiles
+from .downsampling import MAX_SCATTER_POINTS, binned_kde, histogram, lttb
+
+# matplotlib, seaborn and scipy.stats are only loaded when something is
+# actually drawn, so importing this module (e.g. for STYLE_VERSION) is cheap.
+sns = lazy_import('seaborn')
+stats = lazy_import('scipy.stats')
+backend_agg = lazy_import('matplotlib.backends.backend_agg')
+mpl_colors = lazy_import('matplotlib.colors')
+mpl_figure = lazy_import('matplotlib.figure')
+font_manager = lazy_import('matplotlib.font_manager')
+PIL_Image = lazy_import('PIL.Image')
+
+# Bump whenever a change alters how an existing plot looks, so cached renders
+# from an older style are not served.
+STYLE_VERSION = 5
+
+# How finished figures are encoded for upload. ``auto`` uses a 256-colour
+# palette PNG, which for these flat-coloured plots is both the smallest and
+# the quickest encoding; only if that loses too much detail (below
+# MIN_PSNR) does it fall back to the smaller of a lossy WebP and a
+# full-colour PNG. ``png`` and ``webp`` restrict the choice to that format,
+# and ``svg`` draws line plots as vectors.
+PLOT_FORMATS = ('auto', 'png', 'webp', 'svg')
+PLOT_FORMAT = os.getenv("MEKAKO_PLOT_FORMAT", "auto")
+# Raster resolutions; a plot that is over PLOT_MAX_BYTES is re-encoded at
+# the next tier down.
+DPI_TIERS = {'high': 150, 'standard': 100, 'compact': 72}
+PLOT_DPI = os.getenv("MEKAKO_PLOT_DPI", "standard")
+PLOT_MAX_BYTES = int(os.getenv("MEKAKO_PLOT_MAX_BYTES", str(1024 * 1024)))
+# Peak signal-to-noise ratio (dB) a lossy encoding must reach to be used.
+MIN_PSNR = 40.0
+WEBP_QUALITY = 90
+
+class PlotStyle:
+    """Colours and fonts applied to each figure individually.
+
+    Nothing here touches ``matplotlib.rcParams``, so figures built with
+    different styles (or on different threads) never interfere.
+    """
+
+    def __init__(self, background='#0E1117', foreground='white',
+                 font_family=('Arial', 'Helvetica', 'DejaVu Sans'),
+                 figsize=(10, 6), title_size=16, title_pad=20):
+        self.background = background
+        self.foreground = foreground
+        self._requested_fonts = font_family
+        self._font_family = None
+        self.figsize = figsize
+        self.title_size = title_size
+        self.title_pad = title_pad
+
+    @property
+    def font_family(self):
+        # Resolved on first use; scanning the font list needs matplotlib.
+        if self._font_family is None:
+            installed = {font.name for font in font_manager.fontManager.ttflist}
+            self._font_family = [name for name in self._requested_fonts if name in installed] or ['sans-serif']
+        return self._font_family
+
+    def new_figure(self):
+        """Create a figure with its own Agg canvas and a single styled axes."""
+        fig = mpl_figure.Figure(figsize=self.figsize, facecolor=self.background)
+        backend_agg.FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        self.apply(ax)
+        return fig, ax
+
+    def apply(self, ax):
+        ax.set_facecolor(self.background)
+        ax.tick_params(colors=self.foreground)
+        for spine in ax.spines.values():
+            spine.set_edgecolor(self.foreground)
+        for text in (ax.title, ax.xaxis.label, ax.yaxis.label):
+            text.set_color(self.foreground)
+            text.set_fontfamily(self.font_family)
+
+    def set_title(self, ax, title):
+        ax.set_title(title, fontsize=self.title_size, pad=self.title_pad,
+                     color=self.foreground, fontfamily=self.font_family)
+
+    def legend(self, ax):
+        legend = ax.legend(facecolor=self.background, edgecolor=self.foreground)
+        for text in legend.get_texts():
+            text.set_color(self.foreground)
+            text.set_fontfamily(self.font_family)
+        return legend
+
+    def box_props(self):
+        line = {'color': self.foreground}
+        return {
+            'boxprops': {'edgecolor': self.foreground},
+            'whiskerprops': line,
+            'capprops': line,
+            'medianprops': line,
+            'flierprops': {'markeredgecolor': self.foreground},
+        }
+
+STYLE_3B1B = PlotStyle()
 
 def get_3b1b_cmap():
     colors = ['#FF7B54', '#FFB26B', '#FFD56F', '#939B62']
-    return LinearSegmentedColormap.from_list("3b1b", colors)
-
-def plot_3b1b_histogram(data, title):
-    setup_3b1b_style()
-    fig, ax = plt.subplots(figsize=(10, 6))
-    sns.histplot(data, kde=True, color='#FF7B54', ax=ax)
-    ax.set_title(title, fontsize=16, pad=20)
-    ax.set_facecolor('#0E1117')
+    return mpl_colors.LinearSegmentedColormap.from_list("3b1b", colors)
+
+def plot_line(ax, x, y, **kwargs):
+    """``ax.plot`` with the line first reduced by LTTB if it has more points than can show."""
+    x, y = lttb(x, y)
+    return ax.plot(x, y, **kwargs)
+
+def plot_points(ax, x, y, style=STYLE_3B1B):
+    """Scatter ``x`` against ``y``, or draw their density as hexagons when there are too many.
+
+    A hexbin costs the same to draw for a thousand points or a billion, and
+    shows where the mass is, which a million overlapping markers can't.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if x.size <= MAX_SCATTER_POINTS:
+        ax.scatter(x, y, color='#FFB26B', alpha=0.7)
+        return
+    cells = ax.hexbin(x, y, gridsize=(60, 30), bins='log', mincnt=1, cmap=get_3b1b_cmap(), linewidths=0)
+    colorbar = ax.figure.colorbar(cells, ax=ax)
+    colorbar.set_label('Points', color=style.foreground)
+    colorbar.ax.tick_params(colors=style.foreground)
+    colorbar.outline.set_edgecolor(style.foreground)
+
+def plot_3b1b_histogram(data, title, style=STYLE_3B1B):
+    """Histogram with a KDE curve, both computed from binned data.
+
+    Binning is one pass over the values and the KDE is an FFT over a fixed
+    grid, so drawing takes about as long for a million values as for a
+    hundred.
+    """
+    fig, ax = style.new_figure()
+    values = np.asarray(data, dtype=np.float64)
+    edges, counts = histogram(values)
+    sns.histplot({'value': edges[:-1], 'count': counts}, x='value', weights='count', bins=edges.tolist(),
+                 color='#FF7B54', ax=ax)
+    kde = binned_kde(values)
+    if kde is not None:
+        grid, density = kde
+        # Scale to counts per bin, like seaborn's own KDE line.
+        plot_line(ax, grid, density * values.size * (edges[1] - edges[0]), color='#FF7B54')
+    ax.set_ylabel('Count')
+    style.apply(ax)
+    style.set_title(ax, title)
     return fig
 
-def plot_3b1b_scatter(x, y, title):
-    setup_3b1b_style()
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.scatter(x, y, color='#FFB26B', alpha=0.7)
-    ax.set_title(title, fontsize=16, pad=20)
-    ax.set_facecolor('#0E1117')
+def plot_3b1b_scatter(x, y, title, xlabel=None, ylabel=None, style=STYLE_3B1B):
+    fig, ax = style.new_figure()
+    plot_points(ax, x, y, style)
+    style.set_title(ax, title)
+    if xlabel:
+        ax.set_xlabel(xlabel)
+    if ylabel:
+        ax.set_ylabel(ylabel)
     return fig
 
-def plot_3b1b_boxplot(data, labels, title):
-    setup_3b1b_style()
-    fig, ax = plt.subplots(figsize=(10, 6))
-    bp = ax.boxplot(data, patch_artist=True)
+def box_stats(values, label, exact=None, max_fliers=1000):
+    """Box-and-whisker statistics for ``Axes.bxp``.
+
+    Quartiles come from ``sketches.quantiles``, so large groups are
+    summarised with a quantile sketch instead of a full sort. At most
+    ``max_fliers`` outliers are drawn, evenly thinned.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    (q1, med, q3), _ = quantiles(values, [0.25, 0.5, 0.75], exact)
+    iqr = q3 - q1
+    low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    inside = values[(values >= low) & (values <= high)]
+    fliers = values[(values < low) | (values > high)]
+    if fliers.size > max_fliers:
+        fliers = fliers[::int(np.ceil(fliers.size / max_fliers))]
+    return {
+        'label': label,
+        'med': med,
+        'q1': q1,
+        'q3': q3,
+        'whislo': min(inside.min(), q1) if inside.size else q1,
+        'whishi': max(inside.max(), q3) if inside.size else q3,
+        'fliers': fliers,
+    }
+
+def plot_3b1b_boxplot(data, labels, title, exact=None, style=STYLE_3B1B):
+    fig, ax = style.new_figure()
+    stats_per_group = [box_stats(values, label, exact) for values, label in zip(data, labels)]
+    bp = ax.bxp(stats_per_group, patch_artist=True, **style.box_props())
     colors = get_3b1b_cmap()(np.linspace(0, 1, len(data)))
     for patch, color in zip(bp['boxes'], colors):
         patch.set_facecolor(color)
-    ax.set_xticklabels(labels)
-    ax.set_title(title, fontsize=16, pad=20)
-    ax.set_facecolor('#0E1117')
+    style.set_title(ax, title)
     return fig
 
-def plot_distribution(dist_func, params, x_range, title):
-    setup_3b1b_style()
-    fig, ax = plt.subplots(figsize=(10, 6))
+def plot_distribution(dist_func, params, x_range, title, style=STYLE_3B1B):
+    fig, ax = style.new_figure()
     x = np.linspace(*x_range, 1000)
     y = dist_func(x, *params)
-    ax.plot(x, y, color='#FFD56F')
+    plot_line(ax, x, y, color='#FFD56F')
     ax.fill_between(x, y, color='#FF7B54', alpha=0.3)
-    ax.set_title(title, fontsize=16, pad=20)
+    style.set_title(ax, title)
     ax.set_xlabel('x')
     ax.set_ylabel('Probability Density')
     return fig
 
-def save_plot_as_bytes(fig):
+def plot_test_statistic(pdf_values, statistic, title, xlabel, label, style=STYLE_3B1B):
+    fig, ax = style.new_figure()
+    x = np.linspace(-4, 4, 1000)
+    y = pdf_values(x)
+    plot_line(ax, x, y, color='#FFD56F')
+    ax.fill_between(x[x <= -abs(statistic)], y[x <= -abs(statistic)], color='#FF7B54', alpha=0.3)
+    ax.fill_between(x[x >= abs(statistic)], y[x >= abs(statistic)], color='#FF7B54', alpha=0.3)
+    style.set_title(ax, title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('Probability Density')
+    ax.axvline(statistic, color='#939B62', linestyle='--', label=label)
+    style.legend(ax)
+    return fig
+
+def plot_t_test(t_statistic, df):
+    return plot_test_statistic(partial(stats.t.pdf, df=df), t_statistic,
+                               'T-Test Visualization (as if you understand it)', 'T-score', 'Observed T')
+
+def plot_z_test(z_statistic):
+    return plot_test_statistic(stats.norm.pdf, z_statistic,
+                               'Z-Test Visualization (try not to get overwhelmed)', 'Z-score', 'Observed Z')
+
+def plot_chi_square(observed, expected, style=STYLE_3B1B):
+    fig, ax = style.new_figure()
+    x = np.arange(len(observed))
+    width = 0.35
+    ax.bar(x - width/2, observed, width, label='Observed', color='#FF7B54')
+    ax.bar(x + width/2, expected, width, label='Expected', color='#FFD56F')
+    ax.set_xlabel('Categories')
+    ax.set_ylabel('Frequencies')
+    style.set_title(ax, 'Chi-square Test: Observed vs Expected (pay attention!)')
+    style.legend(ax)
+    return fig
+
+def plot_regression(x, y, slope, intercept, style=STYLE_3B1B):
+    fig, ax = style.new_figure()
+    x = np.asarray(x, dtype=np.float64)
+    plot_points(ax, x, y, style)
+    # A straight line only needs its two ends.
+    ends = np.array([x.min(), x.max()])
+    ax.plot(ends, intercept + slope * ends, color='#FF7B54', label='Regression line')
+    ax.set_xlabel('X')
+    ax.set_ylabel('Y')
+    style.set_title(ax, 'Linear Regression (try to follow the line)')
+    style.legend(ax)
+    return fig
+
+# Plots that are mostly lines and fills, and so stay small as SVG.
+VECTOR_PLOTS = {plot_distribution, plot_t_test, plot_z_test}
+
+class EncodedPlot(io.BytesIO):
+    """An encoded plot, which knows its own format and file extension."""
+
+    def __init__(self, data, format=None):
+        super().__init__(data)
+        self.format = format or sniff_format(data)
+
+    def filename(self, name):
+        return f"{name}.{self.format}"
+
+def sniff_format(data):
+    """Tell PNG, WebP and SVG apart from their first bytes."""
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    if data.lstrip()[:5] in (b'<?xml', b'<svg '):
+        return 'svg'
+    raise ValueError("Unknown image format.")
+
+def rasterize(fig, dpi):
+    """Draw ``fig`` at ``dpi`` and return its pixels as an RGB array."""
+    fig.set_dpi(dpi)
+    fig.canvas.draw()
+    return np.asarray(fig.canvas.buffer_rgba())[..., :3].copy()
+
+def psnr(reference, pixels):
+    diff = np.subtract(reference, pixels, dtype=np.int32).ravel()
+    error = float(np.dot(diff, diff)) / diff.size
+    return np.inf if error == 0 else 10 * np.log10(255.0 ** 2 / error)
+
+def encode_png(pixels, palette=True, optimize=False):
+    """PNG bytes and the pixels they decode to.
+
+    With ``palette`` the colours are first reduced to 256. ``optimize``
+    saves another 10-20% at two to three times the encoding time.
+    """
+    image = PIL_Image.fromarray(pixels)
+    if palette:
+        image = image.quantize(colors=256, method=PIL_Image.Quantize.FASTOCTREE)
     buf = io.BytesIO()
-    fig.savefig(buf, format='png')
-    buf.seek(0)
-    return buf
+    image.save(buf, format='PNG', optimize=optimize)
+    return buf.getvalue(), np.asarray(image.convert('RGB')) if palette else pixels
+
+def encode_webp(pixels, quality=WEBP_QUALITY):
+    buf = io.BytesIO()
+    PIL_Image.fromarray(pixels).save(buf, format='WEBP', quality=quality, method=2)
+    data = buf.getvalue()
+    return data, np.asarray(PIL_Image.open(io.BytesIO(data)).convert('RGB'))
+
+def encode_svg(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='svg')
+    return buf.getvalue()
+
+def _encode_raster(pixels, fmt):
+    """Encode ``pixels`` as ``(format, data)`` in the first tier that keeps enough detail.
+
+    Each tier's candidates are decoded again and compared with the
+    original, and the smallest acceptable one wins; the last tier is
+    lossless, so it always qualifies.
+    """
+    if fmt == 'webp':
+        tiers = [[('webp', encode_webp)], [('webp', partial(encode_webp, quality=100))]]
+    elif fmt == 'png':
+        tiers = [[('png', encode_png)], [('png', partial(encode_png, palette=False))]]
+    else:
+        tiers = [[('png', encode_png)], [('webp', encode_webp), ('png', partial(encode_png, palette=False))]]
+    for i, tier in enumerate(tiers):
+        acceptable = []
+        for name, encode in tier:
+            data, decoded = encode(pixels)
+            if i == len(tiers) - 1 or psnr(pixels, decoded) >= MIN_PSNR:
+                acceptable.append((name, data))
+        if acceptable:
+            return min(acceptable, key=lambda item: len(item[1]))
+
+def encode_figure(fig, fmt=None, dpi=None, max_bytes=None, vector=False):
+    """Encode ``fig`` for upload and return an EncodedPlot.
+
+    ``fmt``, ``dpi`` (a DPI_TIERS name) and ``max_bytes`` default to
+    MEKAKO_PLOT_FORMAT, MEKAKO_PLOT_DPI and MEKAKO_PLOT_MAX_BYTES. SVG is
+    only used when ``vector`` says the figure suits it; otherwise ``svg``
+    behaves like ``auto``. When the result is over ``max_bytes`` the
+    figure is re-encoded at each lower DPI tier, and the smallest result
+    is returned if none fit.
+    """
+    fmt = fmt or PLOT_FORMAT
+    dpi = dpi or PLOT_DPI
+    max_bytes = max_bytes or PLOT_MAX_BYTES
+    if fmt not in PLOT_FORMATS:
+        raise ValueError(f"Unknown plot format '{fmt}'. Use one of: {', '.join(PLOT_FORMATS)}.")
+    if dpi not in DPI_TIERS:
+        raise ValueError(f"Unknown DPI tier '{dpi}'. Use one of: {', '.join(DPI_TIERS)}.")
+    if fmt == 'svg':
+        if vector:
+            data = encode_svg(fig)
+            if len(data) <= max_bytes:
+                return EncodedPlot(data, 'svg')
+        fmt = 'auto'
+
+    tiers = list(DPI_TIERS)
+    best = None
+    for tier in tiers[tiers.index(dpi):]:
+        name, data = _encode_raster(rasterize(fig, DPI_TIERS[tier]), fmt)
+        if best is None or len(data) < len(best[1]):
+            best = (name, data)
+        if len(data) <= max_bytes:
+            break
+    return EncodedPlot(best[1], best[0])
+
+def save_plot_as_bytes(fig, vector=False):
+    return encode_figure(fig, vector=vector)
+
+def close_figure(fig):
+    """Release a figure's artists right away instead of waiting for the GC."""
+    fig.clear()
+
+def render_plot(plot_func, *args, **kwargs):
+    """Build a figure with ``plot_func``, encode it and free it.
+
+    This is the unit of work commands hand to the compute executor, so the
+    figure never outlives the worker that drew it.
+    """
+    fig = plot_func(*args, **kwargs)
+    try:
+        return save_plot_as_bytes(fig, vector=plot_func in VECTOR_PLOTS)
+    finally:
+        close_figure(fig)
 
-# Add more plotting functions as needed
\ No newline at end of file
+# Add more plotting functions as needed
@@ -0,0 +1,34 @@
+# utils/progress.py
+import time
+
+
+class ProgressReporter:
+    """Posts and then edits a single progress message for a long-running command.
+
+    Nothing is sent for jobs that finish within ``interval`` seconds, and
+    the message is edited at most once per ``interval`` afterwards, which
+    keeps well clear of Discord's rate limits.
+    """
+
+    def __init__(self, ctx, label, interval=2.0):
+        self.ctx = ctx
+        self.label = label
+        self.interval = interval
+        self.message = None
+        self._started = time.monotonic()
+        self._last = self._started
+
+    async def __call__(self, done, total):
+        now = time.monotonic()
+        if now - self._last < self.interval or done >= total:
+            return
+        self._last = now
+        text = f"{self.label}: {done:,}/{total:,} ({done / total:.0%})"
+        if self.message is None:
+            self.message = await self.ctx.send(text)
+        else:
+            await self.message.edit(content=text)
+
+    async def finish(self):
+        if self.message is not None:
+            await self.message.edit(content=f"{self.label}: done.")
@@ -0,0 +1,91 @@
+# utils/render_service.py
+import asyncio
+import os
+import numpy as np
+from .executor import ComputeExecutor
+from .metrics import span, watch_executor
+from . import plotting
+
+# Plot kinds a render worker knows how to draw. Specs refer to them by name so
+# only the name and the data cross the process boundary.
+PLOT_KINDS = {
+    'histogram': plotting.plot_3b1b_histogram,
+    'scatter': plotting.plot_3b1b_scatter,
+    'boxplot': plotting.plot_3b1b_boxplot,
+    'distribution': plotting.plot_distribution,
+    't_test': plotting.plot_t_test,
+    'z_test': plotting.plot_z_test,
+    'chi_square': plotting.plot_chi_square,
+    'regression': plotting.plot_regression,
+}
+
+def warm_worker():
+    """Pay matplotlib/seaborn import and font-cache costs once per worker."""
+    plotting.render_plot(plotting.plot_3b1b_scatter, [0.0, 1.0], [0.0, 1.0], "warm-up")
+
+def render_spec(kind, args, kwargs):
+    """Draw plot ``kind`` and return the encoded image as bytes."""
+    if kind not in PLOT_KINDS:
+        raise ValueError(f"Unknown plot kind '{kind}'.")
+    return plotting.render_plot(PLOT_KINDS[kind], *args, **kwargs).getvalue()
+
+def compact(value):
+    """Turn numeric lists into float64 arrays so specs pickle compactly."""
+    if isinstance(value, list) and value and all(isinstance(v, (int, float)) for v in value):
+        return np.asarray(value, dtype=np.float64)
+    if isinstance(value, list) and value and all(isinstance(v, (list, tuple, np.ndarray)) for v in value):
+        return [compact(v) for v in value]
+    return value
+
+class RenderService:
+    """A pool of long-lived rendering workers fed with compact plot specs.
+
+    Each worker process imports matplotlib and seaborn and draws a throwaway
+    figure at startup, so the first real request does not pay for font
+    discovery.
+    """
+
+    def __init__(self, workers=None, max_pending=16, timeout=30.0, backend='process'):
+        self.executor = ComputeExecutor(backend=backend, max_workers=workers, max_pending=max_pending,
+                                        timeout=timeout, initializer=warm_worker)
+
+    async def render(self, kind, *args, **kwargs):
+        spec_args = tuple(compact(arg) for arg in args)
+        with span('render'):
+            png = await self.executor.submit(render_spec, kind, spec_args, kwargs)
+        return plotting.EncodedPlot(png)
+
+    async def prewarm(self):
+        """Start the workers now (each warms itself up) instead of on first render.
+
+        No more jobs are submitted than the queue admits, or admission
+        control would turn the prewarm away with ExecutorBusyError.
+        """
+        jobs = min(self.executor.max_workers, self.executor.max_pending)
+        await asyncio.gather(*(self.executor.submit(os.getpid) for _ in range(jobs)))
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+_service = None
+
+def render_service_from_env():
+    """Build a RenderService configured from MEKAKO_RENDER_* environment variables."""
+    workers = os.getenv("MEKAKO_RENDER_WORKERS")
+    return RenderService(
+        workers=int(workers) if workers else None,
+        max_pending=int(os.getenv("MEKAKO_RENDER_QUEUE", "16")),
+        timeout=float(os.getenv("MEKAKO_RENDER_TIMEOUT", "30")),
+        backend=os.getenv("MEKAKO_RENDER_BACKEND", "process"),
+    )
+
+def get_render_service():
+    global _service
+    if _service is None:
+        _service = render_service_from_env()
+        watch_executor('render', _service.executor)
+    return _service
+
+async def render(kind, *args, **kwargs):
+    """Render plot ``kind`` on the shared render service and return a PNG buffer."""
+    return await get_render_service().render(kind, *args, **kwargs)
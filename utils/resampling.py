@@ -0,0 +1,197 @@
+# utils/resampling.py
+import asyncio
+import os
+from collections import deque
+import numpy as np
+from .executor import ComputeExecutor
+from .lazy import lazy_import
+from .metrics import span, watch_executor
+from .sketches import QuantileSketch
+from .simulation import new_seed
+
+stats = lazy_import('scipy.stats')
+
+MAX_RESAMPLES = int(os.getenv("MEKAKO_MAX_RESAMPLES", "1000000"))
+DEFAULT_RESAMPLES = 10000
+
+# Resampled values held by one chunk. Each chunk is a (rows, n) array, so
+# memory per worker is bounded by this, not by the number of resamples.
+CHUNK_CELLS = 1 << 21
+
+# Row-wise statistics for the bootstrap; each maps a (rows, n) array to rows values.
+BOOTSTRAP_STATISTICS = {
+    'mean': lambda samples: samples.mean(axis=1),
+    'median': lambda samples: np.median(samples, axis=1),
+    'std': lambda samples: samples.std(axis=1, ddof=1),
+}
+
+
+def _pooled_t(x, y):
+    n1, n2 = x.shape[1], y.shape[1]
+    pooled = ((n1 - 1) * x.var(axis=1, ddof=1) + (n2 - 1) * y.var(axis=1, ddof=1)) / (n1 + n2 - 2)
+    return (x.mean(axis=1) - y.mean(axis=1)) / np.sqrt(pooled * (1 / n1 + 1 / n2))
+
+
+def _prepare_permutation(test, x, y):
+    """Reduce a test to ``(values, split, statistic)`` for label shuffling.
+
+    Shuffling ``values`` row-wise and applying ``statistic(rows, split)``
+    gives the permutation distribution, centred on 0 so a two-sided test
+    compares absolute values.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if test == 'ttest2':
+        if np.ptp(x) == 0 and np.ptp(y) == 0:
+            raise ValueError("Both samples are constant, so t is undefined and there's nothing to shuffle")
+        return np.concatenate([x, y]), x.size, lambda rows, split: _pooled_t(rows[:, :split], rows[:, split:])
+    if test == 'mannwhitney':
+        # U only depends on ranks, so rank once and shuffle the ranks.
+        n1, n2 = x.size, y.size
+        ranks = stats.rankdata(np.concatenate([x, y]))
+        return ranks, n1, lambda rows, split: rows[:, :split].sum(axis=1) - n1 * (n1 + 1) / 2 - n1 * n2 / 2
+    if test == 'pearson':
+        # Shuffling the pairing keeps each variable's mean and spread, so
+        # standardise once and r becomes a row-wise mean of products.
+        if x.size != y.size:
+            raise ValueError("X and Y must have the same number of elements.")
+        if np.ptp(x) == 0 or np.ptp(y) == 0:
+            raise ValueError("One of the variables is constant, so the correlation is undefined")
+        zx = (x - x.mean()) / x.std()
+        zy = (y - y.mean()) / y.std()
+        return zy, 0, lambda rows, split: rows @ zx / zx.size
+    raise ValueError(f"I can't run a permutation test for '{test}'. Use ttest2, mannwhitney or pearson.")
+
+
+def _chunk_rows(n):
+    return max(1, CHUNK_CELLS // max(n, 1))
+
+
+def bootstrap_chunk(values, statistic, size, seed_sequence):
+    """Statistic of ``size`` bootstrap resamples of ``values``."""
+    rng = np.random.default_rng(seed_sequence)
+    indices = rng.integers(0, values.size, size=(size, values.size))
+    return BOOTSTRAP_STATISTICS[statistic](values[indices])
+
+
+def permutation_chunk(test, x, y, observed, size, seed_sequence):
+    """How many of ``size`` label permutations are at least as extreme as ``observed``."""
+    values, split, statistic = _prepare_permutation(test, x, y)
+    rng = np.random.default_rng(seed_sequence)
+    shuffled = rng.permuted(np.broadcast_to(values, (size, values.size)), axis=1)
+    return int(np.count_nonzero(np.abs(statistic(shuffled, split)) >= abs(observed) * (1 - 1e-12)))
+
+
+def observed_statistic(test, x, y):
+    values, split, statistic = _prepare_permutation(test, x, y)
+    return float(statistic(values[None, :], split)[0])
+
+
+_executor = None
+
+
+def resampling_executor_from_env():
+    """Build the executor chunks run on, from MEKAKO_RESAMPLING_* environment variables."""
+    workers = int(os.getenv("MEKAKO_RESAMPLING_WORKERS") or os.cpu_count() or 1)
+    return ComputeExecutor(
+        backend=os.getenv("MEKAKO_RESAMPLING_BACKEND", "process"),
+        max_workers=workers,
+        max_pending=2 * workers,
+        timeout=float(os.getenv("MEKAKO_RESAMPLING_TIMEOUT", "30")),
+    )
+
+
+def get_resampling_executor():
+    global _executor
+    if _executor is None:
+        _executor = resampling_executor_from_env()
+        watch_executor('resampling', _executor)
+    return _executor
+
+
+async def run_chunks(func, args, total, chunk_rows, seed, on_result, progress=None):
+    """Run ``func(*args, size, seed_sequence)`` over ``total`` resamples.
+
+    Chunks get independent streams spawned from one SeedSequence and are
+    spread over the resampling executor. At most two chunks per worker are
+    in flight, and results are handed to ``on_result`` in chunk order, so a
+    given seed always gives the same answer. ``progress(done, total)`` is
+    awaited after every chunk.
+    """
+    if not 1 <= total <= MAX_RESAMPLES:
+        raise ValueError(f"Number of resamples must be between 1 and {MAX_RESAMPLES:,}.")
+    executor = get_resampling_executor()
+    root = np.random.SeedSequence(seed)
+    in_flight = deque()
+    done = 0
+
+    async def collect():
+        nonlocal done
+        size, task = in_flight.popleft()
+        on_result(await task)
+        done += size
+        if progress is not None:
+            await progress(done, total)
+
+    with span('compute'):
+        try:
+            for start in range(0, total, chunk_rows):
+                size = min(chunk_rows, total - start)
+                child = root.spawn(1)[0]
+                in_flight.append((size, asyncio.ensure_future(executor.submit(func, *args, size, child))))
+                if len(in_flight) >= executor.max_pending:
+                    await collect()
+            while in_flight:
+                await collect()
+        finally:
+            for _, task in in_flight:
+                task.cancel()
+
+
+async def bootstrap_ci(values, statistic='mean', confidence=0.95, resamples=DEFAULT_RESAMPLES,
+                       seed=None, progress=None):
+    """Percentile bootstrap interval for ``statistic``.
+
+    Resampled statistics go straight into a QuantileSketch, so memory does
+    not grow with ``resamples``. Returns ``(estimate, lower, upper, seed)``.
+    """
+    if statistic not in BOOTSTRAP_STATISTICS:
+        raise ValueError(f"I can bootstrap {', '.join(BOOTSTRAP_STATISTICS)}, not '{statistic}'.")
+    if not 0 < confidence < 1:
+        raise ValueError("Confidence level must be between 0 and 1.")
+    values = np.asarray(values, dtype=np.float64)
+    if values.size < 2:
+        raise ValueError("Bootstrapping needs at least two values.")
+    seed = new_seed() if seed is None else seed
+    sketch = QuantileSketch.for_error(0.0005, seed=seed)
+    await run_chunks(bootstrap_chunk, (values, statistic), resamples, _chunk_rows(values.size),
+                     seed, sketch.update, progress)
+    estimate = float(BOOTSTRAP_STATISTICS[statistic](values[None, :])[0])
+    lower, upper = sketch.quantile([(1 - confidence) / 2, (1 + confidence) / 2])
+    return estimate, float(lower), float(upper), seed
+
+
+async def permutation_test(test, x, y, resamples=DEFAULT_RESAMPLES, seed=None, progress=None):
+    """Two-sided permutation p-value for ``test`` (ttest2, mannwhitney or pearson).
+
+    Returns ``(statistic, p_value, seed)`` with the statistic as scipy
+    reports it. The p-value counts the observed labelling, so it is never
+    exactly 0.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if x.size < 2 or y.size < 2:
+        raise ValueError("Each sample needs at least two values.")
+    observed = observed_statistic(test, x, y)
+    seed = new_seed() if seed is None else seed
+    extreme = 0
+
+    def add(count):
+        nonlocal extreme
+        extreme += count
+
+    await run_chunks(permutation_chunk, (test, x, y, observed), resamples, _chunk_rows(x.size + y.size),
+                     seed, add, progress)
+    if test == 'mannwhitney':
+        observed += x.size * y.size / 2
+    return observed, (extreme + 1) / (resamples + 1), seed
@@ -0,0 +1,162 @@
+# utils/sessions.py
+import os
+import re
+import time
+from collections import OrderedDict
+
+# ``@name`` refers to a loaded dataset's only column, ``@name:column`` to one of several.
+SESSION_REF = re.compile(r'^@([A-Za-z_][A-Za-z0-9_]*)(?::(.+))?$')
+DATASET_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]{0,31}$')
+
+# Rough bytes charged for a derived value that isn't an array (moments and the like).
+SMALL_VALUE_BYTES = 256
+
+def parse_session_ref(text):
+    """Split ``@name[:column]`` into ``(name, column or None)``, or return None."""
+    match = SESSION_REF.match(text.strip())
+    if not match:
+        return None
+    return match.group(1), match.group(2)
+
+def _size(value):
+    return getattr(value, 'nbytes', SMALL_VALUE_BYTES)
+
+class Dataset:
+    """A user's loaded columns plus whatever has been derived from them.
+
+    Columns are read-only float64 arrays, so commands can share them
+    without copying. ``derived`` caches per-column results such as the
+    sorted copy or RunningMoments, keyed by ``(kind, column, ...)``.
+    """
+
+    def __init__(self, name, columns, ttl):
+        self.name = name
+        self.columns = columns
+        for values in columns.values():
+            values.flags.writeable = False
+        self.derived = {}
+        self.ttl = ttl
+        self.touch()
+
+    @property
+    def rows(self):
+        return len(next(iter(self.columns.values())))
+
+    @property
+    def nbytes(self):
+        return (sum(values.nbytes for values in self.columns.values())
+                + sum(_size(value) for value in self.derived.values()))
+
+    @property
+    def expired(self):
+        return time.monotonic() > self.expires
+
+    def touch(self):
+        self.expires = time.monotonic() + self.ttl
+
+    def column(self, column=None):
+        if column is None:
+            if len(self.columns) == 1:
+                return next(iter(self.columns))
+            raise ValueError(f"'@{self.name}' has several columns, so pick one, like "
+                             f"'@{self.name}:{next(iter(self.columns))}'. Columns: {', '.join(self.columns)}")
+        if column not in self.columns:
+            raise ValueError(f"'@{self.name}' has no column '{column}'. Columns: {', '.join(self.columns)}")
+        return column
+
+class SessionStore:
+    """Datasets loaded with ``!load``, keyed by user and name.
+
+    An LRU bounded by ``max_bytes`` across every user, derived caches
+    included, with each dataset also dropped ``ttl`` seconds after it was
+    last used. Everything is touched from the event loop thread only.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, ttl=3600.0, max_per_user=10):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_per_user = max_per_user
+        self._datasets = OrderedDict()
+        self._size = 0
+        self.evictions = 0
+
+    @property
+    def size(self):
+        return self._size
+
+    def __len__(self):
+        return len(self._datasets)
+
+    def _drop(self, key):
+        dataset = self._datasets.pop(key)
+        self._size -= dataset.nbytes
+        return dataset
+
+    def expire(self):
+        for key in [key for key, dataset in self._datasets.items() if dataset.expired]:
+            self._drop(key)
+            self.evictions += 1
+
+    def _shrink(self):
+        while self._size > self.max_bytes and self._datasets:
+            self._drop(next(iter(self._datasets)))
+            self.evictions += 1
+
+    def put(self, user_id, name, columns):
+        if not DATASET_NAME.match(name):
+            raise ValueError(f"'{name}' isn't a usable name. Letters, digits and underscores only, up to 32")
+        self.expire()
+        key = (user_id, name)
+        if key in self._datasets:
+            self._drop(key)
+        elif sum(1 for owner, _ in self._datasets if owner == user_id) >= self.max_per_user:
+            raise ValueError(f"You already have {self.max_per_user} datasets loaded. !unload one first")
+        dataset = Dataset(name, columns, self.ttl)
+        if dataset.nbytes > self.max_bytes:
+            raise ValueError(f"That dataset needs {dataset.nbytes / 2 ** 20:.1f} MiB and I only keep "
+                             f"{self.max_bytes / 2 ** 20:.0f} MiB of everyone's data")
+        self._datasets[key] = dataset
+        self._size += dataset.nbytes
+        self._shrink()
+        return dataset
+
+    def get(self, user_id, name):
+        key = (user_id, name)
+        dataset = self._datasets.get(key)
+        if dataset is not None and dataset.expired:
+            self._drop(key)
+            self.evictions += 1
+            dataset = None
+        if dataset is None:
+            raise ValueError(f"You don't have a dataset called '@{name}'. Load one with !load {name} [data]")
+        self._datasets.move_to_end(key)
+        dataset.touch()
+        return dataset
+
+    def remember(self, dataset, key, value):
+        """Cache a value derived from ``dataset``, charging it to the budget."""
+        if dataset.derived.get(key) is not None:
+            return
+        dataset.derived[key] = value
+        if any(stored is dataset for stored in self._datasets.values()):
+            self._size += _size(value)
+            self._shrink()
+
+    def remove(self, user_id, name):
+        if (user_id, name) not in self._datasets:
+            raise ValueError(f"You don't have a dataset called '@{name}'")
+        self._drop((user_id, name))
+
+    def owned_by(self, user_id):
+        self.expire()
+        return [dataset for (owner, _), dataset in self._datasets.items() if owner == user_id]
+
+_store = None
+
+def get_sessions():
+    global _store
+    if _store is None:
+        _store = SessionStore(max_bytes=int(os.getenv("MEKAKO_SESSION_BYTES", str(256 * 1024 * 1024))),
+                              ttl=float(os.getenv("MEKAKO_SESSION_TTL", "3600")),
+                              max_per_user=int(os.getenv("MEKAKO_SESSION_MAX_PER_USER", "10")))
+    return _store
@@ -0,0 +1,105 @@
+# utils/simulation.py
+import os
+import numpy as np
+
+MAX_SIMULATIONS = int(os.getenv("MEKAKO_MAX_SIMULATIONS", "1000000000"))
+
+# Upper bound on integers drawn at once when individual draws can't be
+# avoided, so memory stays constant however many trials are requested.
+CHUNK_DRAWS = 1 << 20
+
+
+def new_seed():
+    """A fresh 32-bit seed, short enough for users to type back in."""
+    return int(np.random.SeedSequence().generate_state(1)[0])
+
+
+def make_rng(seed=None):
+    """Return ``(generator, seed)``, picking a fresh seed when none is given.
+
+    The seed is always returned so a result can be reproduced later.
+    """
+    if seed is None:
+        seed = new_seed()
+    if seed < 0:
+        raise ValueError("Seeds must be non-negative.")
+    return np.random.default_rng(seed), seed
+
+
+def _check_count(n, what):
+    if n <= 0 or n > MAX_SIMULATIONS:
+        raise ValueError(f"Number of {what} must be between 1 and {MAX_SIMULATIONS:,}.")
+
+
+def flip_coins(n, p=0.5, seed=None):
+    """Number of heads in ``n`` flips, drawn as a single binomial variate.
+
+    Returns ``(heads, seed)``.
+    """
+    _check_count(n, 'flips')
+    rng, seed = make_rng(seed)
+    return int(rng.binomial(n, p)), seed
+
+
+def roll_dice(dice, sides, seed=None):
+    """How often each face comes up in ``dice`` rolls, drawn as one multinomial.
+
+    Returns ``(counts, seed)`` where ``counts[i]`` is the count of face ``i + 1``.
+    """
+    _check_count(dice, 'dice')
+    if sides < 2:
+        raise ValueError("Dice need at least 2 sides.")
+    rng, seed = make_rng(seed)
+    return rng.multinomial(dice, np.full(sides, 1.0 / sides)), seed
+
+
+def dice_sum_counts(dice, sides, trials, seed=None):
+    """Histogram of the total of ``dice`` dice over ``trials`` throws.
+
+    Rolls are drawn in chunks of at most CHUNK_DRAWS integers and folded into
+    a bincount, so memory depends on the number of possible totals, not on
+    the number of rolls. Returns ``(counts, seed)`` where ``counts[i]`` is
+    the count of total ``dice + i``.
+    """
+    _check_count(trials, 'trials')
+    _check_count(dice * trials, 'rolls')
+    if sides < 2:
+        raise ValueError("Dice need at least 2 sides.")
+    if dice > CHUNK_DRAWS:
+        raise ValueError(f"I can throw at most {CHUNK_DRAWS:,} dice at a time.")
+    rng, seed = make_rng(seed)
+    counts = np.zeros(dice * (sides - 1) + 1, dtype=np.int64)
+    rows = max(1, CHUNK_DRAWS // dice)
+    for start in range(0, trials, rows):
+        block = min(rows, trials - start)
+        totals = rng.integers(0, sides, size=(block, dice), dtype=np.int32).sum(axis=1)
+        counts += np.bincount(totals, minlength=counts.size)
+    return counts, seed
+
+
+def coarsen(first, counts, max_bins=20):
+    """Merge consecutive integer outcomes into at most ``max_bins`` ranges.
+
+    ``counts[i]`` is the count of outcome ``first + i``. Returns a list of
+    ``(label, count)`` pairs.
+    """
+    counts = np.asarray(counts)
+    width = int(np.ceil(counts.size / max_bins))
+    bins = []
+    for start in range(0, counts.size, width):
+        low, high = first + start, first + min(start + width, counts.size) - 1
+        label = str(low) if low == high else f"{low}-{high}"
+        bins.append((label, int(counts[start:start + width].sum())))
+    return bins
+
+
+def text_histogram(bins, width=20):
+    """Render ``(label, count)`` pairs as a fixed-width bar chart."""
+    total = sum(count for _, count in bins) or 1
+    peak = max(count for _, count in bins) or 1
+    label_width = max(len(label) for label, _ in bins)
+    lines = []
+    for label, count in bins:
+        bar = '█' * int(round(width * count / peak))
+        lines.append(f"{label:>{label_width}} | {bar:<{width}} {count:,} ({count / total:.2%})")
+    return '\n'.join(lines)
@@ -0,0 +1,164 @@
+# utils/sketches.py
+import math
+import os
+import numpy as np
+
+# Above this many values the commands switch from exact to sketched quantiles.
+EXACT_QUANTILE_LIMIT = int(os.getenv("MEKAKO_EXACT_QUANTILE_LIMIT", "1000000"))
+
+class QuantileSketch:
+    """A mergeable KLL quantile sketch.
+
+    Values are kept in a stack of compactors; when a level fills up it is
+    sorted and every other item is promoted to the next level with twice the
+    weight. Memory is O(k log(n/k)) and rank error is roughly ``1.7 / k``
+    with high probability. Sketches built on separate chunks or workers can
+    be merged.
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def for_error(cls, epsilon, seed=None):
+        """Build a sketch whose normalised rank error is about ``epsilon``."""
+        return cls(k=max(8, math.ceil(1.7 / epsilon)), seed=seed)
+
+    @classmethod
+    def from_values(cls, values, k=200, seed=None):
+        sketch = cls(k=k, seed=seed)
+        sketch.update(values)
+        return sketch
+
+    def _capacity(self, level):
+        depth = len(self._levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self.n += values.size
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold ``other`` into this sketch and return self."""
+        if other.n == 0:
+            return self
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for level, items in enumerate(other._levels):
+            self._levels[level] = np.concatenate([self._levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if items.size > self._capacity(level):
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind so no weight is lost.
+                keep = items[:1] if items.size % 2 else items[:0]
+                paired = items[keep.size:]
+                promoted = paired[self._rng.integers(2)::2]
+                self._levels[level] = keep
+                self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+            level += 1
+
+    @property
+    def size(self):
+        """Number of values actually retained."""
+        return sum(items.size for items in self._levels)
+
+    @property
+    def nbytes(self):
+        return sum(items.nbytes for items in self._levels)
+
+    def _weighted(self):
+        values = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(items.size, 2 ** level, dtype=np.float64)
+                                  for level, items in enumerate(self._levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """Approximate quantile(s) for ``q`` in [0, 1]; accepts a scalar or array."""
+        if self.n == 0:
+            raise ValueError("Can't take quantiles of an empty sketch.")
+        q = np.asarray(q, dtype=np.float64)
+        if np.any((q < 0) | (q > 1)):
+            raise ValueError("Quantiles must be between 0 and 1.")
+        values, cumulative = self._weighted()
+        positions = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        result = values[np.minimum(positions, values.size - 1)]
+        result = np.where(q == 0, self.min, np.where(q == 1, self.max, result))
+        return float(result) if result.ndim == 0 else result
+
+    def rank(self, x):
+        """Approximate fraction of values less than or equal to ``x``."""
+        values, cumulative = self._weighted()
+        positions = np.searchsorted(values, np.asarray(x, dtype=np.float64), side='right')
+        counts = np.where(positions > 0, cumulative[np.maximum(positions - 1, 0)], 0.0)
+        return counts / cumulative[-1]
+
+    def mid_rank(self, x):
+        """Approximate mid-rank of ``x`` as a fraction of n, interpolated between retained values.
+
+        A value equal to a retained one gets the middle of that value's
+        tied block, as ``scipy.stats.rankdata`` would, so ties stay tied.
+        """
+        values, cumulative = self._weighted()
+        distinct, first = np.unique(values, return_index=True)
+        upper = cumulative[np.append(first[1:], values.size) - 1]
+        lower = np.concatenate([[0.0], upper[:-1]])
+        return np.interp(np.asarray(x, dtype=np.float64), distinct, (lower + upper) / 2) / cumulative[-1]
+
+QUANTILE_MODES = {'auto': None, 'exact': True, 'approx': False}
+
+def parse_quantile_mode(mode):
+    """Map a user-facing 'auto'/'exact'/'approx' switch to the ``exact`` argument."""
+    if mode.lower() not in QUANTILE_MODES:
+        raise ValueError(f"'{mode}' isn't a mode I know. Use auto, exact or approx.")
+    return QUANTILE_MODES[mode.lower()]
+
+def sorted_quantiles(ordered, qs):
+    """Quantiles of already sorted values, interpolated the way ``np.quantile`` does by default."""
+    qs = np.asarray(qs, dtype=np.float64)
+    if ordered.size == 0:
+        raise ValueError("Can't take quantiles of nothing.")
+    if np.any((qs < 0) | (qs > 1)):
+        raise ValueError("Quantiles must be between 0 and 1.")
+    position = qs * (ordered.size - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, ordered.size - 1)
+    result = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+    return float(result) if result.ndim == 0 else result
+
+def quantiles(values, qs, exact=None, k=200):
+    """Quantiles of ``values``, exactly or via a sketch.
+
+    ``exact=None`` picks exact computation up to EXACT_QUANTILE_LIMIT values.
+    Returns ``(result, was_exact)``.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if exact is None:
+        exact = values.size <= EXACT_QUANTILE_LIMIT
+    if exact:
+        return np.quantile(values, qs), True
+    return QuantileSketch.from_values(values, k=k).quantile(qs), False
@@ -0,0 +1,89 @@
+# utils/stat_tables.py
+import math
+import os
+import numpy as np
+from .lazy import lazy_import
+
+special = lazy_import('scipy.special')
+
+# Two-sided confidence levels with precomputed critical values.
+CONFIDENCE_LEVELS = (0.80, 0.90, 0.95, 0.98, 0.99, 0.995, 0.999)
+MAX_CRITICAL_DF = 200
+
+# The t CDF is tabulated on |t| in [0, T_GRID_MAX] for integer df up to
+# MAX_CDF_DF. With a 0.005 step, linear interpolation stays within 1e-6.
+MAX_CDF_DF = 100
+T_GRID_MAX = 12.0
+T_GRID_STEP = 0.005
+
+_tables = None
+
+def build_tables():
+    """Generate every lookup table. Called lazily unless MEKAKO_PRECOMPUTE_TABLES is set."""
+    global _tables
+    upper_tails = np.array([(1 + level) / 2 for level in CONFIDENCE_LEVELS])
+    dfs = np.arange(1, MAX_CRITICAL_DF + 1)
+    t_critical = special.stdtrit(dfs[:, None], upper_tails[None, :])
+    grid = np.arange(0, T_GRID_MAX + T_GRID_STEP / 2, T_GRID_STEP)
+    t_cdf = special.stdtr(np.arange(1, MAX_CDF_DF + 1)[:, None], grid[None, :])
+    _tables = {
+        'upper_tails': {round(q, 6): i for i, q in enumerate(upper_tails)},
+        'z_critical': special.ndtri(upper_tails),
+        't_critical': t_critical,
+        't_grid': grid,
+        't_cdf': t_cdf,
+    }
+    return _tables
+
+def get_tables():
+    return _tables if _tables is not None else build_tables()
+
+def _integer_df(df):
+    return float(df).is_integer() and df >= 1
+
+def t_cdf(t, df):
+    """CDF of Student's t, from the interpolated table when df and t are in range."""
+    if _integer_df(df) and df <= MAX_CDF_DF and abs(t) <= T_GRID_MAX:
+        tables = get_tables()
+        upper = float(np.interp(abs(t), tables['t_grid'], tables['t_cdf'][int(df) - 1]))
+        return upper if t >= 0 else 1.0 - upper
+    return float(special.stdtr(df, t))
+
+def t_ppf(q, df):
+    """Quantile of Student's t, looked up for the tabulated confidence levels."""
+    tables = get_tables()
+    column = tables['upper_tails'].get(round(q, 6))
+    if column is not None and _integer_df(df) and df <= MAX_CRITICAL_DF:
+        return float(tables['t_critical'][int(df) - 1, column])
+    return float(special.stdtrit(df, q))
+
+def norm_cdf(z):
+    """Standard normal CDF via ``math.erfc``, which is already exact and fast."""
+    return 0.5 * math.erfc(-z / math.sqrt(2))
+
+def norm_ppf(q):
+    """Standard normal quantile, looked up for the tabulated confidence levels."""
+    tables = get_tables()
+    column = tables['upper_tails'].get(round(q, 6))
+    if column is not None:
+        return float(tables['z_critical'][column])
+    return float(special.ndtri(q))
+
+def verify_tables(samples=2000, seed=0):
+    """Cross-check every lookup against scipy.stats; returns the largest absolute errors."""
+    from scipy import stats
+    tables = get_tables()
+    rng = np.random.default_rng(seed)
+
+    dfs = rng.integers(1, MAX_CDF_DF + 1, samples)
+    ts = rng.uniform(-T_GRID_MAX, T_GRID_MAX, samples)
+    cdf_error = max(abs(t_cdf(t, df) - stats.t.cdf(t, df)) for t, df in zip(ts, dfs))
+
+    t_error = max(abs(t_ppf(q, df) - stats.t.ppf(q, df))
+                  for q in tables['upper_tails'] for df in range(1, MAX_CRITICAL_DF + 1))
+    z_error = max(abs(norm_ppf(q) - stats.norm.ppf(q)) for q in tables['upper_tails'])
+    norm_error = max(abs(norm_cdf(z) - stats.norm.cdf(z)) for z in rng.uniform(-8, 8, samples))
+    return {'t_cdf': float(cdf_error), 't_ppf': float(t_error), 'norm_ppf': float(z_error), 'norm_cdf': float(norm_error)}
+
+if os.getenv("MEKAKO_PRECOMPUTE_TABLES"):
+    build_tables()